@@ -0,0 +1,43 @@
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from models import db
+from config import DB_READ_THREADS
+from metrics import db_query_seconds, db_wait_seconds
+
+
+def _open_connection():
+    # Har bir executor oqimi o'z ulanishini bir marta ochadi va qayta ishlatadi
+    db.connect(reuse_if_open=True)
+
+_reader = ThreadPoolExecutor(max_workers=DB_READ_THREADS, thread_name_prefix="db-read", initializer=_open_connection)
+_writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-write", initializer=_open_connection)
+
+def _in_transaction(func, *args, **kwargs):
+    with db.atomic():
+        return func(*args, **kwargs)
+
+def _timed(kind: str, submitted: float, func, *args, **kwargs):
+    started = time.perf_counter()
+    db_wait_seconds.observe(started - submitted, kind=kind)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        db_query_seconds.observe(time.perf_counter() - started, kind=kind)
+
+async def db_read(func, *args, **kwargs):
+    """O'qish so'rovini alohida oqimda bajaradi — event loop diskni kutmaydi."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _reader, functools.partial(_timed, "read", time.perf_counter(), func, *args, **kwargs))
+
+async def db_write(func, *args, **kwargs):
+    """Yozish so'rovini yagona yozuvchi oqimda, tranzaksiya ichida bajaradi."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _writer, functools.partial(_timed, "write", time.perf_counter(), _in_transaction, func, *args, **kwargs))
+
+def shutdown():
+    _reader.shutdown(wait=True)
+    _writer.shutdown(wait=True)
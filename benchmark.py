@@ -0,0 +1,310 @@
+"""
+Oflayn benchmark: soxta Bot API serveri, sintetik e'lonlar bazasi va
+natijalar JSON formatida (regressiyalarni kuzatish uchun).
+
+O'lchanadi:
+  - bazani to'ldirish va aylanishni yangilash (start_new_round + navbatni qayta qurish) vaqti
+  - forward_listing: bitta e'lonni barcha maqsad guruhlarga yuborish vaqti
+  - forwarding_task o'tkazuvchanligi (e'lon/soniya)
+  - /dashboard va /api/listings javob vaqtlari (p50/p90/p99)
+
+Ishlatish:
+    python benchmark.py --listings 10000 --output bench.json
+    python benchmark.py --listings 100000 --latency 0.2 --error-rate 0.01 --retry-after-rate 0.005
+
+Benchmark vaqtinchalik papkada ishlaydi va mavjud house_listings.db ga tegmaydi.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import shutil
+import socket
+import sys
+import tempfile
+import time
+from fake_telegram import FakeTelegram, add_arguments
+
+SOURCE_GROUP = -1001000000001
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+WORDS = [
+    "sotiladi", "ijaraga", "kvartira", "uy", "hovli", "kottedj", "xonali", "qavat", "ta'mirlangan",
+    "yevroremont", "mebel", "bilan", "Navoiy", "mikrorayon", "markaz", "bozor", "maktab", "yaqinida",
+    "gaz", "svet", "suv", "konditsioner", "balkon", "narxi", "kelishiladi", "dollar", "so'm", "tel",
+]
+
+
+def percentiles(samples: list) -> dict:
+    if not samples:
+        return {"count": 0}
+    ordered = sorted(samples)
+
+    def pick(q: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(q * len(ordered)))] * 1000, 3)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(sum(ordered) / len(ordered) * 1000, 3),
+        "p50_ms": pick(0.50),
+        "p90_ms": pick(0.90),
+        "p99_ms": pick(0.99),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+def configure(args, api_url: str):
+    """Modullar import qilinishidan oldin sozlamalarni muhit o'zgaruvchilari orqali beradi."""
+    targets = [-1002000000000 - i for i in range(args.targets)]
+    os.environ.update({
+        "BOT_TOKEN": "123456:BENCHMARK",
+        "TELEGRAM_API_URL": api_url,
+        "WEBHOOK_URL": "",
+        "SOURCE_GROUPS": str(SOURCE_GROUP),
+        "TARGET_GROUPS": ",".join(str(t) for t in targets),
+        "FORWARD_INTERVAL": "0",
+        "DELIVERY_RETRY_INTERVAL": "3600",
+        "METRICS_TOKEN": "",
+        "SLOW_REQUEST_SECONDS": "3600",
+    })
+    if not args.real_limits:
+        os.environ.update({"GLOBAL_RATE_LIMIT": "1000000", "CHAT_RATE_LIMIT": "1000000000"})
+
+def synthetic_rows(count: int, album_ratio: float, rng: random.Random) -> list:
+    now = datetime.datetime.now()
+    rows = []
+    message_id = 1
+    for post_id in range(1, count + 1):
+        caption = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 40)))
+        row = {
+            "post_id": post_id,
+            "post_url": f"https://t.me/c/{str(SOURCE_GROUP)[4:]}/{message_id}",
+            "source_message_id": message_id,
+            "source_group_id": SOURCE_GROUP,
+            "timestamp": now - datetime.timedelta(minutes=count - post_id),
+            "caption": caption,
+            "status": "active",
+            "media_group_id": None,
+            "media_group_data": None,
+        }
+        if rng.random() < album_ratio:
+            size = rng.randint(2, 10)
+            row["media_group_id"] = f"album{post_id}"
+            row["media_group_data"] = json.dumps([
+                {"type": "photo", "file_id": f"photo-{post_id}-{i}", "file_unique_id": f"u{post_id}-{i}",
+                 "message_id": message_id + i}
+                for i in range(size)
+            ])
+            message_id += size
+        else:
+            message_id += 1
+        rows.append(row)
+    return rows
+
+def seed(args, rng: random.Random) -> dict:
+    from models import db, HouseListing, User, pwd_context
+    start = time.perf_counter()
+    rows = synthetic_rows(args.listings, args.album_ratio, rng)
+    with db.atomic():
+        for i in range(0, len(rows), 500):
+            HouseListing.insert_many(rows[i:i + 500]).execute()
+        boosted = rng.sample(range(1, args.listings + 1), min(args.boosted, args.listings))
+        HouseListing.update(boost_status="boosted").where(HouseListing.post_id.in_(boosted)).execute()
+        User.create(username="bench", hashed_password=pwd_context.hash("bench"), is_admin=True)
+    return {
+        "listings": len(rows),
+        "albums": sum(1 for row in rows if row["media_group_id"]),
+        "boosted": len(boosted),
+        "seconds": round(time.perf_counter() - start, 3),
+    }
+
+async def bench_round_recycle(repeats: int) -> dict:
+    from models import start_new_round
+    from aiodb import db_write
+    from listing_queue import listing_queue
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        await db_write(start_new_round)
+        await listing_queue.rebuild()
+        samples.append(time.perf_counter() - start)
+    return {**percentiles(samples), "queue_size": len(listing_queue)}
+
+async def bench_fanout(bot, samples: int, rng: random.Random) -> dict:
+    from models import HouseListing
+    from aiodb import db_read
+    from forwarding import forward_listing
+    from writebehind import write_buffer
+    total = await db_read(HouseListing.select().count)
+    ids = rng.sample(range(1, total + 1), min(samples, total))
+    listings = await db_read(lambda: list(HouseListing.select().where(HouseListing.post_id.in_(ids))))
+    timings = {"album": [], "single": []}
+    for listing in listings:
+        start = time.perf_counter()
+        await forward_listing(bot, listing)
+        timings["album" if listing.media_group_id else "single"].append(time.perf_counter() - start)
+    await write_buffer.flush()
+    return {kind: percentiles(values) for kind, values in timings.items()}
+
+async def bench_forwarding(bot, duration: float) -> dict:
+    import state
+    from forwarding import forwarding_task
+    from metrics import forwarding_phase_seconds, forwarded_listings, telegram_requests
+    from writebehind import write_buffer
+    state.SENDING_ENABLED = True
+
+    def counts():
+        return (forwarded_listings.value(kind="regular") + forwarded_listings.value(kind="boost"),
+                forwarding_phase_seconds.count(phase="send"))
+
+    sent_before, sends_before = counts()
+    requests_before = sum(sample[-1] for sample in telegram_requests.samples())
+    task = asyncio.create_task(forwarding_task(bot))
+    start = time.perf_counter()
+    await asyncio.sleep(duration)
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    elapsed = time.perf_counter() - start
+    state.SENDING_ENABLED = False
+    await write_buffer.flush()
+    sent, sends = counts()
+    sent, sends = int(sent - sent_before), sends - sends_before
+    requests = int(sum(sample[-1] for sample in telegram_requests.samples()) - requests_before)
+    return {"seconds": round(elapsed, 3), "listings_sent": sent, "listings_per_second": round(sent / elapsed, 3),
+            "send_batches": sends, "telegram_requests": requests}
+
+async def bench_http(requests: int, concurrency: int) -> dict:
+    import aiohttp
+    import uvicorn
+    import main
+    from security import create_access_token
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning", access_log=False))
+    server_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+    token = create_access_token({"sub": "bench"})
+    endpoints = {
+        "dashboard": "/dashboard",
+        "dashboard_page_50": "/dashboard?page=50",
+        "dashboard_search": "/dashboard?q=kvartira+narxi",
+        "api_listings": "/api/listings?limit=100",
+        "api_listings_fields": "/api/listings?limit=500&fields=id,post_id,status,boost_status",
+    }
+    results = {}
+    try:
+        async with aiohttp.ClientSession(
+            f"http://127.0.0.1:{port}",
+            cookies={"access_token": f"Bearer {token}"},
+            headers={"Authorization": f"Bearer {token}"},
+        ) as session:
+            for name, url in endpoints.items():
+                samples = []
+                failures = 0
+                remaining = iter(range(requests))
+
+                async def worker():
+                    nonlocal failures
+                    for _ in remaining:
+                        start = time.perf_counter()
+                        async with session.get(url) as response:
+                            await response.read()
+                            if response.status != 200:
+                                failures += 1
+                        samples.append(time.perf_counter() - start)
+
+                await asyncio.gather(*(worker() for _ in range(concurrency)))
+                results[name] = {**percentiles(samples), "failures": failures}
+    finally:
+        server.should_exit = True
+        await server_task
+    return results
+
+async def run(args) -> dict:
+    rng = random.Random(args.seed)
+    fake = FakeTelegram(args.latency, args.jitter, args.error_rate, args.retry_after_rate, args.retry_after, args.seed)
+    api_url = await fake.start()
+    configure(args, api_url)
+
+    # Sozlamalar tayyor — endi loyiha modullarini import qilamiz
+    from aiogram.bot.api import TelegramAPIServer
+    from models import initialize_db
+    from metrics import InstrumentedBot
+    from writebehind import write_buffer
+    import aiodb
+    initialize_db()
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.WARNING)
+
+    results = {
+        "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "workdir")},
+    }
+    bot = InstrumentedBot(token=os.environ["BOT_TOKEN"], server=TelegramAPIServer.from_base(api_url))
+    try:
+        results["seed"] = seed(args, rng)
+        results["round_recycle"] = await bench_round_recycle(args.recycle_repeats)
+        results["fanout"] = await bench_fanout(bot, args.fanout_samples, rng)
+        results["forwarding"] = await bench_forwarding(bot, args.duration)
+        results["http"] = await bench_http(args.http_requests, args.concurrency)
+        results["fake_api"] = fake.stats()
+    finally:
+        await write_buffer.close()
+        await (await bot.get_session()).close()
+        await fake.stop()
+        aiodb.shutdown()
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Oflayn benchmark (soxta Bot API bilan)")
+    parser.add_argument("--listings", type=int, default=10000, help="sintetik e'lonlar soni")
+    parser.add_argument("--album-ratio", type=float, default=0.3, help="albom (media guruh) e'lonlar ulushi")
+    parser.add_argument("--boosted", type=int, default=20, help="boost qilingan e'lonlar soni")
+    parser.add_argument("--targets", type=int, default=12, help="maqsad guruhlar soni")
+    parser.add_argument("--duration", type=float, default=10, help="forwarding_task necha soniya ishlaydi")
+    parser.add_argument("--fanout-samples", type=int, default=50)
+    parser.add_argument("--recycle-repeats", type=int, default=3)
+    parser.add_argument("--http-requests", type=int, default=200, help="har bir endpoint uchun so'rovlar soni")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--real-limits", action="store_true", help="GLOBAL/CHAT_RATE_LIMIT ni o'chirmaslik")
+    parser.add_argument("--workdir", help="baza uchun papka (standart: vaqtinchalik)")
+    parser.add_argument("--output", help="natijalar yoziladigan JSON fayl (standart: stdout)")
+    parser.add_argument("--verbose", action="store_true")
+    add_arguments(parser)
+    args = parser.parse_args()
+
+    workdir = args.workdir or tempfile.mkdtemp(prefix="bench-")
+    os.makedirs(workdir, exist_ok=True)
+    if os.path.exists(os.path.join(workdir, "house_listings.db")):
+        sys.exit(f"❌ {workdir} da house_listings.db allaqachon bor — bo'sh papka ko'rsating")
+    # models va main joriy papkadagi house_listings.db va templates/ bilan ishlaydi
+    shutil.copytree(os.path.join(REPO_DIR, "templates"), os.path.join(workdir, "templates"), dirs_exist_ok=True)
+    sys.path.insert(0, REPO_DIR)
+    output = os.path.abspath(args.output) if args.output else None
+    os.chdir(workdir)
+
+    results = asyncio.run(run(args))
+    if args.workdir:
+        results["workdir"] = workdir
+    text = json.dumps(results, indent=2, ensure_ascii=False)
+    if output:
+        with open(output, "w") as f:
+            f.write(text + "\n")
+    print(text)
+    if not args.workdir:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
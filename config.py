@@ -12,4 +12,98 @@ TARGET_GROUPS = [int(x) for x in os.getenv("TARGET_GROUPS", "").split(',') if x.
 
 # Forwarding parametrlar
 FORWARD_INTERVAL = int(os.getenv("FORWARD_INTERVAL", "30"))
-BOOST_EVERY_N = int(os.getenv("BOOST_EVERY_N", "5"))
\ No newline at end of file
+BOOST_EVERY_N = int(os.getenv("BOOST_EVERY_N", "5"))
+
+# Yuborish tezligi: har bir guruhga soatiga POSTS_PER_HOUR ta e'lon (0 — cheklovsiz; standart
+# qiymat FORWARD_INTERVAL dan olinadi). QUIET_HOURS — yuborilmaydigan vaqtlar, masalan "23-7,13:00-14:00".
+# To'xtalishdan keyin ko'pi bilan PACING_MAX_BACKLOG soniyalik qarz CATCH_UP_FACTOR marta tezroq qoplanadi
+POSTS_PER_HOUR = float(os.getenv("POSTS_PER_HOUR", str(3600 / FORWARD_INTERVAL if FORWARD_INTERVAL > 0 else 0)))
+QUIET_HOURS = os.getenv("QUIET_HOURS", "")
+CATCH_UP_FACTOR = float(os.getenv("CATCH_UP_FACTOR", "1.5"))
+PACING_MAX_BACKLOG = float(os.getenv("PACING_MAX_BACKLOG", "3600"))
+
+# Telegram cheklovlari: butun bot uchun (xabar/soniya) va har bir guruh uchun (xabar/daqiqa)
+GLOBAL_RATE_LIMIT = float(os.getenv("GLOBAL_RATE_LIMIT", "30"))
+CHAT_RATE_LIMIT = float(os.getenv("CHAT_RATE_LIMIT", "20"))
+SEND_MAX_RETRIES = int(os.getenv("SEND_MAX_RETRIES", "3"))
+
+# Ma'lumotlar bazasidan o'qish uchun oqimlar soni (yozish doim bitta oqimda)
+DB_READ_THREADS = int(os.getenv("DB_READ_THREADS", "4"))
+
+# Yetkazib berish natijalarini yozish buferi: soniyada bir marta yoki shuncha e'lon yig'ilganda
+WRITE_FLUSH_INTERVAL = float(os.getenv("WRITE_FLUSH_INTERVAL", "2"))
+WRITE_FLUSH_SIZE = int(os.getenv("WRITE_FLUSH_SIZE", "50"))
+
+# Takroriy e'lonlar: "suppress" (yangi nusxa yuborilmaydi), "merge" (yangi nusxa avvalgisining
+# o'rnini oladi) yoki bo'sh — o'chirilgan. Faqat DUPLICATE_WINDOW_HOURS ichidagi takrorlar hisoblanadi
+DUPLICATE_MODE = os.getenv("DUPLICATE_MODE", "suppress").lower()
+DUPLICATE_WINDOW_HOURS = float(os.getenv("DUPLICATE_WINDOW_HOURS", "72"))
+
+# Tayyor yuborish rejalari keshi (e'lonlar soni)
+SEND_PLAN_CACHE_SIZE = int(os.getenv("SEND_PLAN_CACHE_SIZE", "512"))
+
+# Partiyalab yuborish: "forward" (forwardMessages) yoki "copy" (copyMessages), bo'sh — o'chirilgan.
+# Navbatdagi e'lonlar har bir guruhga bitta so'rovda BATCH_SEND_SIZE tagacha xabar bilan yuboriladi;
+# albomlar manba xabarlaridan olinadi, shuning uchun ularga CAPTION_FOOTER qo'shilmaydi
+BATCH_SEND = os.getenv("BATCH_SEND", "").lower()
+BATCH_SEND_SIZE = min(int(os.getenv("BATCH_SEND_SIZE", "100")), 100)
+
+# Boost qilingan e'lonlarni rejalash: slotlar REGULAR_WEIGHT : BOOST_WEIGHT nisbatda bo'linadi,
+# har bir boost soatiga BOOST_MAX_PER_HOUR martadan ko'p emas va BOOST_MIN_SPACING soniyadan tez emas
+REGULAR_WEIGHT = float(os.getenv("REGULAR_WEIGHT", str(BOOST_EVERY_N)))
+BOOST_WEIGHT = float(os.getenv("BOOST_WEIGHT", "1"))
+BOOST_MAX_PER_HOUR = int(os.getenv("BOOST_MAX_PER_HOUR", "4"))
+BOOST_MIN_SPACING = float(os.getenv("BOOST_MIN_SPACING", "600"))
+
+# Manba guruhlardan e'lonlarni qabul qilish: albom qismlarini kutish (soniya) va bazaga partiyalab yozish
+INGEST_ALBUM_DELAY = float(os.getenv("INGEST_ALBUM_DELAY", "1.5"))
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "50"))
+INGEST_FLUSH_INTERVAL = float(os.getenv("INGEST_FLUSH_INTERVAL", "2"))
+
+# Webhook rejimi: WEBHOOK_URL berilsa, yangilanishlar polling o'rniga FastAPI orqali qabul qilinadi
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram/webhook")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+WEBHOOK_QUEUE_SIZE = int(os.getenv("WEBHOOK_QUEUE_SIZE", "1000"))
+WEBHOOK_WORKERS = int(os.getenv("WEBHOOK_WORKERS", "4"))
+# Bot API manzili (bo'sh bo'lsa api.telegram.org); sinov uchun lokal server ko'rsatish mumkin
+TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+
+# Yetkazib berish jurnali: muvaffaqiyatsiz maqsad guruhlarga qayta urinish (eksponensial kutish bilan)
+DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "5"))
+DELIVERY_RETRY_BASE = float(os.getenv("DELIVERY_RETRY_BASE", "60"))
+DELIVERY_RETRY_MAX = float(os.getenv("DELIVERY_RETRY_MAX", "3600"))
+DELIVERY_RETRY_INTERVAL = float(os.getenv("DELIVERY_RETRY_INTERVAL", "30"))
+
+# Autentifikatsiya: tekshirilgan tokenlar keshi (soniya), bcrypt uchun jarayonlar va kirish urinishlari cheklovi
+AUTH_CACHE_TTL = float(os.getenv("AUTH_CACHE_TTL", "60"))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "1024"))
+AUTH_HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "2"))
+AUTH_HASH_QUEUE = int(os.getenv("AUTH_HASH_QUEUE", "16"))
+LOGIN_MAX_ATTEMPTS = int(os.getenv("LOGIN_MAX_ATTEMPTS", "5"))
+# Foydalanuvchi nomi bo'yicha umumiy (barcha IP lardan) cheklov — begona IP admin'ni oson bloklay olmasin
+LOGIN_USER_MAX_ATTEMPTS = int(os.getenv("LOGIN_USER_MAX_ATTEMPTS", "100"))
+LOGIN_WINDOW = float(os.getenv("LOGIN_WINDOW", "300"))
+
+# Metrikalar: /metrics uchun ixtiyoriy Bearer token va sekin HTTP so'rovlar chegarasi (soniya)
+METRICS_TOKEN = os.getenv("METRICS_TOKEN", "")
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", "1"))
+
+# Jarayonlar: RUN_FORWARDER=0 bo'lsa main.py faqat veb va bot yangilanishlarini ishlatadi,
+# yuborish esa alohida `python forwarder.py` jarayon(lar)ida bo'ladi
+RUN_FORWARDER = os.getenv("RUN_FORWARDER", "1").lower() not in ("0", "false", "no")
+FORWARDER_ID = os.getenv("FORWARDER_ID", "")
+CONTROL_POLL_INTERVAL = float(os.getenv("CONTROL_POLL_INTERVAL", "0.5"))
+LEASE_TTL = float(os.getenv("LEASE_TTL", "30"))
+
+# Statistika: /api/stats va dashboard sarlavhasi uchun kesh muddati (soniya)
+STATS_CACHE_TTL = float(os.getenv("STATS_CACHE_TTL", "5"))
+
+# Saqlash muddatlari: eski e'lonlar arxiv jadvaliga ko'chiriladi, yetkazib berish tarixi tozalanadi.
+# O'chirilgan va takroriy e'lonlar ARCHIVE_DELETED_DAYS dan keyin arxivlanadi, ARCHIVE_ACTIVE_DAYS=0 — faol
+# e'lonlar arxivlanmaydi. Tozalangan "sent" yozuvlarining xabarlari e'lon o'chirilganda guruhlardan o'chirilmaydi.
+ARCHIVE_DELETED_DAYS = float(os.getenv("ARCHIVE_DELETED_DAYS", "7"))
+ARCHIVE_ACTIVE_DAYS = float(os.getenv("ARCHIVE_ACTIVE_DAYS", "0"))
+DELIVERY_RETENTION_DAYS = float(os.getenv("DELIVERY_RETENTION_DAYS", "30"))
+RETENTION_INTERVAL = float(os.getenv("RETENTION_INTERVAL", "3600"))
+RETENTION_BATCH = int(os.getenv("RETENTION_BATCH", "500"))
@@ -0,0 +1,147 @@
+import asyncio
+import datetime
+import json
+import logging
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from models import db, Control, Command
+from aiodb import db_read, db_write
+from config import CONTROL_POLL_INTERVAL
+import state
+
+# Har bir jarayon uchun yagona nom: buyruqlar manbasi va ijaralar egasi
+PROCESS_ID = f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+COMMAND_KEEP = datetime.timedelta(hours=1)
+PRUNE_EVERY = 600
+
+
+def _set_flag(name: str, value):
+    (Control
+     .insert(name=name, value=json.dumps(value), updated_at=datetime.datetime.now())
+     .on_conflict(conflict_target=[Control.name], preserve=[Control.value, Control.updated_at])
+     .execute())
+
+def _read_changes(after_id: int):
+    flags = {row.name: json.loads(row.value) for row in Control.select()}
+    commands = list(Command.select().where(Command.id > after_id).order_by(Command.id))
+    return flags, commands
+
+def _prune_commands() -> int:
+    return Command.delete().where(Command.created_at < datetime.datetime.now() - COMMAND_KEEP).execute()
+
+
+class ControlPlane:
+    """
+    Jarayonlar (veb, bot, forwarderlar) o'rtasidagi boshqaruv SQLite orqali:
+    flaglar `control` jadvalida, buyruqlar `command` jadvalida saqlanadi.
+    Boshqa ulanish bazaga yozganini PRAGMA data_version bildiradi — u
+    o'zgarmaguncha jadvallar qayta o'qilmaydi.
+    state.SENDING_ENABLED — shu jarayondagi nusxa.
+    """
+
+    def __init__(self, poll_interval: float, origin: str):
+        self.poll_interval = poll_interval
+        self.origin = origin
+        self._handlers = {}
+        self._last_command_id = 0
+        self._version = None
+        self._conn = None
+        self._task = None
+        self._pending_changes = set()
+        self._notify_task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def on(self, name: str, handler):
+        """`name` buyrug'i kelganda `await handler(payload)` chaqiriladi."""
+        self._handlers[name] = handler
+
+    async def set_sending(self, enabled: bool):
+        state.SENDING_ENABLED = enabled
+        await db_write(_set_flag, "sending_enabled", enabled)
+
+    async def set_flag(self, name: str, value):
+        await db_write(_set_flag, name, value)
+
+    async def get_flag(self, name: str, default=None):
+        row = await db_read(Control.get_or_none, Control.name == name)
+        return json.loads(row.value) if row is not None else default
+
+    async def send_command(self, name: str, payload=None):
+        await db_write(lambda: Command.insert(name=name, payload=json.dumps(payload), origin=self.origin).execute())
+
+    def notify_changed(self, listing_id: int):
+        """E'lon o'zgarganini boshqa jarayonlarga bildiradi (bir tsikldagilar bitta buyruqqa yig'iladi)."""
+        self._pending_changes.add(listing_id)
+        if self._notify_task is None:
+            self._notify_task = asyncio.get_running_loop().create_task(self._flush_changes())
+
+    async def _flush_changes(self):
+        await asyncio.sleep(0)
+        listing_ids, self._pending_changes = sorted(self._pending_changes), set()
+        self._notify_task = None
+        try:
+            await self.send_command("listings_changed", listing_ids)
+        except Exception as e:
+            logging.error(f"❌ {len(listing_ids)} ta e'lon o'zgarishini bildirishda xato: {e}")
+
+    def _data_version(self) -> int:
+        return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    async def start(self):
+        if self._task is not None:
+            return
+        # data_version har bir ulanish uchun alohida, shuning uchun o'z ulanishimiz kerak
+        self._conn = sqlite3.connect(db.database, check_same_thread=False)
+        self._version = self._data_version()
+        await self.sync(initial=True)
+        self._task = asyncio.create_task(self._watch())
+
+    async def stop(self):
+        if self._notify_task is not None:
+            await self._notify_task
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    async def _watch(self):
+        pruned = time.monotonic()
+        while True:
+            await asyncio.sleep(self.poll_interval)
+            try:
+                version = self._data_version()
+                if version != self._version:
+                    self._version = version
+                    await self.sync()
+                if time.monotonic() - pruned >= PRUNE_EVERY:
+                    pruned = time.monotonic()
+                    await db_write(_prune_commands)
+            except Exception as e:
+                logging.error(f"❌ Boshqaruv holatini o'qishda xato: {e}")
+
+    async def sync(self, initial: bool = False):
+        flags, commands = await db_read(_read_changes, self._last_command_id)
+        state.SENDING_ENABLED = bool(flags.get("sending_enabled", False))
+        if commands:
+            self._last_command_id = commands[-1].id
+        if initial:
+            # Ishga tushishdan oldingi buyruqlar bajarilmaydi — holat baribir bazadan o'qiladi
+            return
+        for command in commands:
+            handler = self._handlers.get(command.name)
+            if handler is None or command.origin == self.origin:
+                continue
+            try:
+                await handler(json.loads(command.payload))
+            except Exception as e:
+                logging.error(f"❌ {command.name} buyrug'ini bajarishda xato: {e}")
+
+control = ControlPlane(CONTROL_POLL_INTERVAL, PROCESS_ID)
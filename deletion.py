@@ -0,0 +1,79 @@
+import asyncio
+import datetime
+import json
+import logging
+from typing import Optional
+from aiogram import Bot
+from models import HouseListing, Delivery
+from ratelimit import limiter
+from jobs import Job, jobs
+
+DELETE_CHUNK = 100  # deleteMessages bir so'rovda 100 tagacha xabarni o'chiradi
+
+
+def forwarded_messages(listing_ids: list) -> dict:
+    """E'lonlarning maqsad guruhlardagi nusxalari: {chat_id: [message_id, ...]}."""
+    messages = {}
+    rows = (Delivery
+            .select(Delivery.target_id, Delivery.message_ids)
+            .where(Delivery.listing.in_(listing_ids) & (Delivery.status == "sent"))
+            .tuples())
+    for target_id, msg_ids in rows:
+        messages.setdefault(target_id, []).extend(json.loads(msg_ids))
+    return messages
+
+def detach_forwarded_messages(listing_ids: list, write=None) -> dict:
+    """
+    E'lonlarning nusxalarini qaytaradi va jurnalda ularni "deleted" deb belgilaydi;
+    `write()` berilsa, u ham shu tranzaksiyada bajariladi. db_write orqali chaqiriladi.
+    """
+    messages = forwarded_messages(listing_ids)
+    (Delivery
+     .update(status="deleted", updated_at=datetime.datetime.now())
+     .where(Delivery.listing.in_(listing_ids) & (Delivery.status == "sent"))
+     .execute())
+    if write is not None:
+        write()
+    return messages
+
+def source_messages(listing: HouseListing) -> dict:
+    """Manba guruhidagi xabarlar: albom bo'lsa, uning barcha qismlari."""
+    msg_ids = []
+    if listing.media_group_data:
+        try:
+            msg_ids = [item["message_id"] for item in json.loads(listing.media_group_data) if "message_id" in item]
+        except Exception:
+            msg_ids = []
+    if listing.source_message_id and listing.source_message_id not in msg_ids:
+        msg_ids.append(listing.source_message_id)
+    return {listing.source_group_id: msg_ids} if msg_ids else {}
+
+def merge_messages(into: dict, messages: dict) -> dict:
+    for chat_id, msg_ids in messages.items():
+        into.setdefault(chat_id, []).extend(msg_ids)
+    return into
+
+async def delete_chat_messages(bot: Bot, chat_id: int, msg_ids: list, job: Optional[Job] = None):
+    for i in range(0, len(msg_ids), DELETE_CHUNK):
+        chunk = msg_ids[i:i + DELETE_CHUNK]
+        try:
+            await limiter.call(chat_id, bot.request, "deleteMessages",
+                               {"chat_id": chat_id, "message_ids": json.dumps(chunk)})
+            if job:
+                job.done += len(chunk)
+        except Exception as e:
+            logging.error(f"❌ Guruh {chat_id} dan {len(chunk)} ta xabarni o'chirishda xato: {e}")
+            if job:
+                job.failed += len(chunk)
+
+async def delete_messages(bot: Bot, messages: dict, job: Optional[Job] = None):
+    """Har bir chat uchun xabarlarni partiyalab, chatlarni esa parallel o'chiradi."""
+    await asyncio.gather(*(delete_chat_messages(bot, chat_id, msg_ids, job)
+                           for chat_id, msg_ids in messages.items() if msg_ids))
+
+def schedule_deletion(bot: Bot, messages: dict, kind: str = "delete_messages") -> Optional[Job]:
+    """Xabarlarni o'chirishni fon ishi sifatida boshlaydi; o'chiradigan narsa bo'lmasa None."""
+    total = sum(len(msg_ids) for msg_ids in messages.values())
+    if not total:
+        return None
+    return jobs.start(kind, total, lambda job: delete_messages(bot, messages, job))
@@ -0,0 +1,118 @@
+"""
+Takroriy e'lonlar: agentlar bir xonadonni qayta-qayta (ba'zan bir nechta manba guruhida)
+joylashtiradi. Har bir e'lon uchun matn va media (file_unique_id) dan barmoq izi
+hisoblanadi; DUPLICATE_WINDOW_HOURS ichidagi takror navbatga kirmaydi:
+
+    suppress — yangi nusxa "duplicate" holatida saqlanadi, avvalgi e'lon o'zgarmaydi;
+    merge    — yangi nusxa asosiy e'longa aylanadi (aylanish va boost holatini oladi),
+               avvalgisi esa "duplicate" bo'ladi. Shunda eng yangi manba xabari yuboriladi.
+
+Ikkala rejimda ham nusxalar bazada qoladi va /dashboard/duplicates da guruhlab ko'rsatiladi.
+"""
+import datetime
+import hashlib
+import html
+import json
+import logging
+import re
+from typing import Optional
+from peewee import fn
+from models import HouseListing
+from config import DUPLICATE_MODE, DUPLICATE_WINDOW_HOURS
+
+TAG_RE = re.compile(r"<[^>]+>")
+WORD_RE = re.compile(r"\w+")
+# Mediasiz qisqa matnlar ("Sotiladi", "Ijaraga") turli e'lonlarda ham bir xil bo'ladi
+MIN_TEXT_WORDS = 5
+
+
+def normalize_caption(caption: Optional[str]) -> str:
+    """HTML teglar, tinish belgilari, registr va bo'shliqlar farqini yo'qotadi."""
+    text = html.unescape(TAG_RE.sub(" ", caption or ""))
+    return " ".join(WORD_RE.findall(text.casefold()))
+
+def fingerprint(caption: Optional[str], file_unique_ids: list) -> Optional[str]:
+    text = normalize_caption(caption)
+    media = sorted(set(file_unique_ids))
+    if not media and len(text.split()) < MIN_TEXT_WORDS:
+        return None
+    return hashlib.blake2b(f"{text}\n{','.join(media)}".encode(), digest_size=16).hexdigest()
+
+def listing_fingerprint(listing: HouseListing) -> Optional[str]:
+    """Bazadagi e'lon uchun barmoq izi (yakka xabarlarning mediasi saqlanmagan — faqat matn)."""
+    media = []
+    if listing.media_group_data:
+        media = [item["file_unique_id"] for item in json.loads(listing.media_group_data)
+                 if item.get("file_unique_id")]
+    return fingerprint(listing.caption, media)
+
+def resolve_duplicates(listings: list, now: Optional[datetime.datetime] = None) -> list:
+    """
+    Yangi qo'shilgan e'lonlarni oynadagi faol e'lonlar bilan solishtirib, DUPLICATE_MODE
+    bo'yicha holatini o'zgartiradi (e'lon obyektlari ham yangilanadi). db_write ichida
+    chaqiriladi; holati o'zgargan avvalgi e'lonlarni (merge) qaytaradi.
+    """
+    if DUPLICATE_MODE not in ("merge", "suppress"):
+        return []
+    listings = sorted((listing for listing in listings if listing.fingerprint and listing.status == "active"),
+                      key=lambda listing: listing.id)
+    if not listings:
+        return []
+    now = now or datetime.datetime.now()
+    canonical = {}
+    for listing in (HouseListing
+                    .select()
+                    .where(HouseListing.fingerprint.in_({listing.fingerprint for listing in listings}) &
+                           (HouseListing.status == "active") &
+                           (HouseListing.timestamp >= now - datetime.timedelta(hours=DUPLICATE_WINDOW_HOURS)) &
+                           HouseListing.id.not_in([listing.id for listing in listings]))
+                    .order_by(HouseListing.id)):
+        canonical[listing.fingerprint] = listing
+    replaced, found = [], 0
+    for listing in listings:
+        current = canonical.get(listing.fingerprint)
+        if current is None:
+            # Shu partiyadagi keyingi nusxalar uchun asosiy e'lon
+            canonical[listing.fingerprint] = listing
+            continue
+        found += 1
+        if DUPLICATE_MODE == "suppress":
+            listing.status = "duplicate"
+            HouseListing.update(status="duplicate").where(HouseListing.id == listing.id).execute()
+            continue
+        listing.sent_round, listing.boost_status = current.sent_round, current.boost_status
+        HouseListing.update(sent_round=listing.sent_round, boost_status=listing.boost_status).where(
+            HouseListing.id == listing.id).execute()
+        current.status, current.boost_status = "duplicate", None
+        HouseListing.update(status="duplicate", boost_status=None).where(HouseListing.id == current.id).execute()
+        canonical[listing.fingerprint] = listing
+        replaced.append(current)
+    if found:
+        logging.info(f"👯 {found} ta takroriy e'lon aniqlandi ({DUPLICATE_MODE})")
+    return replaced
+
+def duplicate_clusters(limit: int, offset: int = 0) -> tuple:
+    """
+    Bir nechta e'loni bor barmoq izlari, oxirgi nusxasi yangi bo'lganlari birinchi:
+    ([{"fingerprint", "size", "last_seen", "members": [...]}, ...], jami_guruhlar).
+    """
+    size = fn.COUNT(HouseListing.id)
+    last_seen = fn.MAX(HouseListing.timestamp)
+    clusters = (HouseListing
+                .select(HouseListing.fingerprint, size.alias("size"), last_seen.alias("last_seen"))
+                .where(HouseListing.fingerprint.is_null(False))
+                .group_by(HouseListing.fingerprint)
+                .having(size > 1))
+    total = clusters.count()
+    page = list(clusters.order_by(last_seen.desc(), HouseListing.fingerprint).limit(limit).offset(offset).dicts())
+    members = {}
+    for listing in (HouseListing
+                    .select(HouseListing.id, HouseListing.post_id, HouseListing.source_group_id, HouseListing.status,
+                            HouseListing.boost_status, HouseListing.timestamp, HouseListing.caption,
+                            HouseListing.fingerprint)
+                    .where(HouseListing.fingerprint.in_([cluster["fingerprint"] for cluster in page]))
+                    .order_by(HouseListing.timestamp.desc(), HouseListing.id.desc())):
+        members.setdefault(listing.fingerprint, []).append(listing)
+    for cluster in page:
+        cluster["members"] = members.get(cluster["fingerprint"], [])
+    return page, total
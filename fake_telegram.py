@@ -0,0 +1,139 @@
+"""
+Sinov va benchmark uchun soxta Telegram Bot API serveri (to'liq oflayn).
+Javob kechikishi, xatolar ulushi va RetryAfter (429) javoblarini sozlash mumkin.
+
+Ishlatish: python fake_telegram.py --port 8081 --latency 0.05 --error-rate 0.01
+so'ng botni TELEGRAM_API_URL=http://127.0.0.1:8081 bilan ishga tushiring.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from collections import Counter
+from aiohttp import web
+
+
+class FakeTelegram:
+    """
+    Bot API ning bot ishlatadigan metodlarini taqlid qiladi: har bir chat uchun
+    xabar ID lari ketma-ket beriladi, so'rovlar metod bo'yicha sanaladi.
+    """
+
+    def __init__(self, latency: float = 0.05, jitter: float = 0.02, error_rate: float = 0.0,
+                 retry_after_rate: float = 0.0, retry_after: int = 1, seed: int = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.retry_after_rate = retry_after_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.requests = Counter()
+        self.errors = Counter()
+        self.retry_afters = Counter()
+        self.messages = 0
+        self._message_ids = {}
+        self._runner = None
+
+    def _next_ids(self, chat_id, count: int) -> list:
+        first = self._message_ids.get(chat_id, 0) + 1
+        self._message_ids[chat_id] = first + count - 1
+        self.messages += count
+        return list(range(first, first + count))
+
+    def _message(self, chat_id, message_id: int) -> dict:
+        return {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": {"id": int(chat_id), "type": "supergroup"},
+        }
+
+    def _result(self, method: str, data) -> object:
+        chat_id = data.get("chat_id", 0)
+        if method == "sendMediaGroup":
+            media = json.loads(data["media"])
+            return [self._message(chat_id, i) for i in self._next_ids(chat_id, len(media))]
+        if method in ("forwardMessage", "copyMessage", "sendMessage", "sendPhoto", "sendVideo"):
+            return self._message(chat_id, self._next_ids(chat_id, 1)[0])
+        if method in ("forwardMessages", "copyMessages"):
+            count = len(json.loads(data["message_ids"]))
+            return [{"message_id": i} for i in self._next_ids(chat_id, count)]
+        if method == "getMe":
+            return {"id": 123456, "is_bot": True, "first_name": "Benchmark", "username": "bench_bot"}
+        return True
+
+    async def _handle(self, request: web.Request) -> web.Response:
+        method = request.match_info["method"]
+        data = await request.post()
+        self.requests[method] += 1
+        delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+        if delay:
+            await asyncio.sleep(delay)
+        roll = self.random.random()
+        if roll < self.retry_after_rate:
+            self.retry_afters[method] += 1
+            return web.json_response({
+                "ok": False,
+                "error_code": 429,
+                "description": f"Too Many Requests: retry after {self.retry_after}",
+                "parameters": {"retry_after": self.retry_after},
+            }, status=429)
+        if roll < self.retry_after_rate + self.error_rate:
+            self.errors[method] += 1
+            return web.json_response({"ok": False, "error_code": 400, "description": "Bad Request: injected error"},
+                                     status=400)
+        return web.json_response({"ok": True, "result": self._result(method, data)})
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serverni ishga tushiradi va TELEGRAM_API_URL uchun manzilni qaytaradi."""
+        app = web.Application()
+        app.router.add_post("/bot{token}/{method}", self._handle)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        return f"http://{host}:{port}"
+
+    async def stop(self):
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    def stats(self) -> dict:
+        return {
+            "requests": dict(self.requests),
+            "errors": dict(self.errors),
+            "retry_after": dict(self.retry_afters),
+            "messages": self.messages,
+        }
+
+
+async def serve(args):
+    fake = FakeTelegram(args.latency, args.jitter, args.error_rate, args.retry_after_rate, args.retry_after, args.seed)
+    url = await fake.start(args.host, args.port)
+    print(f"🤖 Soxta Bot API: {url}")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await fake.stop()
+
+
+def add_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--latency", type=float, default=0.05, help="o'rtacha javob kechikishi (soniya)")
+    parser.add_argument("--jitter", type=float, default=0.02, help="kechikishning tasodifiy og'ishi (soniya)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="400 xato bilan javob berish ulushi")
+    parser.add_argument("--retry-after-rate", type=float, default=0.0, help="429 RetryAfter javoblari ulushi")
+    parser.add_argument("--retry-after", type=int, default=1, help="RetryAfter da kutish vaqti (soniya)")
+    parser.add_argument("--seed", type=int, default=None)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Soxta Telegram Bot API serveri")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    add_arguments(parser)
+    try:
+        asyncio.run(serve(parser.parse_args()))
+    except KeyboardInterrupt:
+        pass
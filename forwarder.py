@@ -0,0 +1,45 @@
+"""
+Alohida yuborish jarayoni. main.py ni RUN_FORWARDER=0 bilan ishga tushirib,
+bir yoki bir nechta forwarderni alohida ishlatish mumkin:
+
+    RUN_FORWARDER=0 python main.py
+    python forwarder.py          # har bir nusxa maqsad guruhlarning bir qismini oladi
+
+Forwarderlar maqsad guruhlarni ijaralar (leases.py) orqali bo'lishadi, navbatni esa
+ulardan bittasi ("scheduler" ijarasi egasi) yuritadi. Yuborish rejimi, /refresh va
+e'lon o'zgarishlari control.py orqali keladi.
+"""
+import asyncio
+import logging
+from models import initialize_db
+from forwarding import create_bot, start_forwarder, stop_forwarder, leases
+from control import control
+from retention import retention_task
+from writebehind import write_buffer
+import aiodb
+
+logging.basicConfig(level=logging.INFO)
+
+
+async def main():
+    initialize_db()
+    bot = create_bot()
+    await control.start()
+    try:
+        await start_forwarder(bot)
+        asyncio.create_task(retention_task())
+        logging.info(f"📤 Forwarder ishga tushdi: {leases.owner}")
+        await asyncio.Event().wait()
+    finally:
+        await stop_forwarder()
+        await control.stop()
+        await write_buffer.close()
+        await bot.session.close()
+        aiodb.shutdown()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        pass
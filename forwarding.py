@@ -1,111 +1,510 @@
 import asyncio
+import heapq
 import logging
+import time
 import json
 import datetime
-from models import HouseListing
-from config import TARGET_GROUPS, SOURCE_GROUPS, FORWARD_INTERVAL, BOOST_EVERY_N
+from peewee import fn
+from models import HouseListing, Delivery, Counter, start_new_round
+from config import (
+    BOT_TOKEN, TELEGRAM_API_URL, TARGET_GROUPS, FORWARDER_ID, LEASE_TTL,
+    DELIVERY_MAX_ATTEMPTS, DELIVERY_RETRY_BASE, DELIVERY_RETRY_MAX, DELIVERY_RETRY_INTERVAL,
+    BATCH_SEND, BATCH_SEND_SIZE, REGULAR_WEIGHT, BOOST_WEIGHT, BOOST_MAX_PER_HOUR, BOOST_MIN_SPACING,
+)
 from aiogram import Bot
-from aiogram.types import InputMediaPhoto, InputMediaVideo
+from aiogram.bot.api import TelegramAPIServer
+from ratelimit import limiter
+from listing_queue import listing_queue
+from aiodb import db_read, db_write
+from writebehind import write_buffer
+from sendplan import SendPlan, send_plans
+from deletion import delete_chat_messages
+from scheduler import FairScheduler, boost_scheduler
+from pacing import pacer, create_pacer, POLL_INTERVAL
+from metrics import InstrumentedBot, send_seconds, forwarding_phase_seconds, forwarded_listings
+from control import control, PROCESS_ID
+from leases import LeaseManager
 import state
 
+# Pending yozuvlarni tekshirish orasidagi eng qisqa vaqt (soniya)
+DELIVERY_POLL_MIN = 1
+# Boshqa forwarder bizning guruhlarimiz uchun pending yozuv qoldirganda o'rnatiladi
+deliveries_due = asyncio.Event()
+# forwarding_task va delivery_retry_task (stop_forwarder bekor qiladi)
+_tasks = []
+# Bo'sh turgan pacer holati bazaga shundan tez-tez yozilmaydi (soniya)
+PACER_SAVE_EVERY = 60
+_pacer_saved = 0.0
+BATCH_METHODS = {"forward": "forwardMessages", "copy": "copyMessages"}
+
+leases = LeaseManager(FORWARDER_ID or PROCESS_ID, TARGET_GROUPS, LEASE_TTL)
+
+def create_bot() -> Bot:
+    if TELEGRAM_API_URL:
+        return InstrumentedBot(token=BOT_TOKEN, server=TelegramAPIServer.from_base(TELEGRAM_API_URL))
+    return InstrumentedBot(token=BOT_TOKEN)
+
+def owned_targets() -> list:
+    """Shu jarayon yuboradigan guruhlar (ijaralar ishlamasa — hammasi)."""
+    if not leases.running:
+        return TARGET_GROUPS
+    return [target for target in TARGET_GROUPS if target in leases.owned]
+
+def is_scheduler() -> bool:
+    return not leases.running or leases.is_leader
+
+async def send_to_target(bot: Bot, plan: SendPlan, target: int) -> list:
+    """Bitta maqsad guruhiga yuboradi va yuborilgan xabarlar ID larini qaytaradi."""
+    with send_seconds.time(target=target):
+        return await _send_to_target(bot, plan, target)
+
+async def _send_to_target(bot: Bot, plan: SendPlan, target: int) -> list:
+    if plan.media is not None:
+        messages = await limiter.call(
+            target, bot.send_media_group,
+            chat_id=target, media=plan.media, cost=plan.cost
+        )
+        return [msg.message_id for msg in messages]
+    msg = await limiter.call(
+        target, bot.forward_message,
+        chat_id=target,
+        from_chat_id=plan.from_chat_id,
+        message_id=plan.message_id
+    )
+    return [msg.message_id]
+
+def batch_chunks(plans: list, size: int) -> list:
+    """
+    (indeks, reja) juftlarini [(from_chat_id, [(indeks, reja), ...]), ...] partiyalarga bo'ladi:
+    partiyada bitta manba guruh, ko'pi bilan `size` ta xabar, ID lar qat'iy o'sish tartibida
+    (Bot API talabi). Albom qismlari bitta partiyada qoladi, shuning uchun guruhlanishi saqlanadi.
+    """
+    by_chat = {}
+    for index, plan in plans:
+        by_chat.setdefault(plan.from_chat_id, []).append((index, plan))
+    chunks = []
+    for from_chat_id, items in by_chat.items():
+        items.sort(key=lambda item: item[1].message_ids[0])
+        chunk, count, last = [], 0, None
+        for index, plan in items:
+            ids = plan.message_ids
+            # Bir xil xabar ikki marta uchrasa, u keyingi partiyaga o'tadi
+            if chunk and (count + len(ids) > size or ids[0] <= last):
+                chunks.append((from_chat_id, chunk))
+                chunk, count = [], 0
+            chunk.append((index, plan))
+            count += len(ids)
+            last = ids[-1]
+        if chunk:
+            chunks.append((from_chat_id, chunk))
+    return chunks
+
+async def send_batch(bot: Bot, target: int, from_chat_id: int, plans: list) -> list:
+    """
+    Rejalarni bitta forwardMessages/copyMessages so'rovida yuboradi va har bir reja
+    uchun yuborilgan xabarlar ID larini (yoki Exception) qaytaradi.
+    """
+    message_ids = [message_id for plan in plans for message_id in plan.message_ids]
+    with send_seconds.time(target=target):
+        result = await limiter.call(
+            target, bot.request, BATCH_METHODS[BATCH_SEND],
+            {"chat_id": target, "from_chat_id": from_chat_id, "message_ids": json.dumps(message_ids)},
+            cost=len(message_ids)
+        )
+    sent = [item["message_id"] for item in result]
+    if len(sent) != len(message_ids):
+        # Telegram topilmagan xabarlarni tashlab ketadi, lekin qaysilari ekanini aytmaydi:
+        # yuborilgan nusxalarni o'chirib, partiyani bittadan qayta yuboramiz
+        logging.warning(f"⚠️ {target} ga partiyadan {len(sent)}/{len(message_ids)} ta xabar yuborildi, "
+                        f"e'lonlar bittadan qayta yuboriladi")
+        if sent:
+            await delete_chat_messages(bot, target, sent)
+        return await asyncio.gather(*(send_to_target(bot, plan, target) for plan in plans), return_exceptions=True)
+    results, position = [], 0
+    for plan in plans:
+        results.append(sent[position:position + len(plan.message_ids)])
+        position += len(plan.message_ids)
+    return results
+
+async def send_many_to_target(bot: Bot, plans: list, target: int) -> list:
+    """
+    Bir nechta e'lonni bitta guruhga yuboradi. Natijalar `plans` tartibida: xabarlar
+    ID lari ro'yxati yoki Exception. BATCH_SEND yoqilgan bo'lsa, manba xabarlari ma'lum
+    e'lonlar partiyalab yuboriladi, qolganlari — odatdagidek bittadan.
+    """
+    batched = []
+    if BATCH_SEND in BATCH_METHODS:
+        batched = [(index, plan) for index, plan in enumerate(plans) if plan.message_ids]
+    single = sorted(set(range(len(plans))) - {index for index, _ in batched})
+    # Cheklovchi chelak sig'imidan katta so'rov to'liq narxda hisoblanmaydi, shuning uchun
+    # partiya ikkala chelakka ham sig'adigan bo'lishi kerak
+    size = int(min(BATCH_SEND_SIZE, limiter.bucket_for(target).capacity, limiter.global_bucket.capacity))
+    chunks = batch_chunks(batched, max(size, 1))
+    outcomes = await asyncio.gather(
+        *(send_batch(bot, target, from_chat_id, [plan for _, plan in chunk]) for from_chat_id, chunk in chunks),
+        *(send_to_target(bot, plans[index], target) for index in single),
+        return_exceptions=True
+    )
+    results = [None] * len(plans)
+    for (_, chunk), outcome in zip(chunks, outcomes):
+        for position, (index, _) in enumerate(chunk):
+            results[index] = outcome if isinstance(outcome, Exception) else outcome[position]
+    for index, outcome in zip(single, outcomes[len(chunks):]):
+        results[index] = outcome
+    return results
+
+def retry_delay(attempts: int) -> float:
+    """`attempts` ta muvaffaqiyatsiz urinishdan keyingi kutish (soniya): 1x, 2x, 4x, ... DELIVERY_RETRY_MAX gacha."""
+    return min(DELIVERY_RETRY_BASE * 2 ** (attempts - 1), DELIVERY_RETRY_MAX)
+
+def delivery_result(result, attempts: int, now: datetime.datetime) -> dict:
+    """Yuborish natijasini Delivery maydonlariga aylantiradi."""
+    if isinstance(result, Exception):
+        if attempts >= DELIVERY_MAX_ATTEMPTS:
+            return {"status": "dead", "message_ids": None, "error": str(result), "next_attempt_at": None}
+        return {
+            "status": "failed",
+            "message_ids": None,
+            "error": str(result),
+            "next_attempt_at": now + datetime.timedelta(seconds=retry_delay(attempts)),
+        }
+    return {"status": "sent", "message_ids": json.dumps(result), "error": None, "next_attempt_at": None}
+
 async def forward_listing(bot: Bot, listing: HouseListing):
+    await forward_listings(bot, [listing])
+
+async def forward_listings(bot: Bot, listings: list):
     """
     Agar e'lon media guruh bo'lsa, barcha media elementlarni birlashtirib yuboradi;
-    aks holda oddiy xabarni tarqatadi.
-    Har bir maqsad guruhiga yuborishda qisqa kechikish qo'shilgan.
+    aks holda oddiy xabarni tarqatadi (BATCH_SEND da — partiyalab, send_many_to_target).
+    Shu jarayonga tegishli guruhlarga bir vaqtda yuboriladi; tezlik ratelimit.limiter orqali cheklanadi.
+    Boshqa forwarderlarning guruhlari uchun "pending" yozuv qoldiriladi — ularni o'sha forwarderlar yuboradi.
+    Har bir e'lonning har bir guruhdagi natijasi yetkazib berish jurnaliga alohida yoziladi.
     """
-    forwarded = {}
-    for target in TARGET_GROUPS:
-        try:
-            if listing.media_group_id and listing.media_group_data:
-                media_items = json.loads(listing.media_group_data)
-                input_media = []
-                for i, item in enumerate(media_items):
-                    if item["type"] == "photo":
-                        media = InputMediaPhoto(media=item["file_id"])
-                    elif item["type"] == "video":
-                        media = InputMediaVideo(media=item["file_id"])
-                    else:
-                        continue
-                    # Faqat birinchi media elementiga (agar mavjud bo'lsa) yozuv qo'shamiz
-                    if i == 0 and listing.caption:
-                        media.caption = listing.caption + """\nhttps://t.me/navoiy_1x_uylar
-https://t.me/navoiy_1_2x_uylar
-https://t.me/navoiy_2x_uylar
-https://t.me/navoiy_2_3x_uylar
-https://t.me/navoiy_3x_uylar
-https://t.me/navoiy_3_4x_uylar
-https://t.me/navoiy_4x_uylar
-https://t.me/navoiy_4_5x_uylar
-https://t.me/navoiy_5x_uylar
-https://t.me/navoiy_reklama_uylar
-https://t.me/navoiy_hovli_kottedj
-https://t.me/navoiy_ijaragaa_uylar"""
-                        media.parse_mode = "HTML"
-                    input_media.append(media)
-                messages = await bot.send_media_group(chat_id=target, media=input_media)
-                forwarded[str(target)] = [msg.message_id for msg in messages]
-            else:
-                msg = await bot.forward_message(
-                    chat_id=target,
-                    from_chat_id=listing.source_group_id,
-                    message_id=listing.source_message_id
+    targets = owned_targets()
+    plans = [send_plans.get(listing) for listing in listings]
+    results = await asyncio.gather(
+        *(send_many_to_target(bot, plans, target) for target in targets),
+        return_exceptions=True
+    )
+    now = datetime.datetime.now()
+    pending = False
+    for index, listing in enumerate(listings):
+        for target in TARGET_GROUPS:
+            if target not in targets:
+                pending = True
+                write_buffer.add_delivery(
+                    listing=listing.id, target_id=target, round=listing_queue.round, attempts=0,
+                    status="pending", message_ids=None, error=None, next_attempt_at=now,
+                    created_at=now, updated_at=now
                 )
-                forwarded[str(target)] = [msg.message_id]
+        errors = []
+        for target, target_results in zip(targets, results):
+            result = target_results if isinstance(target_results, Exception) else target_results[index]
+            if isinstance(result, Exception):
+                logging.error(f"🚫 Xato: E'lon {listing.post_id} ni {target} ga yuborishda: {result}")
+                errors.append(f"{target}: {result}")
+            write_buffer.add_delivery(
+                listing=listing.id, target_id=target, round=listing_queue.round, attempts=1,
+                created_at=now, updated_at=now, **delivery_result(result, 1, now)
+            )
+        if errors:
+            listing.error_details = "\n".join(errors)
+            write_buffer.update(listing.id, error_details=listing.error_details)
+    if pending:
+        # Yozuvlar bazaga tushgandan keyin egalari uyg'otiladi
+        await write_buffer.flush()
+        await control.send_command("deliveries_pending")
+
+def _cancel_stale_deliveries() -> int:
+    """
+    Qayta urinish endi kerak bo'lmagan yozuvlarni bekor qiladi: e'lon o'chirilgan
+    yoki o'sha guruhga keyinroq qayta yuborilgan.
+    """
+    newer = Delivery.alias()
+    superseded = newer.select().where(
+        (newer.listing == Delivery.listing) & (newer.target_id == Delivery.target_id) & (newer.id > Delivery.id)
+    )
+    deleted = HouseListing.select(HouseListing.id).where(HouseListing.status == "deleted")
+    return (Delivery
+            .update(status="cancelled", next_attempt_at=None, updated_at=datetime.datetime.now())
+            .where(Delivery.status.in_(["pending", "failed"]) &
+                   (fn.EXISTS(superseded) | Delivery.listing.in_(deleted)))
+            .execute())
+
+def _due_deliveries(now: datetime.datetime, targets: list, limit: int) -> list:
+    return list(Delivery
+                .select(Delivery, HouseListing)
+                .join(HouseListing)
+                .where(Delivery.status.in_(["pending", "failed"]) &
+                       (Delivery.next_attempt_at <= now) &
+                       Delivery.target_id.in_(targets))
+                .order_by(Delivery.next_attempt_at)
+                .limit(limit))
+
+def _save_retries(updates: list):
+    for delivery_id, fields in updates:
+        Delivery.update(**fields).where(Delivery.id == delivery_id).execute()
+
+async def retry_failed_deliveries(bot: Bot, limit: int = 100) -> int:
+    """
+    Vaqti kelgan muvaffaqiyatsiz va boshqa forwarder qoldirgan (pending) yetkazib
+    berishlarni faqat o'sha guruhlarga, faqat shu jarayonga tegishli bo'lsa yuboradi.
+    Yozuvlar guruh bo'yicha yig'iladi, shuning uchun BATCH_SEND da qarz bir necha so'rovda qoplanadi.
+    """
+    targets = owned_targets()
+    if not targets:
+        return 0
+    # Buferdagi yangi yozuvlar bazaga tushmasa, eskirganlari aniqlanmaydi
+    await write_buffer.flush()
+    await db_write(_cancel_stale_deliveries)
+    deliveries = await db_read(_due_deliveries, datetime.datetime.now(), targets, limit)
+    if not deliveries:
+        return 0
+    by_target = {}
+    for delivery in deliveries:
+        by_target.setdefault(delivery.target_id, []).append(delivery)
+    outcomes = await asyncio.gather(
+        *(send_many_to_target(bot, [send_plans.get(d.listing) for d in group], target)
+          for target, group in by_target.items()),
+        return_exceptions=True
+    )
+    results = {}
+    for group, outcome in zip(by_target.values(), outcomes):
+        for position, delivery in enumerate(group):
+            results[delivery.id] = outcome if isinstance(outcome, Exception) else outcome[position]
+    now = datetime.datetime.now()
+    updates = []
+    for delivery in deliveries:
+        result = results[delivery.id]
+        attempts = delivery.attempts + 1
+        fields = delivery_result(result, attempts, now)
+        if fields["status"] == "dead":
+            logging.error(f"☠️ E'lon {delivery.listing.post_id} ni {delivery.target_id} ga yuborib bo'lmadi "
+                          f"({attempts} urinish): {result}")
+        updates.append((delivery.id, {**fields, "attempts": attempts, "updated_at": now}))
+    await db_write(_save_retries, updates)
+    sent = sum(1 for _, fields in updates if fields["status"] == "sent")
+    logging.info(f"🔁 Qayta yuborish: {sent}/{len(updates)} ta muvaffaqiyatli")
+    return len(updates)
+
+async def delivery_retry_task(bot: Bot):
+    while True:
+        # Boshqa forwarder pending yozuv qoldirsa, kutish muddatidan oldin uyg'onamiz
+        try:
+            await asyncio.wait_for(deliveries_due.wait(), DELIVERY_RETRY_INTERVAL)
+        except asyncio.TimeoutError:
+            pass
+        # Ketma-ket kelgan bildirishnomalar bitta tekshiruvga yig'iladi
+        await asyncio.sleep(DELIVERY_POLL_MIN)
+        deliveries_due.clear()
+        if not state.SENDING_ENABLED:
+            continue
+        try:
+            await retry_failed_deliveries(bot)
         except Exception as e:
-            logging.error(f"🚫 Xato: E'lon {listing.post_id} ni {target} ga yuborishda: {e}")
-            listing.status = "error"
-            listing.error_details = str(e)
-            listing.save()
-        await asyncio.sleep(1)
-    if forwarded:
-        listing.forwarded_message_ids = json.dumps(forwarded)
-        listing.save()
+            logging.error(f"❌ Qayta yuborishda xato: {e}")
+
+def _sync_listing(listing: HouseListing):
+    listing_queue.sync(listing)
+    boost_scheduler.sync(listing)
+    send_plans.invalidate(listing.id)
+
+def _remove_listing(listing_id: int):
+    listing_queue.discard(listing_id)
+    boost_scheduler.discard(listing_id)
+    send_plans.invalidate(listing_id)
+
+def listing_changed(listing: HouseListing):
+    """
+    E'lon tahrirlangandan keyin navbat, boost rejalashtiruvchisi va yuborish rejasini
+    yangilaydi hamda boshqa jarayonlarga xabar beradi.
+    """
+    _sync_listing(listing)
+    control.notify_changed(listing.id)
+
+def listing_removed(listing_id: int):
+    _remove_listing(listing_id)
+    control.notify_changed(listing_id)
+
+async def apply_remote_changes(listing_ids: list):
+    """Boshqa jarayonda o'zgargan e'lonlarni bazadan qayta o'qib, mahalliy holatni yangilaydi."""
+    listings = await db_read(lambda: list(HouseListing.select().where(HouseListing.id.in_(listing_ids))))
+    found = set()
+    for listing in listings:
+        found.add(listing.id)
+        _sync_listing(listing)
+    for listing_id in set(listing_ids) - found:
+        _remove_listing(listing_id)
+
+async def request_refresh(payload=None):
+    state.REFRESH_REQUESTED = True
+
+async def deliveries_pending(payload=None):
+    deliveries_due.set()
+
+control.on("listings_changed", apply_remote_changes)
+control.on("refresh", request_refresh)
+control.on("deliveries_pending", deliveries_pending)
+
+async def save_pacer(force: bool = True):
+    """Slot holatini saqlaydi: qayta ishga tushgan yoki yangi navbat yurituvchi qarzni davom ettiradi."""
+    global _pacer_saved
+    if not pacer.interval or (not force and time.monotonic() - _pacer_saved < PACER_SAVE_EVERY):
+        return
+    _pacer_saved = time.monotonic()
+    try:
+        await control.set_flag("pacer", pacer.state())
+    except Exception as e:
+        logging.error(f"❌ Yuborish jadvalini saqlashda xato: {e}")
+
+async def schedule_preview(slots: int) -> list:
+    """
+    Keyingi `slots` ta yuborish tartibi (hech narsa yuborilmaydi). Navbatni shu jarayon yuritsa,
+    xotiradagi holatdan olinadi; aks holda (veb jarayon yoki boshqa forwarder) navbat, boost
+    ro'yxati va slot holati bazadan o'qiladi — bunda boost navbati hisoblagichlari noldan boshlanadi.
+    """
+    if _tasks and is_scheduler():
+        return boost_scheduler.preview(listing_queue.peek(slots), pacer.slots(slots))
+    _, due = await db_read(listing_queue._load_due)
+    scheduler = FairScheduler(REGULAR_WEIGHT, BOOST_WEIGHT, BOOST_MAX_PER_HOUR, BOOST_MIN_SPACING)
+    await scheduler.load()
+    slot_pacer = create_pacer()
+    slot_pacer.restore(await control.get_flag("pacer", {}))
+    regular = heapq.nsmallest(slots, due, key=lambda row: (row[1], row[0]))
+    return scheduler.preview(regular, slot_pacer.slots(slots))
 
 async def forwarding_task(bot: Bot):
-    counter = 0
+    """
+    Har bir slotda bitta e'lon yuboriladi; slotlar vaqtini pacing.pacer belgilaydi
+    (POSTS_PER_HOUR, QUIET_HOURS), shuning uchun tezlik e'lonlar soni va xatolarga bog'liq emas.
+    BATCH_SEND yoqilgan bo'lsa, cheklovsiz rejimda slotda BATCH_SEND_SIZE tagacha, qarzni qoplashda
+    esa vaqti o'tgan slotlar soniga (BATCH_SEND_SIZE gacha) teng e'lon bitta partiyada yuboriladi.
+    """
+    leading = False
     while True:
-        if state.REFRESH_REQUESTED:
-            logging.info("🔄 /refresh buyrug'i qabul qilindi: Bazadagi o'zgarishlar yangilandi!")
+        if not is_scheduler():
+            # Navbatni boshqa forwarder yuritadi; bu jarayon faqat o'z guruhlariga pending yozuvlarni yuboradi
+            leading = False
+            await asyncio.sleep(POLL_INTERVAL)
+            continue
+        if not leading or state.REFRESH_REQUESTED:
+            if not leading:
+                pacer.restore(await control.get_flag("pacer", {}))
+            refresh, leading = state.REFRESH_REQUESTED, True
             state.REFRESH_REQUESTED = False
-            await asyncio.sleep(1)
+            with forwarding_phase_seconds.time(phase="rebuild"):
+                await listing_queue.rebuild()
+                await boost_scheduler.load()
+            if refresh:
+                logging.info("🔄 /refresh buyrug'i qabul qilindi: Navbat bazadan qayta qurildi!")
             continue
 
         if not state.SENDING_ENABLED:
-            await asyncio.sleep(FORWARD_INTERVAL)
+            pacer.idle(time.time())
+            await save_pacer(force=False)
+            await asyncio.sleep(POLL_INTERVAL)
             continue
 
+        # Slot vaqtini kutamiz; uzoq kutishda (jim soatlar) holat vaqti-vaqti bilan qayta tekshiriladi
+        delay = pacer.next_slot(time.time()) - time.time()
+        if delay > 0:
+            with forwarding_phase_seconds.time(phase="interval"):
+                await asyncio.sleep(min(delay, POLL_INTERVAL))
+            continue
+
+        slot_used = False
         try:
-            # Yangi e'lonlarni (status "active") yuborish
-            listings = []
-            for src in SOURCE_GROUPS:
-                listings.extend(list(HouseListing.select().where(
-                    (HouseListing.source_group_id == src) & (HouseListing.status == "active")
-                )))
-            listings.sort(key=lambda x: int(x.post_id))
-            for listing in listings:
-                if not state.SENDING_ENABLED:
+            # BATCH_SEND cheklovsiz rejimda (POSTS_PER_HOUR=0) bitta slotda bir nechta e'lonni yuboradi,
+            # to'xtalishdan keyin esa vaqti o'tgan slotlarni bitta chaqiruvda qoplaydi
+            batch_size = 1
+            if BATCH_SEND in BATCH_METHODS:
+                batch_size = min(pacer.overdue(time.time()), BATCH_SEND_SIZE) if pacer.interval else BATCH_SEND_SIZE
+            picked = {}     # listing_id -> (listing, kind)
+            while len(picked) < batch_size:
+                kind, listing = await _pick_listing(new_round=not picked)
+                if kind is None:
                     break
-                await forward_listing(bot, listing)
-                listing.status = "sent"
-                listing.save()
-                counter += 1
-                # BOOST_EVERY_N ta yangi e'lon yuborilgandan so'ng boost qilingan e'lonlarni qayta yuborish
-                if counter % BOOST_EVERY_N == 0:
-                    boosted_listings = HouseListing.select().where(HouseListing.boost_status == "boosted")
-                    for boosted in boosted_listings:
-                        await forward_listing(bot, boosted)
-                await asyncio.sleep(FORWARD_INTERVAL)
-
-            # Agar aktiv post qolmasa, barcha "sent" postlarni qayta "active" qilamiz.
-            active_count = HouseListing.select().where(HouseListing.status == "active").count()
-            if active_count == 0:
-                sent_listings = HouseListing.select().where(HouseListing.status == "sent")
-                for listing in sent_listings:
-                    listing.status = "active"
-                    listing.save()
+                if listing is None:
+                    continue
+                if listing.id in picked:
+                    # Boost va odatiy navbatdan bir xil e'lon: bir marta yuboriladi, aylanish baribir belgilanadi
+                    if kind == "regular":
+                        picked[listing.id] = (listing, kind)
+                    continue
+                picked[listing.id] = (listing, kind)
+
+            if not picked:
+                # Na navbat, na vaqti kelgan boost bor
+                pacer.idle(time.time())
+                await save_pacer(force=False)
+                with forwarding_phase_seconds.time(phase="idle"):
+                    await listing_queue.wait(POLL_INTERVAL)
+                continue
+
+            pacer.mark_sent(time.time(), len(picked))
+            slot_used = True
+            await save_pacer()
+            with forwarding_phase_seconds.time(phase="send"):
+                await forward_listings(bot, [listing for listing, _ in picked.values()])
+            for listing, kind in picked.values():
+                forwarded_listings.inc(kind=kind)
+                if kind == "regular":
+                    write_buffer.update(listing.id, sent_round=listing_queue.round)
 
         except Exception as e:
             logging.error(f"Error processing listings: {e}")
-            await asyncio.sleep(FORWARD_INTERVAL)
-        await asyncio.sleep(FORWARD_INTERVAL)
+            # Xato ham slotni egallaydi; cheklovsiz rejimda esa aylanib qolmaslik uchun kutamiz
+            if not slot_used:
+                pacer.mark_sent(time.time())
+                await save_pacer()
+            if not pacer.interval:
+                await asyncio.sleep(1)
+
+async def _pick_listing(new_round: bool = True) -> tuple:
+    """
+    Keyingi e'lonni tanlaydi: odatiy yoki boost qilingan (og'irliklar bo'yicha).
+    (kind, listing) qaytaradi; yuboradigan narsa bo'lmasa kind None, tanlangan e'lon
+    eskirgan bo'lsa listing None. Navbat bo'sh bo'lsa va `new_round` bo'lsa, yangi aylanish boshlanadi
+    (partiya o'rtasida boshlanmaydi — aks holda shu partiyadagi e'lonlar yana navbatga tushadi).
+    Joriy aylanishda hech narsa yuborilmagan bo'lsa (faol e'lon yo'q), aylanish almashtirilmaydi.
+    """
+    if not listing_queue and new_round and await db_read(Counter.get_value, "round_sent") > 0:
+        # Navbat bo'sh: yangi aylanishni boshlaymiz (bitta hisoblagich)
+        with forwarding_phase_seconds.time(phase="new_round"):
+            await db_write(start_new_round)
+            await listing_queue.rebuild()
+
+    kind, boost_id = boost_scheduler.next(has_regular=len(listing_queue) > 0)
+    if kind is None:
+        return None, None
+    if kind == "boost":
+        with forwarding_phase_seconds.time(phase="load"):
+            listing = await db_read(HouseListing.get_or_none, HouseListing.id == boost_id)
+        if listing is None or listing.boost_status != "boosted" or listing.status != "active":
+            boost_scheduler.discard(boost_id)
+            return kind, None
+    else:
+        listing_id = listing_queue.pop()
+        with forwarding_phase_seconds.time(phase="load"):
+            listing = await db_read(HouseListing.get_or_none, HouseListing.id == listing_id)
+        if listing is None or not listing_queue.is_due(listing):
+            return kind, None
+    return kind, listing
+
+
+async def start_forwarder(bot: Bot):
+    """Ijaralarni oladi va yuborish vazifalarini ishga tushiradi (control.start() dan keyin)."""
+    await leases.start()
+    _tasks.append(asyncio.create_task(forwarding_task(bot)))
+    _tasks.append(asyncio.create_task(delivery_retry_task(bot)))
+
+async def stop_forwarder():
+    # Avval yuborishni to'xtatamiz, keyin ijaralarni bo'shatamiz
+    tasks = list(_tasks)
+    _tasks.clear()
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+    if leases.running:
+        await leases.stop()
@@ -1,94 +1,94 @@
-import asyncio
-import logging
-import json
-import datetime
+from aiogram import Dispatcher, types
 from models import HouseListing
-from config import TARGET_GROUPS, SOURCE_GROUPS, FORWARD_INTERVAL, BOOST_EVERY_N
-from aiogram import Bot
-from aiogram.types import InputMediaPhoto, InputMediaVideo
+from config import ADMIN_IDS, SOURCE_GROUPS
+from aiodb import db_read, db_write
+from forwarding import listing_changed
+from control import control
+from stats import stats_cache
+from deletion import detach_forwarded_messages, source_messages, merge_messages, schedule_deletion
+from writebehind import write_buffer
+from ingest import ingest_pipeline
 import state
-async def forward_listing(bot: Bot, listing: HouseListing):
-    """
-    Agar e'lon media guruh bo'lsa, barcha media elementlarni birlashtirib yuboradi;
-    aks holda oddiy xabarni tarqatadi.
-    Har bir maqsad guruhiga yuborishda qisqa kechikish qo'shilgan.
-    """
-    forwarded = {}
-    for target in TARGET_GROUPS:
-        try:
-            if listing.media_group_id and listing.media_group_data:
-                media_items = json.loads(listing.media_group_data)
-                input_media = []
-                for i, item in enumerate(media_items):
-                    if item["type"] == "photo":
-                        media = InputMediaPhoto(media=item["file_id"])
-                    elif item["type"] == "video":
-                        media = InputMediaVideo(media=item["file_id"])
-                    else:
-                        continue
-                    # Faqat birinchi media elementiga (agar mavjud bo'lsa) yozuv qo'shamiz
-                    if i == 0 and listing.caption:
-                        media.caption = listing.caption
-                        media.parse_mode = "HTML"
-                    input_media.append(media)
-                messages = await bot.send_media_group(chat_id=target, media=input_media)
-                forwarded[str(target)] = [msg.message_id for msg in messages]
-            else:
-                msg = await bot.forward_message(
-                    chat_id=target,
-                    from_chat_id=listing.source_group_id,
-                    message_id=listing.source_message_id
-                )
-                forwarded[str(target)] = [msg.message_id]
-        except Exception as e:
-            logging.error(f"🚫 Xato: E'lon {listing.post_id} ni {target} ga yuborishda: {e}")
-            listing.status = "error"
-            listing.error_details = str(e)
-            listing.save()
-        await asyncio.sleep(1)
-    if forwarded:
-        listing.forwarded_message_ids = json.dumps(forwarded)
-        listing.save()
-async def forwarding_task(bot: Bot):
-    counter = 0
-    while True:
-        if state.REFRESH_REQUESTED:
-            logging.info("🔄 /refresh buyrug'i qabul qilindi: Bazadagi o'zgarishlar yangilandi!")
-            state.REFRESH_REQUESTED = False
-            await asyncio.sleep(1)
-            continue
-        if not state.SENDING_ENABLED:
-            await asyncio.sleep(FORWARD_INTERVAL)
-            continue
-        try:
-            # Yangi e'lonlarni (status "active") yuborish
-            listings = []
-            for src in SOURCE_GROUPS:
-                listings.extend(list(HouseListing.select().where(
-                    (HouseListing.source_group_id == src) & (HouseListing.status == "active")
-                )))
-            listings.sort(key=lambda x: int(x.post_id))
-            for listing in listings:
-                if not state.SENDING_ENABLED:
-                    break
-                await forward_listing(bot, listing)
-                listing.status = "sent"
-                listing.save()
-                counter += 1
-                # BOOST_EVERY_N ta yangi e'lon yuborilgandan so'ng boost qilingan e'lonlarni qayta yuborish
-                if counter % BOOST_EVERY_N == 0:
-                    boosted_listings = HouseListing.select().where(HouseListing.boost_status == "boosted")
-                    for boosted in boosted_listings:
-                        await forward_listing(bot, boosted)
-                await asyncio.sleep(FORWARD_INTERVAL)
-            # Agar aktiv post qolmasa, barcha "sent" postlarni qayta "active" qilamiz.
-            active_count = HouseListing.select().where(HouseListing.status == "active").count()
-            if active_count == 0:
-                sent_listings = HouseListing.select().where(HouseListing.status == "sent")
-                for listing in sent_listings:
-                    listing.status = "active"
-                    listing.save()
-        except Exception as e:
-            logging.error(f"Error processing listings: {e}")
-            await asyncio.sleep(FORWARD_INTERVAL)
-        await asyncio.sleep(FORWARD_INTERVAL)
\ No newline at end of file
+
+INGEST_CONTENT_TYPES = [
+    types.ContentType.TEXT,
+    types.ContentType.PHOTO,
+    types.ContentType.VIDEO,
+    types.ContentType.DOCUMENT,
+    types.ContentType.ANIMATION,
+]
+
+
+async def source_message(message: types.Message):
+    if message.is_command():
+        return
+    ingest_pipeline.add_message(message)
+
+async def source_edit(message: types.Message):
+    ingest_pipeline.add_edit(message)
+
+async def find_listing(message: types.Message):
+    post_id = message.get_args().strip()
+    if not post_id.isdigit():
+        await message.reply("❌ E'lon ID sini kiriting, masalan: /boost 123")
+        return None
+    # Buferdagi yetkazib berish natijalari avval bazaga yozilsin
+    await write_buffer.flush()
+    listing = await db_read(lambda: HouseListing.select().where(
+        HouseListing.post_id == int(post_id)).order_by(HouseListing.id).first())
+    if listing is None:
+        await message.reply("❌ E'lon topilmadi")
+    return listing
+
+async def cmd_start(message: types.Message):
+    stats = await db_read(stats_cache.get)
+    await message.reply(
+        "📊 Statistika:\n"
+        f"Jami e'lonlar: {stats['listings']['total']}\n"
+        f"Navbatda: {stats['round']['queued']}\n"
+        f"Boost qilingan: {stats['listings']['by_boost'].get('boosted', 0)}\n"
+        f"Oxirgi soatda yuborilgan: {stats['sent_last_hour']}\n"
+        f"Yuborish rejimi: {'ON' if stats['sending_enabled'] else 'OFF'}"
+    )
+
+async def cmd_boost(message: types.Message):
+    listing = await find_listing(message)
+    if listing is None:
+        return
+    listing.boost_status = "boosted" if message.get_command(pure=True) == "boost" else "unboosted"
+    await db_write(listing.save)
+    listing_changed(listing)
+    await message.reply(f"🔄 E'lon {listing.post_id} boost holati: {listing.boost_status}")
+
+async def cmd_delete(message: types.Message):
+    listing = await find_listing(message)
+    if listing is None:
+        return
+    listing.status = "deleted"
+    messages = await db_write(detach_forwarded_messages, [listing.id], listing.save)
+    merge_messages(messages, source_messages(listing))
+    listing_changed(listing)
+    schedule_deletion(message.bot, messages)
+    await message.reply(f"🗑️ E'lon {listing.post_id} o'chirildi.")
+
+async def cmd_sending(message: types.Message):
+    await control.set_sending(message.get_command(pure=True) == "on")
+    await message.reply(f"Yuborish rejimi: {'ON' if state.SENDING_ENABLED else 'OFF'}")
+
+async def cmd_refresh(message: types.Message):
+    # Shu jarayondagi forwarder uchun flag, boshqa jarayonlar uchun buyruq
+    state.REFRESH_REQUESTED = True
+    await control.send_command("refresh")
+    await message.reply("🔄 Navbat bazadan qayta quriladi.")
+
+def register_handlers(dp: Dispatcher):
+    dp.register_message_handler(cmd_start, commands=["start"], user_id=ADMIN_IDS)
+    dp.register_message_handler(cmd_boost, commands=["boost", "unboost"], user_id=ADMIN_IDS)
+    dp.register_message_handler(cmd_delete, commands=["del"], user_id=ADMIN_IDS)
+    dp.register_message_handler(cmd_sending, commands=["on", "off"], user_id=ADMIN_IDS)
+    dp.register_message_handler(cmd_refresh, commands=["refresh"], user_id=ADMIN_IDS)
+
+    dp.register_message_handler(source_message, chat_id=SOURCE_GROUPS, content_types=INGEST_CONTENT_TYPES)
+    dp.register_channel_post_handler(source_message, chat_id=SOURCE_GROUPS, content_types=INGEST_CONTENT_TYPES)
+    dp.register_edited_message_handler(source_edit, chat_id=SOURCE_GROUPS, content_types=INGEST_CONTENT_TYPES)
+    dp.register_edited_channel_post_handler(source_edit, chat_id=SOURCE_GROUPS, content_types=INGEST_CONTENT_TYPES)
@@ -0,0 +1,261 @@
+import asyncio
+import datetime
+import json
+import logging
+from typing import Optional
+from aiogram import types
+from models import HouseListing
+from aiodb import db_write
+from forwarding import listing_changed
+from duplicates import fingerprint, listing_fingerprint, resolve_duplicates
+from config import INGEST_ALBUM_DELAY, INGEST_BATCH_SIZE, INGEST_FLUSH_INTERVAL
+
+INSERT_CHUNK = 100
+
+
+def post_url(chat: types.Chat, message_id: int) -> str:
+    if chat.username:
+        return f"https://t.me/{chat.username}/{message_id}"
+    # -100XXXXXXXXXX ko'rinishidagi supergroup/kanal ID si
+    return f"https://t.me/c/{str(chat.id).removeprefix('-100')}/{message_id}"
+
+def media_item(message: types.Message):
+    if message.photo:
+        photo = message.photo[-1]
+        return {"type": "photo", "file_id": photo.file_id, "file_unique_id": photo.file_unique_id,
+                "message_id": message.message_id}
+    if message.video:
+        return {"type": "video", "file_id": message.video.file_id, "file_unique_id": message.video.file_unique_id,
+                "message_id": message.message_id}
+    # GIF da document ham bo'ladi; animatsiyalar albomga kirmaydi, faqat barmoq izi uchun
+    if message.animation:
+        return {"type": "animation", "file_id": message.animation.file_id,
+                "file_unique_id": message.animation.file_unique_id, "message_id": message.message_id}
+    if message.document:
+        return {"type": "document", "file_id": message.document.file_id,
+                "file_unique_id": message.document.file_unique_id, "message_id": message.message_id}
+    return None
+
+def listing_row(messages: list) -> dict:
+    """Bitta xabar yoki albom qismlaridan HouseListing qatorini tuzadi."""
+    messages = sorted(messages, key=lambda m: m.message_id)
+    first = messages[0]
+    captioned = next((m for m in messages if m.caption or m.text), None)
+    caption = captioned.html_text if captioned else None
+    row = {
+        "post_id": first.message_id,
+        "post_url": post_url(first.chat, first.message_id),
+        "source_message_id": first.message_id,
+        "source_group_id": first.chat.id,
+        "status": "active",
+        "sent_round": 0,
+        "timestamp": datetime.datetime.now(),
+        "media_group_id": first.media_group_id,
+        "media_group_data": None,
+        "caption": caption,
+    }
+    items = [item for item in map(media_item, messages) if item]
+    for item in items:
+        if captioned and item["message_id"] == captioned.message_id:
+            # Albom matni shu qismdan olingan (tahrirlarda kerak bo'ladi)
+            item["caption"] = True
+    if first.media_group_id:
+        row["media_group_data"] = json.dumps(items)
+    row["fingerprint"] = fingerprint(caption, [item["file_unique_id"] for item in items])
+    return row
+
+def apply_edit(current_caption: Optional[str], media_group_data: Optional[str], source_message_id: int,
+               message_id: int, caption: Optional[str], item: Optional[dict]) -> tuple:
+    """
+    Tahrirlangan xabarni e'lonning matni va albom ma'lumotlariga qo'llaydi: (caption, media_group_data).
+    Matnni faqat matnli xabar yoki albom matnining egasi o'zgartiradi — matnsiz albom qismining
+    tahriri e'lon matnini o'chirmaydi. Albom qismining mediasi almashsa, uning yozuvi yangilanadi.
+    """
+    items = json.loads(media_group_data) if media_group_data else []
+    owner = next((entry["message_id"] for entry in items if entry.get("caption")), source_message_id)
+    if caption is not None or message_id == owner:
+        current_caption = caption
+        for entry in items:
+            entry.pop("caption", None)
+            if caption is not None and entry["message_id"] == message_id:
+                entry["caption"] = True
+    for index, entry in enumerate(items):
+        if item and entry["message_id"] == message_id:
+            items[index] = {**item, "caption": True} if entry.get("caption") else item
+    return current_caption, json.dumps(items) if media_group_data else media_group_data
+
+
+class IngestPipeline:
+    """
+    Manba guruhlardan kelgan xabarlarni e'lonlarga aylantiradi.
+    Albom qismlari media_group_id bo'yicha yig'iladi va oxirgi qismdan keyin
+    `album_delay` soniya o'tgach bitta e'lon bo'ladi. Tayyor e'lonlar va
+    tahrirlar xotirada birlashtirilib, `flush_interval` soniyada bir marta yoki
+    `batch_size` taga yetganda bitta tranzaksiyada yoziladi.
+    """
+
+    def __init__(self, album_delay: float, batch_size: int, flush_interval: float):
+        self.album_delay = album_delay
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._albums = {}   # (chat_id, media_group_id) -> {"messages": [...], "handle": TimerHandle}
+        self._rows = {}     # (source_group_id, post_id) -> qator (takroriylar birlashadi)
+        self._edits = {}    # (chat_id, message_id) -> (media_group_id, caption, media_item)
+        self._timer = None
+        self._flushes = set()  # hajm bo'yicha boshlangan flush tasklari (close() kutadi)
+        self._lock = asyncio.Lock()
+
+    def add_message(self, message: types.Message):
+        if not message.media_group_id:
+            self._queue_row(listing_row([message]))
+            return
+        key = (message.chat.id, message.media_group_id)
+        album = self._albums.setdefault(key, {"messages": [], "handle": None})
+        album["messages"].append(message)
+        if album["handle"] is not None:
+            album["handle"].cancel()
+        album["handle"] = asyncio.get_running_loop().call_later(self.album_delay, self._close_album, key)
+
+    def add_edit(self, message: types.Message):
+        caption = message.html_text if (message.caption or message.text) else None
+        item = media_item(message)
+        # Hali bazaga yozilmagan e'lon bo'lsa, to'g'ridan-to'g'ri uni yangilaymiz
+        album = self._albums.get((message.chat.id, message.media_group_id))
+        if album is not None:
+            album["messages"] = [m for m in album["messages"] if m.message_id != message.message_id] + [message]
+            return
+        for row in self._rows.values():
+            if row["source_group_id"] == message.chat.id and (
+                    row["source_message_id"] == message.message_id or
+                    (message.media_group_id and row["media_group_id"] == message.media_group_id)):
+                row["caption"], row["media_group_data"] = apply_edit(
+                    row["caption"], row["media_group_data"], row["source_message_id"],
+                    message.message_id, caption, item)
+                if row["media_group_data"]:
+                    media = [entry["file_unique_id"] for entry in json.loads(row["media_group_data"])]
+                else:
+                    media = [item["file_unique_id"]] if item else []
+                row["fingerprint"] = fingerprint(row["caption"], media)
+                return
+        self._edits[(message.chat.id, message.message_id)] = (message.media_group_id, caption, item)
+        self._schedule_flush()
+
+    def _close_album(self, key):
+        album = self._albums.pop(key, None)
+        if album:
+            self._queue_row(listing_row(album["messages"]))
+
+    def _queue_row(self, row: dict):
+        self._rows[(row["source_group_id"], row["post_id"])] = row
+        self._schedule_flush()
+
+    def _schedule_flush(self):
+        if len(self._rows) + len(self._edits) >= self.batch_size:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        self._timer = None
+        await self.flush()
+
+    @staticmethod
+    def _write(rows: list, edits: dict) -> list:
+        by_group = {}
+        for row in rows:
+            by_group.setdefault(row["source_group_id"], []).append(row["post_id"])
+        # Qayta kelgan xabarlar takror hisoblanmaydi — faqat yangi qo'shilganlar tekshiriladi
+        existing = set()
+        for group_id, post_ids in by_group.items():
+            existing.update(HouseListing
+                            .select(HouseListing.source_group_id, HouseListing.post_id)
+                            .where((HouseListing.source_group_id == group_id) & HouseListing.post_id.in_(post_ids))
+                            .tuples())
+        for i in range(0, len(rows), INSERT_CHUNK):
+            (HouseListing
+             .insert_many(rows[i:i + INSERT_CHUNK])
+             .on_conflict(
+                 conflict_target=[HouseListing.source_group_id, HouseListing.post_id],
+                 preserve=[HouseListing.caption, HouseListing.media_group_id, HouseListing.media_group_data,
+                           HouseListing.fingerprint])
+             .execute())
+        changed = []
+        for group_id, post_ids in by_group.items():
+            changed.extend(HouseListing.select().where(
+                (HouseListing.source_group_id == group_id) & HouseListing.post_id.in_(post_ids)))
+        changed.extend(resolve_duplicates(
+            [listing for listing in changed if (listing.source_group_id, listing.post_id) not in existing]))
+        for (chat_id, message_id), (media_group_id, caption, item) in edits.items():
+            condition = HouseListing.source_message_id == message_id
+            if media_group_id:
+                condition |= HouseListing.media_group_id == media_group_id
+            edited = list(HouseListing.select().where((HouseListing.source_group_id == chat_id) & condition))
+            for listing in edited:
+                values = apply_edit(listing.caption, listing.media_group_data, listing.source_message_id,
+                                    message_id, caption, item)
+                if values != (listing.caption, listing.media_group_data):
+                    listing.caption, listing.media_group_data = values
+                    HouseListing.update(caption=listing.caption, media_group_data=listing.media_group_data).where(
+                        HouseListing.id == listing.id).execute()
+            # Yakka xabarlarning mediasi bazada saqlanmaydi — barmoq izi uchun tahrirdan olinadi
+            media = [item["file_unique_id"]] if item else []
+            changed.extend(edited)
+            changed.extend(resolve_duplicates(IngestPipeline._refingerprint(edited, media)))
+        return changed
+
+    @staticmethod
+    def _refingerprint(listings: list, media: list) -> list:
+        """
+        Tahrirlangan e'lonlarning barmoq izini yangilaydi va izi o'zgarganlarini qaytaradi.
+        Boshqa matnga o'zgargan takror qayta faol bo'ladi — resolve_duplicates uni yana tekshiradi.
+        """
+        refreshed = []
+        for listing in listings:
+            value = listing_fingerprint(listing) if listing.media_group_data else fingerprint(listing.caption, media)
+            if value == listing.fingerprint:
+                continue
+            listing.fingerprint = value
+            if listing.status == "duplicate":
+                listing.status = "active"
+            HouseListing.update(fingerprint=value, status=listing.status).where(HouseListing.id == listing.id).execute()
+            refreshed.append(listing)
+        return refreshed
+
+    async def flush(self):
+        async with self._lock:
+            rows, self._rows = list(self._rows.values()), {}
+            edits, self._edits = self._edits, {}
+            if not rows and not edits:
+                return
+            try:
+                changed = await db_write(self._write, rows, edits)
+            except Exception as e:
+                logging.error(f"❌ {len(rows)} ta e'lon va {len(edits)} ta tahrirni yozishda xato: {e}")
+                # Keyingi urinishda yozilishi uchun qaytaramiz (yangiroq qiymatlar ustun)
+                for row in rows:
+                    self._rows.setdefault((row["source_group_id"], row["post_id"]), row)
+                for key, edit in edits.items():
+                    self._edits.setdefault(key, edit)
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+                return
+        for listing in changed:
+            listing_changed(listing)
+        logging.info(f"📝 {len(rows)} ta yangi e'lon va {len(edits)} ta tahrir saqlandi")
+
+    async def close(self):
+        for key in list(self._albums):
+            self._albums[key]["handle"].cancel()
+            self._close_album(key)
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes)
+        await self.flush()
+
+
+ingest_pipeline = IngestPipeline(INGEST_ALBUM_DELAY, INGEST_BATCH_SIZE, INGEST_FLUSH_INTERVAL)
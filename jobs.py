@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from typing import Optional
+from models import BackgroundJob
+from aiodb import db_read, db_write
+
+KEEP_JOBS = 200
+# Ishlayotgan fon ishining holati bazaga shuncha soniyada bir yoziladi
+JOB_SAVE_INTERVAL = 2
+
+
+class Job:
+    """Fonda bajariladigan ish va uning holati (status endpoint uchun)."""
+
+    def __init__(self, kind: str, total: int):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.state = "running"
+        self.total = total
+        self.done = 0
+        self.failed = 0
+        self.error = None
+        self.created = time.time()
+        self.finished = None
+
+    def as_dict(self) -> dict:
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "state": self.state,
+            "total": self.total,
+            "done": self.done,
+            "failed": self.failed,
+            "error": self.error,
+            "created": self.created,
+            "finished": self.finished,
+        }
+
+
+def _save(job: Job, keep: int):
+    BackgroundJob.replace(**job.as_dict()).execute()
+    if job.finished is not None:
+        # Bazada ham oxirgi `keep` ta ish qoladi
+        newest = BackgroundJob.select(BackgroundJob.id).order_by(BackgroundJob.created.desc()).limit(keep)
+        BackgroundJob.delete().where(BackgroundJob.id.not_in(newest)).execute()
+
+def _load(job_id: str) -> Optional[dict]:
+    row = BackgroundJob.get_or_none(BackgroundJob.id == job_id)
+    return row.__data__ if row is not None else None
+
+
+class JobRegistry:
+    """
+    Oxirgi `keep` ta fon ishini xotirada saqlaydi. Holat bazaga ham yoziladi (boshlanishda,
+    har `save_interval` soniyada va tugaganda), shuning uchun uni boshqa veb jarayonlar
+    (`uvicorn --workers N`) ham ko'radi.
+    """
+
+    def __init__(self, keep: int, save_interval: float):
+        self.keep = keep
+        self.save_interval = save_interval
+        self._jobs = OrderedDict()
+        # Ishlayotgan tasklar: ish ro'yxatdan chiqib ketsa ham GC tomonidan yo'qotilmaydi
+        self._tasks = set()
+
+    def start(self, kind: str, total: int, func) -> Job:
+        """`func(job)` korutinasini fonda ishga tushiradi."""
+        job = Job(kind, total)
+        self._jobs[job.id] = job
+        while len(self._jobs) > self.keep:
+            self._jobs.popitem(last=False)
+        task = asyncio.get_running_loop().create_task(self._run(job, func))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    async def _save(self, job: Job):
+        try:
+            await db_write(_save, job, self.keep)
+        except Exception as e:
+            logging.error(f"❌ Fon ishi {job.id} holatini saqlashda xato: {e}")
+
+    async def _run(self, job: Job, func):
+        await self._save(job)
+        work = asyncio.ensure_future(func(job))
+        try:
+            while not work.done():
+                await asyncio.wait({work}, timeout=self.save_interval)
+                if not work.done():
+                    await self._save(job)
+            work.result()
+            job.state = "done"
+        except Exception as e:
+            logging.error(f"❌ Fon ishi {job.kind} ({job.id}) xato bilan tugadi: {e}")
+            job.state = "failed"
+            job.error = str(e)
+        finally:
+            job.finished = time.time()
+            await self._save(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self._jobs.get(job_id)
+
+    async def status(self, job_id: str) -> Optional[dict]:
+        """Ish holati: shu jarayondagi ish bo'lsa xotiradan, aks holda bazadan."""
+        job = self._jobs.get(job_id)
+        if job is not None:
+            return job.as_dict()
+        return await db_read(_load, job_id)
+
+
+jobs = JobRegistry(KEEP_JOBS, JOB_SAVE_INTERVAL)
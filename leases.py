@@ -0,0 +1,98 @@
+import asyncio
+import logging
+import time
+from models import Lease
+from aiodb import db_write
+from ratelimit import limiter
+
+
+class LeaseManager:
+    """
+    Bir nechta forwarder o'rtasida ishni taqsimlaydi. Har bir forwarder
+    "worker:<id>" ijarasi bilan tirikligini bildiradi va maqsad guruhlarning
+    teng ulushini — ceil(guruhlar / tirik forwarderlar) — ijaraga oladi.
+    "scheduler" ijarasi egasi navbatni yuritadi (aylanishlar, boost slotlari).
+    Umumiy tezlik chegarasi (GLOBAL_RATE_LIMIT) ham tirik forwarderlar soniga bo'linadi.
+    Ijara `ttl` soniya ichida yangilanmasa, uni boshqa forwarder egallaydi.
+    """
+
+    def __init__(self, owner: str, targets: list, ttl: float):
+        self.owner = owner
+        self.targets = list(targets)
+        self.ttl = ttl
+        self.owned = set()
+        self.is_leader = False
+        self.workers = 1
+        self._task = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None
+
+    def _claim(self, name: str, now: float) -> bool:
+        (Lease
+         .insert(name=name, owner=self.owner, expires_at=now + self.ttl)
+         .on_conflict(
+             conflict_target=[Lease.name],
+             update={Lease.owner: self.owner, Lease.expires_at: now + self.ttl},
+             where=(Lease.owner == self.owner) | (Lease.expires_at < now))
+         .execute())
+        return Lease.get_by_id(name).owner == self.owner
+
+    def _release(self, names: list):
+        if names:
+            Lease.delete().where(Lease.name.in_(names) & (Lease.owner == self.owner)).execute()
+
+    def _renew(self):
+        """Yozuvchi oqimda, bitta tranzaksiyada bajariladi."""
+        now = time.time()
+        self._claim(f"worker:{self.owner}", now)
+        workers = Lease.select().where(Lease.name.startswith("worker:") & (Lease.expires_at > now)).count()
+        quota = -(-len(self.targets) // max(workers, 1))
+        held = {name for (name,) in Lease
+                .select(Lease.name)
+                .where((Lease.owner == self.owner) & Lease.name.startswith("target:") & (Lease.expires_at > now))
+                .tuples()}
+        owned = []
+        for target in self.targets:
+            name = f"target:{target}"
+            if name in held and len(owned) < quota and self._claim(name, now):
+                owned.append(target)
+        # Yangi forwarder qo'shilsa, ortiqcha guruhlar unga bo'shatib beriladi
+        self._release([f"target:{t}" for t in self.targets if f"target:{t}" in held and t not in owned])
+        for target in self.targets:
+            if len(owned) >= quota:
+                break
+            if target not in owned and self._claim(f"target:{target}", now):
+                owned.append(target)
+        return set(owned), self._claim("scheduler", now), max(workers, 1)
+
+    async def renew(self):
+        owned, leader, self.workers = await db_write(self._renew)
+        limiter.set_share(1 / self.workers)
+        if owned != self.owned or leader != self.is_leader:
+            logging.info(f"📌 Ijaralar: {len(owned)}/{len(self.targets)} ta guruh"
+                         f"{', navbat yurituvchi' if leader else ''}")
+        self.owned, self.is_leader = owned, leader
+
+    async def start(self):
+        await self.renew()
+        self._task = asyncio.create_task(self._keep_alive())
+
+    async def _keep_alive(self):
+        while True:
+            await asyncio.sleep(self.ttl / 3)
+            try:
+                await self.renew()
+            except Exception as e:
+                logging.error(f"❌ Ijaralarni yangilashda xato: {e}")
+                # Ijara muddati o'tgan bo'lishi mumkin — xavfsiz tomonga o'tamiz
+                self.owned, self.is_leader = set(), False
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        # Boshqa forwarderlar muddat tugashini kutmasdan egallay olsin
+        await db_write(lambda: Lease.delete().where(Lease.owner == self.owner).execute())
+        self.owned, self.is_leader = set(), False
@@ -0,0 +1,107 @@
+import asyncio
+import heapq
+import logging
+from typing import Optional
+from models import HouseListing, current_round
+from config import SOURCE_GROUPS
+from aiodb import db_read
+from writebehind import write_buffer
+
+
+class ListingQueue:
+    """
+    Yuborilishi kerak bo'lgan e'lonlar navbati (post_id bo'yicha o'sish tartibida).
+    Bir marta bazadan to'ldiriladi, keyin e'lonlar qo'shilganda yoki
+    o'zgartirilganda to'g'ridan-to'g'ri yangilanadi.
+    Eskirgan yozuvlar heap ichida qoladi va pop() vaqtida tashlab yuboriladi.
+    """
+
+    def __init__(self):
+        self._heap = []       # (post_id, listing_id)
+        self._entries = {}    # listing_id -> post_id (amaldagi yozuvlar)
+        self._event = asyncio.Event()
+        self.round = 0        # navbat qurilgan aylanish raqami
+        self._pushed_during_rebuild = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def push(self, listing_id: int, post_id: int):
+        if self._entries.get(listing_id) == post_id:
+            return
+        self._entries[listing_id] = post_id
+        if self._pushed_during_rebuild is not None:
+            self._pushed_during_rebuild[listing_id] = post_id
+        heapq.heappush(self._heap, (post_id, listing_id))
+        self._event.set()
+
+    def discard(self, listing_id: int):
+        self._entries.pop(listing_id, None)
+
+    def sync(self, listing: HouseListing):
+        """E'lon holatiga qarab uni navbatga qo'shadi yoki navbatdan chiqaradi."""
+        if self.is_due(listing):
+            self.push(listing.id, listing.post_id)
+        else:
+            self.discard(listing.id)
+
+    def peek(self, n: int) -> list:
+        """Navbatdan chiqarmasdan birinchi `n` ta e'lonni [(listing_id, post_id), ...] qaytaradi."""
+        live = [(post_id, listing_id) for post_id, listing_id in self._heap
+                if self._entries.get(listing_id) == post_id]
+        return [(listing_id, post_id) for post_id, listing_id in heapq.nsmallest(n, live)]
+
+    def is_due(self, listing: HouseListing) -> bool:
+        """E'lon joriy aylanishda hali yuborilmaganmi."""
+        return (listing.status == "active"
+                and listing.sent_round < self.round
+                and listing.source_group_id in SOURCE_GROUPS)
+
+    def pop(self) -> Optional[int]:
+        while self._heap:
+            post_id, listing_id = heapq.heappop(self._heap)
+            if self._entries.get(listing_id) == post_id:
+                del self._entries[listing_id]
+                return listing_id
+        return None
+
+    def _load_due(self):
+        round_number = current_round()
+        rows = (HouseListing
+                .select(HouseListing.id, HouseListing.post_id)
+                .where((HouseListing.status == "active") &
+                       (HouseListing.source_group_id.in_(SOURCE_GROUPS)) &
+                       (HouseListing.sent_round < round_number))
+                .tuples())
+        return round_number, list(rows)
+
+    async def rebuild(self):
+        """Navbatni joriy aylanishda hali yuborilmagan e'lonlardan qaytadan quradi."""
+        # Buferdagi "yuborildi" belgilari bazaga tushmasa, ular qayta navbatga kirib qoladi
+        await write_buffer.flush()
+        # O'qish davomida push() qilingan e'lonlar yo'qolmasligi uchun ularni alohida yig'amiz
+        self._pushed_during_rebuild = {}
+        try:
+            self.round, rows = await db_read(self._load_due)
+            self._entries = dict(rows)
+            self._entries.update(self._pushed_during_rebuild)
+        finally:
+            self._pushed_during_rebuild = None
+        self._heap = [(post_id, listing_id) for listing_id, post_id in self._entries.items()]
+        heapq.heapify(self._heap)
+        if self._entries:
+            self._event.set()
+        logging.info(f"📥 Navbat qayta qurildi: {self.round}-aylanish, {len(self._entries)} ta e'lon")
+
+    async def wait(self, timeout: float):
+        """Navbatga yangi e'lon tushishini yoki `timeout` tugashini kutadi."""
+        self._event.clear()
+        if self._entries:
+            return
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
+
+
+listing_queue = ListingQueue()
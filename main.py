@@ -1,49 +1,95 @@
 import asyncio
 import logging
 import json
+import time
 import uvicorn
 from datetime import timedelta
+from typing import List, Optional
+from pydantic import BaseModel
 import datetime
 
 from fastapi import FastAPI, Depends, HTTPException, status, Request, Form
-from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse
+from fastapi.responses import HTMLResponse, RedirectResponse, JSONResponse, StreamingResponse, Response
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from fastapi.templating import Jinja2Templates
 
 from aiogram import Bot, Dispatcher
 from aiogram.types import InputMediaPhoto, InputMediaVideo, BotCommand
 
-from models import initialize_db, User, HouseListing, pwd_context
-from config import BOT_TOKEN, ADMIN_IDS, SOURCE_GROUPS, TARGET_GROUPS, FORWARD_INTERVAL, BOOST_EVERY_N
-from security import create_access_token, verify_token
+from models import (initialize_db, User, HouseListing, Delivery, Counter, ArchivedListing, caption_search,
+                    current_round)
+from config import (BOT_TOKEN, ADMIN_IDS, SOURCE_GROUPS, TARGET_GROUPS, BOOST_EVERY_N,
+                    WEBHOOK_URL, WEBHOOK_PATH, WEBHOOK_SECRET,
+                    METRICS_TOKEN, SLOW_REQUEST_SECONDS, RUN_FORWARDER)
+from security import (create_access_token, verify_token, principals, login_throttle, user_login_throttle,
+                      password_hasher, HasherBusy)
 from handlers import register_handlers
-from forwarding import forwarding_task
+from ingest import ingest_pipeline
+from webhook import update_queue
+import metrics
+from metrics import http_request_seconds
+from forwarding import (create_bot, start_forwarder, stop_forwarder, listing_changed, listing_removed,
+                        schedule_preview)
+from control import control
+from deletion import detach_forwarded_messages, source_messages, merge_messages, schedule_deletion
+from jobs import jobs
+from stats import stats_cache
+from retention import retention_task, restore_archived
+from duplicates import duplicate_clusters
+from listing_queue import listing_queue
+from aiodb import db_read, db_write
+import aiodb
+from writebehind import write_buffer
+from scheduler import boost_scheduler
 import state
-from peewee import Cast
+from peewee import Cast, IntegrityError
 
 logging.basicConfig(level=logging.INFO)
 
 app = FastAPI()
 templates = Jinja2Templates(directory="templates")
+global_bot: Optional[Bot] = None
+web_worker = False   # uvicorn main:app bilan alohida ishga tushirilgan
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
-def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+@app.middleware("http")
+async def request_timing(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    elapsed = time.perf_counter() - start
+    # Yo'l shabloni bo'yicha guruhlaymiz (/api/listings/{post_id}), aks holda har bir ID alohida metrika bo'ladi
+    route = request.scope.get("route")
+    path = route.path if route is not None else "unmatched"
+    http_request_seconds.observe(elapsed, method=request.method, route=path, status=response.status_code)
+    if elapsed >= SLOW_REQUEST_SECONDS:
+        logging.warning(f"🐢 Sekin so'rov: {request.method} {request.url.path} — {elapsed:.2f} soniya")
+    return response
+
+async def resolve_principal(token: str) -> Optional[User]:
+    """
+    Token egasini qaytaradi. Tekshirilgan tokenlar keshlanadi, shuning uchun
+    keyingi so'rovlar JWT ni ham, bazani ham qayta o'qimaydi.
+    """
+    data = principals.get(token)
+    if data is not None:
+        # Har bir so'rov o'z nusxasini oladi — keshdagi ma'lumot o'zgarib qolmasin
+        return User(**data)
     payload = verify_token(token)
-    if payload is None:
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="❌ Noto'g'ri autentifikatsiya ma'lumotlari"
-        )
-    username: str = payload.get("sub")
-    if username is None:
+    if payload is None or payload.get("sub") is None:
+        return None
+    user = await db_read(User.get_or_none, User.username == payload["sub"])
+    if user is not None:
+        principals.put(token, payload, user.id, user.__data__)
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
+    user = await resolve_principal(token)
+    if user is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="❌ Noto'g'ri autentifikatsiya ma'lumotlari"
         )
-    user = User.get_or_none(User.username == username)
-    if user is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="❌ Foydalanuvchi topilmadi")
     return user
 
 def get_token_from_cookie(request: Request) -> str:
@@ -58,13 +104,38 @@ async def get_current_user_from_cookie(request: Request) -> User:
     token = get_token_from_cookie(request)
     if not token:
         raise HTTPException(status_code=401, detail="Autentifikatsiya qilinmagan")
-    payload = verify_token(token)
-    if payload is None:
-        raise HTTPException(status_code=401, detail="Noto'g'ri token")
-    username: str = payload.get("sub")
-    user = User.get_or_none(User.username == username)
+    user = await resolve_principal(token)
     if not user:
-        raise HTTPException(status_code=401, detail="Foydalanuvchi topilmadi")
+        raise HTTPException(status_code=401, detail="Noto'g'ri token")
+    return user
+
+async def authenticate(request: Request, username: str, password: str) -> Optional[User]:
+    """
+    Login va parolni tekshiradi. Ketma-ket xato urinishlar IP va (foydalanuvchi nomi, IP)
+    bo'yicha cheklanadi — admin nomini bilgan begona kishi uni o'z IP sidan bloklay olmaydi;
+    foydalanuvchi nomi bo'yicha faqat bo'shroq umumiy cheklov bor. bcrypt alohida jarayonda hisoblanadi.
+    """
+    ip = request.client.host if request.client else ""
+    keys = (f"user:{username}|ip:{ip}", f"ip:{ip}")
+    user_key = f"user:{username}"
+    wait = max(login_throttle.retry_after(*keys), user_login_throttle.retry_after(user_key))
+    if wait:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"❌ Juda ko'p urinish. {int(wait) + 1} soniyadan keyin qayta urinib ko'ring.",
+            headers={"Retry-After": str(int(wait) + 1)}
+        )
+    user = await db_read(User.get_or_none, User.username == username)
+    try:
+        valid = user is not None and await password_hasher.verify(password, user.hashed_password)
+    except HasherBusy:
+        raise HTTPException(status_code=503, detail="❌ Server band. Birozdan keyin qayta urinib ko'ring.")
+    if not valid:
+        login_throttle.failure(*keys)
+        user_login_throttle.failure(user_key)
+        return None
+    login_throttle.success(*keys)
+    user_login_throttle.success(user_key)
     return user
 
 def get_listing(post_id: str) -> HouseListing:
@@ -72,30 +143,15 @@ def get_listing(post_id: str) -> HouseListing:
         int_id = int(post_id)
     except ValueError:
         raise HTTPException(status_code=400, detail="❌ Noto'g'ri e'lon ID formati")
-    candidates = HouseListing.select().where(HouseListing.post_id.in_([post_id, str(int_id)]))
-    for candidate in candidates:
-        try:
-            if int(candidate.post_id) == int_id:
-                return candidate
-        except Exception:
-            continue
-    raise HTTPException(status_code=404, detail="❌ E'lon topilmadi")
-
-async def delete_forwarded_messages(listing: HouseListing):
-    if listing.forwarded_message_ids:
-        try:
-            fwd_data = json.loads(listing.forwarded_message_ids)
-        except Exception as e:
-            logging.error(f"❌ E'lon {listing.post_id} uchun forwarded_message_ids ni tahlil qilishda xato: {e}")
-            fwd_data = {}
-        for chat_id, msg_ids in fwd_data.items():
-            for msg_id in msg_ids:
-                try:
-                    await global_bot.delete_message(chat_id=int(chat_id), message_id=msg_id)
-                except Exception as e:
-                    logging.error(f"❌ Guruh {chat_id} dan {msg_id} xabarni o'chirishda xato: {e}")
-        listing.forwarded_message_ids = None
-        listing.save()
+    listing = HouseListing.select().where(HouseListing.post_id == int_id).order_by(HouseListing.id).first()
+    if listing is None:
+        raise HTTPException(status_code=404, detail="❌ E'lon topilmadi")
+    return listing
+
+async def load_listing(post_id: str) -> HouseListing:
+    # Buferdagi yetkazib berish natijalari avval bazaga yoziladi
+    await write_buffer.flush()
+    return await db_read(get_listing, post_id)
 
 @app.get("/", response_class=HTMLResponse)
 def landing_page(request: Request):
@@ -106,9 +162,13 @@ def login_get(request: Request):
     return templates.TemplateResponse("login.html", {"request": request, "msg": ""})
 
 @app.post("/login", response_class=HTMLResponse)
-def login_post(request: Request, username: str = Form(...), password: str = Form(...)):
-    user = User.get_or_none(User.username == username)
-    if not user or not user.verify_password(password):
+async def login_post(request: Request, username: str = Form(...), password: str = Form(...)):
+    try:
+        user = await authenticate(request, username, password)
+    except HTTPException as e:
+        return templates.TemplateResponse("login.html", {"request": request, "msg": e.detail},
+                                          status_code=e.status_code, headers=e.headers)
+    if not user:
         return templates.TemplateResponse("login.html", {"request": request, "msg": "❌ Noto'g'ri ma'lumotlar."})
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
@@ -116,16 +176,49 @@ def login_post(request: Request, username: str = Form(...), password: str = Form
     response.set_cookie(key="access_token", value=f"Bearer {access_token}", httponly=True)
     return response
 
+DASHBOARD_PER_PAGE = 10
+SEARCH_COUNT_LIMIT = 1000
+
+def parse_cursor(cursor: str):
+    """Keyset kursori "<post_id>_<id>" ko'rinishida bo'ladi."""
+    try:
+        post_id, listing_id = cursor.split("_")
+        return int(post_id), int(listing_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="❌ Noto'g'ri kursor")
+
 @app.get("/dashboard", response_class=HTMLResponse)
-def dashboard(request: Request, q: str = "", page: int = 1, current_user: User = Depends(get_current_user_from_cookie)):
+def dashboard(request: Request, q: str = "", page: int = 1, cursor: str = "", current_user: User = Depends(get_current_user_from_cookie)):
+    page = max(page, 1)
+    per_page = DASHBOARD_PER_PAGE
     query = HouseListing.select()
+    q = q.strip()
     if q:
-        query = query.where((HouseListing.post_id.contains(q)) | (HouseListing.caption.contains(q)))
-    query = sorted(query, key=lambda x: int(x.post_id), reverse=True)
-    total_count = len(query)
-    per_page = 10
+        condition = caption_search(q)
+        if q.isdigit():
+            condition = (HouseListing.post_id == int(q)) | condition
+        query = query.where(condition)
+        # Qidiruvda umumiy son faqat SEARCH_COUNT_LIMIT gacha sanaladi
+        total_count = query.limit(SEARCH_COUNT_LIMIT).count()
+    else:
+        total_count = Counter.get_value("listings")
     total_pages = (total_count + per_page - 1) // per_page
-    listings = query[(page-1)*per_page: page*per_page]
+    query = query.order_by(HouseListing.post_id.desc(), HouseListing.id.desc())
+    if cursor:
+        # Chuqur sahifalar uchun OFFSET o'rniga keyset
+        after_post_id, after_id = parse_cursor(cursor)
+        query = query.where(
+            (HouseListing.post_id < after_post_id) |
+            ((HouseListing.post_id == after_post_id) & (HouseListing.id < after_id))
+        )
+    else:
+        query = query.offset((page - 1) * per_page)
+    listings = list(query.limit(per_page + 1))
+    next_cursor = None
+    if len(listings) > per_page:
+        listings = listings[:per_page]
+        next_cursor = f"{listings[-1].post_id}_{listings[-1].id}"
+    total_pages = max(total_pages, page + (1 if next_cursor else 0))
     sending_status = "ON" if state.SENDING_ENABLED else "OFF"
     return templates.TemplateResponse("dashboard.html", {
         "request": request,
@@ -134,7 +227,12 @@ def dashboard(request: Request, q: str = "", page: int = 1, current_user: User =
         "sending_status": sending_status,
         "q": q,
         "page": page,
-        "total_pages": total_pages
+        "total_pages": total_pages,
+        "total_count": total_count,
+        "next_cursor": next_cursor,
+        "current_round": current_round(),
+        "stats": stats_cache.get(),
+        "page_window": range(max(1, page - 3), min(total_pages, page + 3) + 1)
     })
 
 @app.get("/logout", response_class=HTMLResponse)
@@ -160,11 +258,15 @@ async def profile_post(
 ):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Faqat adminlar ma'lumotlarni yangilay oladi.")
-    if not current_user.verify_password(current_password):
+    try:
+        valid = await password_hasher.verify(current_password, current_user.hashed_password)
+    except HasherBusy:
+        raise HTTPException(status_code=503, detail="❌ Server band. Birozdan keyin qayta urinib ko'ring.")
+    if not valid:
         msg = "❌ Joriy parol noto'g'ri."
         return templates.TemplateResponse("profile.html", {"request": request, "user": current_user, "msg": msg})
     if new_username and new_username != current_user.username:
-        if User.get_or_none(User.username == new_username):
+        if await db_read(User.get_or_none, User.username == new_username):
             msg = "❌ Bu foydalanuvchi nomi allaqachon mavjud."
             return templates.TemplateResponse("profile.html", {"request": request, "user": current_user, "msg": msg})
         current_user.username = new_username
@@ -172,85 +274,400 @@ async def profile_post(
         if new_password != confirm_new_password:
             msg = "❌ Yangi parol va tasdiq mos kelmadi."
             return templates.TemplateResponse("profile.html", {"request": request, "user": current_user, "msg": msg})
-        current_user.hashed_password = pwd_context.hash(new_password)
-    current_user.save()
+        try:
+            current_user.hashed_password = await password_hasher.hash(new_password)
+        except HasherBusy:
+            raise HTTPException(status_code=503, detail="❌ Server band. Birozdan keyin qayta urinib ko'ring.")
+    await db_write(current_user.save)
+    # Eski nom yoki parol bilan keshlangan tokenlar endi amal qilmaydi
+    principals.invalidate_user(current_user.id)
     msg = "✅ Ma'lumotlar muvaffaqiyatli yangilandi!"
     return templates.TemplateResponse("profile.html", {"request": request, "user": current_user, "msg": msg})
 
+def apply_listing_action(listing: HouseListing, action: str) -> dict:
+    """
+    Amalni e'lonning o'ziga (xotirada) qo'llaydi. O'chirishda manba guruhidagi
+    xabarlar {chat_id: [message_id, ...]} ko'rinishida qaytadi.
+    """
+    messages = {}
+    if action == "toggle":
+        listing.boost_status = "unboosted" if listing.boost_status == "boosted" else "boosted"
+    elif action in ("boost", "unboost"):
+        listing.boost_status = "boosted" if action == "boost" else "unboosted"
+    elif action == "delete":
+        listing.status = "deleted"
+        messages = source_messages(listing)
+    return messages
+
 @app.post("/dashboard/listings/{post_id}/toggle")
 async def dashboard_toggle_boost_listing(post_id: str, current_user: User = Depends(get_current_user_from_cookie)):
-    listing = get_listing(post_id)
-    await delete_forwarded_messages(listing)
-    # Boost statusini almashtiramiz
-    listing.boost_status = "unboosted" if listing.boost_status == "boosted" else "boosted"
-    listing.save()
+    listing = await load_listing(post_id)
+    # Boost statusini almashtiramiz; yuborilgan nusxalar fonda o'chiriladi
+    apply_listing_action(listing, "toggle")
+    messages = await db_write(detach_forwarded_messages, [listing.id], listing.save)
+    listing_changed(listing)
+    schedule_deletion(global_bot, messages)
     return RedirectResponse(url="/dashboard", status_code=303)
 
 @app.post("/dashboard/listings/{post_id}/delete")
 async def dashboard_delete_listing(post_id: str, current_user: User = Depends(get_current_user_from_cookie)):
-    listing = get_listing(post_id)
-    await delete_forwarded_messages(listing)
+    listing = await load_listing(post_id)
+    source = apply_listing_action(listing, "delete")
+    messages = await db_write(detach_forwarded_messages, [listing.id], listing.delete_instance)
+    merge_messages(messages, source)
+    listing_removed(listing.id)
+    schedule_deletion(global_bot, messages)
+    return RedirectResponse(url="/dashboard", status_code=303)
+
+@app.get("/dashboard/archive", response_class=HTMLResponse)
+def dashboard_archive(request: Request, q: str = "", cursor: int = 0,
+                      current_user: User = Depends(get_current_user_from_cookie)):
+    """Arxivlangan e'lonlar: post_id yoki matn bo'yicha qidiruv, yangi arxivlanganlar birinchi."""
+    per_page = DASHBOARD_PER_PAGE
+    query = ArchivedListing.select(
+        ArchivedListing.id, ArchivedListing.post_id, ArchivedListing.source_group_id, ArchivedListing.status,
+        ArchivedListing.boost_status, ArchivedListing.timestamp, ArchivedListing.caption, ArchivedListing.archived_at
+    )
+    q = q.strip()
+    if q:
+        condition = caption_search(q, ArchivedListing)
+        if q.isdigit():
+            condition = (ArchivedListing.post_id == int(q)) | condition
+        query = query.where(condition)
+        total_count = query.limit(SEARCH_COUNT_LIMIT).count()
+    else:
+        total_count = Counter.get_value("archived")
+    if cursor:
+        query = query.where(ArchivedListing.id < cursor)
+    archived = list(query.order_by(ArchivedListing.id.desc()).limit(per_page + 1))
+    next_cursor = archived[per_page - 1].id if len(archived) > per_page else None
+    return templates.TemplateResponse("archive.html", {
+        "request": request,
+        "user": current_user,
+        "archived": archived[:per_page],
+        "q": q,
+        "total_count": total_count,
+        "next_cursor": next_cursor,
+    })
+
+@app.post("/dashboard/archive/{archive_id}/restore")
+async def dashboard_restore_archived(archive_id: int, current_user: User = Depends(get_current_user_from_cookie)):
     try:
-        await global_bot.delete_message(chat_id=listing.source_group_id, message_id=listing.source_message_id)
-    except Exception as e:
-        logging.error(f"❌ E'lon {post_id} uchun manba xabarni o'chirishda xato: {e}")
-    listing.delete_instance()
+        listing = await restore_archived(archive_id)
+    except IntegrityError:
+        raise HTTPException(status_code=409, detail="❌ Bu manba guruhida shu post_id li e'lon allaqachon mavjud")
+    if listing is None:
+        raise HTTPException(status_code=404, detail="❌ Arxivda bunday e'lon topilmadi")
+    return RedirectResponse(url=f"/dashboard?q={listing.post_id}", status_code=303)
+
+@app.get("/dashboard/duplicates", response_class=HTMLResponse)
+def dashboard_duplicates(request: Request, page: int = 1, current_user: User = Depends(get_current_user_from_cookie)):
+    """Bir xil barmoq izli e'lonlar guruhlari, oxirgi nusxasi yangi bo'lganlari birinchi."""
+    per_page = DASHBOARD_PER_PAGE
+    page = max(page, 1)
+    clusters, total_count = duplicate_clusters(per_page, (page - 1) * per_page)
+    return templates.TemplateResponse("duplicates.html", {
+        "request": request,
+        "user": current_user,
+        "clusters": clusters,
+        "page": page,
+        "total_pages": max((total_count + per_page - 1) // per_page, 1),
+        "total_count": total_count,
+    })
+
+@app.post("/dashboard/duplicates/{listing_id}/activate")
+async def dashboard_activate_duplicate(listing_id: int, current_user: User = Depends(get_current_user_from_cookie)):
+    # Noto'g'ri aniqlangan takrorni navbatga qaytarish
+    listing = await db_read(HouseListing.get_or_none, HouseListing.id == listing_id)
+    if listing is None or listing.status != "duplicate":
+        raise HTTPException(status_code=404, detail="❌ Takroriy e'lon topilmadi")
+    listing.status = "active"
+    await db_write(listing.save)
+    listing_changed(listing)
+    return RedirectResponse(url="/dashboard/duplicates", status_code=303)
+
+BULK_ACTIONS = ("boost", "unboost", "delete")
+BULK_LIMIT = 500
+
+async def run_bulk_action(action: str, listing_ids: List[int]):
+    # post_id faqat bitta manba guruhi ichida yagona, shuning uchun e'lonlar ID bo'yicha tanlanadi
+    if action not in BULK_ACTIONS:
+        raise HTTPException(status_code=400, detail="❌ Noma'lum amal")
+    if not listing_ids or len(listing_ids) > BULK_LIMIT:
+        raise HTTPException(status_code=400, detail=f"❌ 1 tadan {BULK_LIMIT} tagacha e'lon tanlang")
+    await write_buffer.flush()
+    listings = await db_read(lambda: list(HouseListing.select().where(HouseListing.id.in_(listing_ids))))
+    if not listings:
+        return 0, None
+    source = {}
+    for listing in listings:
+        merge_messages(source, apply_listing_action(listing, action))
+    if action == "delete":
+        fields = {"status": "deleted"}
+    else:
+        fields = {"boost_status": listings[0].boost_status}
+    listing_ids = [listing.id for listing in listings]
+    # Barcha e'lonlar bitta UPDATE bilan yangilanadi
+    messages = await db_write(
+        detach_forwarded_messages, listing_ids,
+        lambda: HouseListing.update(**fields).where(HouseListing.id.in_(listing_ids)).execute()
+    )
+    merge_messages(messages, source)
+    for listing in listings:
+        listing_changed(listing)
+    job = schedule_deletion(global_bot, messages, f"bulk_{action}")
+    return len(listings), job
+
+@app.post("/dashboard/listings/bulk")
+async def dashboard_bulk_action(
+    action: str = Form(...),
+    listing_ids: List[int] = Form([]),
+    current_user: User = Depends(get_current_user_from_cookie)
+):
+    await run_bulk_action(action, listing_ids)
     return RedirectResponse(url="/dashboard", status_code=303)
 
 @app.post("/dashboard/toggle_sending")
 async def dashboard_toggle_sending(current_user: User = Depends(get_current_user_from_cookie)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Faqat adminlar bu amalni bajarishi mumkin.")
-    state.SENDING_ENABLED = not state.SENDING_ENABLED
+    await control.set_sending(not state.SENDING_ENABLED)
     return RedirectResponse(url="/dashboard", status_code=303)
 
 @app.post("/dashboard/refresh")
 async def dashboard_refresh(current_user: User = Depends(get_current_user_from_cookie)):
     if not current_user.is_admin:
         raise HTTPException(status_code=403, detail="Faqat adminlar bu amalni bajarishi mumkin.")
+    # Shu jarayondagi forwarder uchun flag, boshqa jarayonlar uchun buyruq
     state.REFRESH_REQUESTED = True
+    await control.send_command("refresh")
     return RedirectResponse(url="/dashboard", status_code=303)
 
+API_PAGE_LIMIT = 1000
+API_STREAM_BATCH = 500
+LISTING_FIELDS = {field.name: field for field in HouseListing._meta.sorted_fields}
+
+def listings_api_query(fields: str, status_filter: str, boost_status: str, source_group_id: int, since: datetime.datetime):
+    if fields:
+        names = [name.strip() for name in fields.split(",") if name.strip()]
+        unknown = [name for name in names if name not in LISTING_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"❌ Noma'lum maydonlar: {', '.join(unknown)}")
+    else:
+        names = list(LISTING_FIELDS)
+    columns = [LISTING_FIELDS[name] for name in names]
+    if "id" not in names:
+        columns.append(HouseListing.id)
+    query = HouseListing.select(*columns)
+    if status_filter == "sent":
+        # "sent" — joriy aylanishda yuborilgan faol e'lonlar
+        query = query.where((HouseListing.status == "active") & (HouseListing.sent_round >= current_round()))
+    elif status_filter == "active":
+        query = query.where((HouseListing.status == "active") & (HouseListing.sent_round < current_round()))
+    elif status_filter:
+        query = query.where(HouseListing.status == status_filter)
+    if boost_status:
+        query = query.where(HouseListing.boost_status == boost_status)
+    if source_group_id is not None:
+        query = query.where(HouseListing.source_group_id == source_group_id)
+    if since is not None:
+        query = query.where(HouseListing.timestamp >= since)
+    return query.order_by(HouseListing.id), names
+
+def iter_listing_rows(query, after_id: int, batch_size: int):
+    """Keyset (id > oxirgi id) bo'yicha partiyalab o'qiydi — xotira jadval hajmiga bog'liq emas."""
+    while True:
+        rows = list(query.where(HouseListing.id > after_id).limit(batch_size).dicts())
+        yield from rows
+        if len(rows) < batch_size:
+            return
+        after_id = rows[-1]["id"]
+
+def ndjson_lines(rows, names):
+    for row in rows:
+        yield json.dumps({name: row[name] for name in names}, default=str, ensure_ascii=False) + "\n"
+
 @app.get("/api/listings")
-def api_get_listings(current_user: User = Depends(get_current_user)):
-    listings = HouseListing.select()
-    return {"listings": [listing.__data__ for listing in listings]}
+def api_get_listings(
+    cursor: int = 0,
+    limit: int = 100,
+    status: str = "",
+    boost_status: str = "",
+    source_group_id: Optional[int] = None,
+    since: Optional[datetime.datetime] = None,
+    fields: str = "",
+    format: str = "json",
+    current_user: User = Depends(get_current_user)
+):
+    query, names = listings_api_query(fields, status, boost_status, source_group_id, since)
+    if format == "ndjson":
+        return StreamingResponse(
+            ndjson_lines(iter_listing_rows(query, cursor, API_STREAM_BATCH), names),
+            media_type="application/x-ndjson"
+        )
+    limit = min(max(limit, 1), API_PAGE_LIMIT)
+    rows = list(query.where(HouseListing.id > cursor).limit(limit + 1).dicts())
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = rows[-1]["id"]
+    return {
+        "listings": [{name: row[name] for name in names} for row in rows],
+        "next_cursor": next_cursor
+    }
+
+@app.get("/api/schedule/preview")
+async def api_schedule_preview(slots: int = 50, current_user: User = Depends(get_current_user)):
+    """Keyingi `slots` ta yuborish qanday tartibda bo'lishini ko'rsatadi (hech narsa yuborilmaydi)."""
+    slots = min(max(slots, 1), 1000)
+    timeline = await schedule_preview(slots)
+    for item in timeline:
+        item["at"] = datetime.datetime.fromtimestamp(item["at"]).isoformat(timespec="seconds")
+    return {"timeline": timeline}
+
+@app.get("/api/stats")
+def api_stats(current_user: User = Depends(get_current_user)):
+    """E'lonlar, aylanish va yuborishlar statistikasi (STATS_CACHE_TTL soniya keshlanadi)."""
+    return stats_cache.get()
+
+DELIVERY_STATUSES = ("pending", "sent", "failed", "dead", "cancelled", "deleted")
+
+def delivery_as_dict(delivery: Delivery) -> dict:
+    return {
+        "id": delivery.id,
+        "post_id": delivery.listing.post_id,
+        "target_id": delivery.target_id,
+        "message_ids": json.loads(delivery.message_ids) if delivery.message_ids else [],
+        "round": delivery.round,
+        "attempts": delivery.attempts,
+        "status": delivery.status,
+        "error": delivery.error,
+        "next_attempt_at": delivery.next_attempt_at.isoformat() if delivery.next_attempt_at else None,
+        "updated_at": delivery.updated_at.isoformat(),
+    }
+
+@app.get("/api/deliveries")
+async def api_deliveries(
+    target_id: Optional[int] = None,
+    status: Optional[str] = None,
+    post_id: Optional[int] = None,
+    cursor: Optional[int] = None,
+    limit: int = 100,
+    current_user: User = Depends(get_current_user)
+):
+    """Yetkazib berish jurnali: masalan, ?target_id=X&status=sent — X guruhdagi xabarlar."""
+    if status is not None and status not in DELIVERY_STATUSES:
+        raise HTTPException(status_code=400, detail="❌ Noma'lum yetkazib berish holati")
+    limit = min(max(limit, 1), 1000)
+    await write_buffer.flush()
+
+    def fetch():
+        query = Delivery.select(Delivery, HouseListing).join(HouseListing)
+        if target_id is not None:
+            query = query.where(Delivery.target_id == target_id)
+        if status is not None:
+            query = query.where(Delivery.status == status)
+        if post_id is not None:
+            query = query.where(HouseListing.post_id == post_id)
+        if cursor is not None:
+            query = query.where(Delivery.id < cursor)
+        return list(query.order_by(Delivery.id.desc()).limit(limit + 1))
+
+    rows = await db_read(fetch)
+    next_cursor = rows[limit - 1].id if len(rows) > limit else None
+    return {"deliveries": [delivery_as_dict(d) for d in rows[:limit]], "next_cursor": next_cursor}
+
+@app.post("/api/deliveries/{delivery_id}/retry")
+async def api_retry_delivery(delivery_id: int, current_user: User = Depends(get_current_user)):
+    """Muvaffaqiyatsiz yoki "dead" holatidagi yozuvni darhol qayta urinish navbatiga qo'yadi."""
+    updated = await db_write(lambda: Delivery
+                             .update(status="failed", attempts=0, next_attempt_at=datetime.datetime.now(),
+                                     updated_at=datetime.datetime.now())
+                             .where((Delivery.id == delivery_id) & (Delivery.status.in_(["failed", "dead"])))
+                             .execute())
+    if not updated:
+        raise HTTPException(status_code=404, detail="❌ Qayta yuboriladigan yozuv topilmadi")
+    return {"msg": f"🔁 Yozuv {delivery_id} qayta yuborish navbatiga qo'yildi."}
 
 @app.post("/api/listings/{post_id}/boost")
 async def api_boost_listing(post_id: str, current_user: User = Depends(get_current_user)):
-    listing = get_listing(post_id)
-    await delete_forwarded_messages(listing)
-    listing.boost_status = "unboosted" if listing.boost_status == "boosted" else "boosted"
-    listing.save()
-    return {"msg": f"🔄 E'lon {post_id} boost holati o'zgartirildi."}
+    listing = await load_listing(post_id)
+    apply_listing_action(listing, "toggle")
+    messages = await db_write(detach_forwarded_messages, [listing.id], listing.save)
+    listing_changed(listing)
+    job = schedule_deletion(global_bot, messages)
+    return {"msg": f"🔄 E'lon {post_id} boost holati o'zgartirildi.", "job_id": job.id if job else None}
 
 @app.delete("/api/listings/{post_id}")
 async def api_delete_listing(post_id: str, current_user: User = Depends(get_current_user)):
-    listing = get_listing(post_id)
-    await delete_forwarded_messages(listing)
-    try:
-        await global_bot.delete_message(chat_id=listing.source_group_id, message_id=listing.source_message_id)
-    except Exception as e:
-        logging.error(f"❌ E'lon {post_id} uchun manba xabarni o'chirishda xato: {e}")
-    listing.status = "deleted"
-    listing.save()
-    return {"msg": f"🗑️ E'lon {post_id} o'chirildi."}
+    listing = await load_listing(post_id)
+    source = apply_listing_action(listing, "delete")
+    messages = await db_write(detach_forwarded_messages, [listing.id], listing.save)
+    merge_messages(messages, source)
+    listing_changed(listing)
+    job = schedule_deletion(global_bot, messages)
+    return {"msg": f"🗑️ E'lon {post_id} o'chirildi.", "job_id": job.id if job else None}
+
+class BulkActionRequest(BaseModel):
+    action: str
+    listing_ids: List[int]  # HouseListing.id (post_id turli manba guruhlarida takrorlanadi)
+
+@app.post("/api/listings/bulk")
+async def api_bulk_action(body: BulkActionRequest, current_user: User = Depends(get_current_user)):
+    count, job = await run_bulk_action(body.action, body.listing_ids)
+    return {"msg": f"✅ {count} ta e'lon yangilandi.", "updated": count, "job_id": job.id if job else None}
+
+@app.get("/api/jobs/{job_id}")
+async def api_job_status(job_id: str, current_user: User = Depends(get_current_user)):
+    job = await jobs.status(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="❌ Fon ishi topilmadi")
+    return job
+
+# Navbatlar holati har bir /metrics so'rovida o'qiladi
+metrics.Gauge("listing_queue_depth", "Joriy aylanishda yuborilishi kutilayotgan e'lonlar", func=lambda: len(listing_queue))
+metrics.Gauge("boosted_listings", "Boost qilingan e'lonlar", func=lambda: len(boost_scheduler))
+metrics.Gauge("write_buffer_pending", "Bazaga yozilishi kutilayotgan o'zgarishlar", func=lambda: len(write_buffer))
+metrics.Gauge("webhook_queue_depth", "Qayta ishlanishi kutilayotgan webhook yangilanishlari", func=lambda: len(update_queue))
+metrics.Gauge("sending_enabled", "Yuborish rejimi (1 — yoqilgan)", func=lambda: int(state.SENDING_ENABLED))
+
+@app.get("/metrics")
+def metrics_endpoint(request: Request):
+    """Prometheus matn formatidagi metrikalar."""
+    if METRICS_TOKEN and request.headers.get("Authorization") != f"Bearer {METRICS_TOKEN}":
+        raise HTTPException(status_code=401, detail="❌ Noto'g'ri metrika tokeni")
+    return Response(metrics.registry.render(), media_type="text/plain; version=0.0.4")
 
 @app.post("/token")
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends()):
-    user = User.get_or_none(User.username == form_data.username)
-    if not user or not user.verify_password(form_data.password):
+async def login_for_access_token(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
+    user = await authenticate(request, form_data.username, form_data.password)
+    if not user:
         raise HTTPException(status_code=400, detail="❌ Foydalanuvchi nomi yoki parol noto'g'ri")
     access_token_expires = timedelta(minutes=30)
     access_token = create_access_token(data={"sub": user.username}, expires_delta=access_token_expires)
     return {"access_token": access_token, "token_type": "bearer"}
 
-async def start_bot():
+async def telegram_webhook(request: Request):
+    if WEBHOOK_SECRET and request.headers.get("X-Telegram-Bot-Api-Secret-Token") != WEBHOOK_SECRET:
+        raise HTTPException(status_code=403, detail="❌ Noto'g'ri maxfiy kalit")
+    data = await request.json()
+    if not update_queue.put(data):
+        # Navbat to'la: Telegram yangilanishni keyinroq qayta yuboradi
+        return JSONResponse(status_code=503, content={"ok": False})
+    return {"ok": True}
+
+if WEBHOOK_URL:
+    app.post(WEBHOOK_PATH)(telegram_webhook)
+
+def setup_bot() -> Dispatcher:
     global global_bot
-    bot = Bot(token=BOT_TOKEN)
-    global_bot = bot
-    dp = Dispatcher(bot)
+    global_bot = create_bot()
+    dp = Dispatcher(global_bot)
     register_handlers(dp)
+    return dp
+
+async def start_bot(dp: Dispatcher):
+    bot = dp.bot
     await bot.set_my_commands([
         BotCommand(command="start", description="Boshqaruv paneli/statistika"),
         BotCommand(command="boost", description="E'lonni boost qil"),
@@ -260,9 +677,46 @@ async def start_bot():
         BotCommand(command="off", description="Yuborish rejimini o'chirish"),
         BotCommand(command="refresh", description="Bazani yangilash")
     ])
-    asyncio.create_task(forwarding_task(bot))
+    if RUN_FORWARDER:
+        await start_forwarder(bot)
+        asyncio.create_task(retention_task())
+    else:
+        logging.info("📤 Yuborish alohida forwarder jarayon(lar)ida: python forwarder.py")
+    if WEBHOOK_URL:
+        update_queue.start(dp)
+        await bot.set_webhook(WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH, secret_token=WEBHOOK_SECRET or None)
+        logging.info(f"🌐 Webhook rejimi: {WEBHOOK_URL.rstrip('/')}{WEBHOOK_PATH}")
+        return
+    await bot.delete_webhook()
     await dp.start_polling()
 
+@app.on_event("startup")
+async def start_web_worker():
+    """
+    `uvicorn main:app --workers N` bilan ishga tushirilganda (main() siz):
+    bot faqat xabarlarni o'chirish va webhook yangilanishlari uchun, yuborish esa
+    forwarder.py jarayonlarida. Webhook yoqilmagan bo'lsa, polling main.py da qoladi.
+    """
+    global web_worker
+    if global_bot is not None:
+        return
+    web_worker = True
+    initialize_db()
+    dp = setup_bot()
+    await control.start()
+    if WEBHOOK_URL:
+        update_queue.start(dp)
+
+@app.on_event("shutdown")
+async def stop_web_worker():
+    if not web_worker:
+        return
+    await update_queue.stop()
+    await control.stop()
+    # Yig'ilayotgan albomlar va yozilmagan e'lonlar qayta ishga tushishda yo'qolmasin
+    await ingest_pipeline.close()
+    await write_buffer.close()
+
 async def start_uvicorn():
     config = uvicorn.Config(app, host="0.0.0.0", port=8000, log_level="info")
     server = uvicorn.Server(config)
@@ -270,10 +724,21 @@ async def start_uvicorn():
 
 async def main():
     initialize_db()
-    await asyncio.gather(
-        start_uvicorn(),
-        start_bot()
-    )
+    dp = setup_bot()
+    await control.start()
+    try:
+        await asyncio.gather(
+            start_uvicorn(),
+            start_bot(dp)
+        )
+    finally:
+        await update_queue.stop()
+        await stop_forwarder()
+        await control.stop()
+        await ingest_pipeline.close()
+        await write_buffer.close()
+        aiodb.shutdown()
+        password_hasher.shutdown()
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,188 @@
+"""
+Ichki metrikalar va ularni Prometheus matn formatida chiqarish (/metrics).
+Tashqi kutubxonasiz: hisoblagich (counter), o'lchagich (gauge) va gistogramma.
+
+Ishlatish:
+    from metrics import telegram_requests
+    telegram_requests.inc(method="sendMessage")
+    with db_query_seconds.time(kind="read"):
+        ...
+"""
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Optional
+from aiogram import Bot
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Metric:
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._lock = threading.Lock()  # DB oqimlaridan ham yoziladi
+        registry.register(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(labels.get(name, "") for name in self.labels)
+
+    def samples(self) -> list:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type}"]
+        for suffix, labels, extra, value in self.samples():
+            lines.append(f"{self.name}{suffix}{_format_labels(self.labels, labels, extra)} {_format_value(value)}")
+        return "\n".join(lines)
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = ()):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> list:
+        with self._lock:
+            return [("", key, "", value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Metric):
+    """Qiymat `set()` bilan beriladi yoki har bir so'rovda `func()` dan olinadi."""
+    type = "gauge"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), func: Optional[Callable] = None):
+        super().__init__(name, documentation, labels)
+        self._values = {}
+        self.func = func
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self) -> list:
+        if self.func is not None:
+            return [("", (), "", self.func())]
+        with self._lock:
+            return [("", key, "", value) for key, value in sorted(self._values.items())]
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}  # labels -> [bucket hisoblari..., yig'indi, soni]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    data[i] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Blok bajarilish vaqtini o'lchaydi (xato bo'lsa ham)."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        data = self._values.get(self._key(labels))
+        return data[-1] if data else 0
+
+    def samples(self) -> list:
+        samples = []
+        with self._lock:
+            for key, data in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, data):
+                    samples.append(("_bucket", key, f'le="{_format_value(bound)}"', count))
+                samples.append(("_sum", key, "", data[-2]))
+                samples.append(("_count", key, "", data[-1]))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric: Metric):
+        self._metrics.append(metric)
+
+    def render(self) -> str:
+        return "\n".join(metric.render() for metric in self._metrics) + "\n"
+
+
+registry = Registry()
+
+# Telegram Bot API
+telegram_requests = Counter("telegram_requests_total", "Bot API so'rovlari soni", ("method",))
+telegram_errors = Counter("telegram_errors_total", "Xato bilan tugagan Bot API so'rovlari", ("method", "error"))
+telegram_request_seconds = Histogram("telegram_request_seconds", "Bot API so'rovi davomiyligi", ("method",))
+retry_after = Counter("telegram_retry_after_total", "RetryAfter javoblari soni", ("chat_id",))
+retry_after_seconds = Counter("telegram_retry_after_seconds_total", "RetryAfter sababli kutilgan vaqt", ("chat_id",))
+
+# Yuborish
+send_seconds = Histogram(
+    "forward_send_seconds", "Bitta maqsad guruhga yuborish vaqti (cheklovchida kutish bilan)", ("target",),
+    buckets=(0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+forwarding_phase_seconds = Histogram("forwarding_phase_seconds", "forwarding_task bosqichlari davomiyligi", ("phase",))
+forwarded_listings = Counter("forwarded_listings_total", "forwarding_task yuborgan e'lonlar soni", ("kind",))
+
+# Ma'lumotlar bazasi va HTTP
+db_query_seconds = Histogram("db_query_seconds", "DB so'rovlari bajarilish vaqti", ("kind",))
+db_wait_seconds = Histogram("db_wait_seconds", "DB so'rovi oqim navbatida kutgan vaqt", ("kind",))
+http_request_seconds = Histogram("http_request_seconds", "HTTP so'rovlari davomiyligi", ("method", "route", "status"))
+
+
+class InstrumentedBot(Bot):
+    """Har bir Bot API chaqiruvini sanaydigan va vaqtini o'lchaydigan Bot."""
+
+    async def request(self, method, data=None, files=None, **kwargs):
+        telegram_requests.inc(method=method)
+        start = time.perf_counter()
+        try:
+            return await super().request(method, data, files, **kwargs)
+        except Exception as e:
+            telegram_errors.inc(method=method, error=type(e).__name__)
+            raise
+        finally:
+            telegram_request_seconds.observe(time.perf_counter() - start, method=method)
@@ -0,0 +1,236 @@
+"""
+Mavjud house_listings.db fayllarini joriy sxemaga o'tkazish.
+Har bir migratsiya bir marta bajariladi; bajarilganlari soni PRAGMA user_version da saqlanadi.
+
+Ishlatish: python migrations.py
+"""
+import datetime
+import json
+import logging
+from models import (db, HouseListing, Delivery, Counter, initialize_db, create_search_index, current_round,
+                    create_stats_triggers, rebuild_stats)
+
+
+def table_exists(table: str) -> bool:
+    return table in db.get_tables()
+
+def column_types(table: str) -> dict:
+    return {row[1]: row[2].upper() for row in db.execute_sql(f'PRAGMA table_info("{table}")').fetchall()}
+
+def migrate_post_id_to_integer():
+    """
+    post_id ni CharField dan indekslangan butun songa o'tkazadi. Raqam bo'lmagan post_id li
+    va bir manba guruhida takrorlangan e'lonlar tashlab yuborilmaydi — ular sababi (reason)
+    bilan houselisting_unmigrated jadvaliga ko'chiriladi.
+    """
+    table = HouseListing._meta.table_name
+    if not table_exists(table):
+        return
+    old_columns = column_types(table)
+    if old_columns.get("post_id") in ("INTEGER", "BIGINT"):
+        return
+    # SQLite ustun turini o'zgartira olmaydi, shuning uchun jadvalni qayta quramiz
+    old_table = f"{table}_old"
+    with db.atomic():
+        db.execute_sql(f'ALTER TABLE "{table}" RENAME TO "{old_table}"')
+        for (index_name,) in db.execute_sql(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = ? AND sql IS NOT NULL",
+                (old_table,)).fetchall():
+            db.execute_sql(f'DROP INDEX "{index_name}"')
+        db.create_tables([HouseListing])
+        # Modelda yo'q eski ustunlar ham saqlanadi — ularni keyingi migratsiyalar ko'chiradi
+        model_columns = {f.column_name for f in HouseListing._meta.sorted_fields}
+        legacy_columns = [c for c in old_columns if c not in model_columns]
+        for column in legacy_columns:
+            db.execute_sql(f'ALTER TABLE "{table}" ADD COLUMN "{column}" {old_columns[column] or "TEXT"}')
+        columns = [f.column_name for f in HouseListing._meta.sorted_fields if f.column_name in old_columns]
+        columns += legacy_columns
+        column_list = ", ".join(f'"{c}"' for c in columns)
+        select_list = ", ".join(
+            'CAST("post_id" AS INTEGER)' if c == "post_id" else f'"{c}"' for c in columns
+        )
+        # CAST raqam bo'lmagan qiymatni 0 ga aylantiradi, shuning uchun faqat raqamlar ko'chiriladi
+        numeric = '"post_id" != \'\' AND "post_id" NOT GLOB \'*[^0-9]*\''
+        # Bir manba guruhidagi takroriy post_id lardan eng birinchisi qoladi
+        kept = (f'"id" IN (SELECT MIN("id") FROM "{old_table}" WHERE {numeric} '
+                f'GROUP BY "source_group_id", CAST("post_id" AS INTEGER))')
+        # Qolganlari (forwarded_message_ids bilan birga) tashlanmaydi, alohida jadvalga ko'chiriladi
+        unmigrated_table = f"{table}_unmigrated"
+        db.execute_sql(f'CREATE TABLE IF NOT EXISTS "{unmigrated_table}" AS '
+                       f'SELECT *, \'\' AS "reason" FROM "{old_table}" WHERE 0')
+        db.execute_sql(
+            f'INSERT INTO "{unmigrated_table}" '
+            f'SELECT *, CASE WHEN {numeric} THEN \'duplicate\' ELSE \'post_id\' END '
+            f'FROM "{old_table}" WHERE NOT ({kept})'
+        )
+        unmigrated = dict(db.execute_sql(
+            f'SELECT "reason", COUNT(*) FROM "{unmigrated_table}" GROUP BY "reason"').fetchall())
+        if unmigrated:
+            logging.warning(f"⚠️ {unmigrated.get('post_id', 0)} ta e'lonning post_id si raqam emas, "
+                            f"{unmigrated.get('duplicate', 0)} tasi takroriy — "
+                            f"ular {unmigrated_table} jadvaliga ko'chirildi")
+        # Oddiy INSERT: boshqa cheklov buzilishlari yashirinmaydi, migratsiya to'xtaydi
+        db.execute_sql(
+            f'INSERT INTO "{table}" ({column_list}) '
+            f'SELECT {select_list} FROM "{old_table}" WHERE {kept} ORDER BY "id"'
+        )
+        new_count = db.execute_sql(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0]
+        db.execute_sql(f'DROP TABLE "{old_table}"')
+    logging.info(f"✅ post_id butun songa o'tkazildi: {new_count} ta e'lon")
+
+def build_search_index():
+    """Mavjud e'lonlar uchun FTS5 indeksini va hisoblagichni yaratib to'ldiradi."""
+    table = HouseListing._meta.table_name
+    if not table_exists(table):
+        return
+    db.create_tables([Counter], safe=True)
+    create_search_index()
+    db.execute_sql(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+    db.execute_sql(f"UPDATE counter SET value = (SELECT COUNT(*) FROM {table}) WHERE name = 'listings'")
+    logging.info("✅ E'lonlar uchun qidiruv indeksi qurildi")
+
+def add_rotation_rounds():
+    """
+    "sent" holatini aylanish raqami bilan almashtiradi: yuborilgan e'lonlar
+    "active" bo'lib qoladi, lekin sent_round joriy aylanishga teng bo'ladi.
+    """
+    table = HouseListing._meta.table_name
+    if not table_exists(table):
+        return
+    if "sent_round" not in column_types(table):
+        db.execute_sql(f'ALTER TABLE "{table}" ADD COLUMN "sent_round" INTEGER NOT NULL DEFAULT 0')
+    db.create_tables([Counter], safe=True)
+    Counter.insert(name="round", value=1).on_conflict_ignore().execute()
+    with db.atomic():
+        updated = (HouseListing
+                   .update(status="active", sent_round=current_round())
+                   .where(HouseListing.status == "sent")
+                   .execute())
+    logging.info(f"✅ Aylanishlar modeliga o'tildi: {updated} ta yuborilgan e'lon")
+
+def migrate_deliveries():
+    """
+    forwarded_message_ids JSON ustunini Delivery jadvaliga ko'chiradi va ustunni
+    o'chiradi. "error" holatidagi e'lonlar yana faol bo'ladi — endi xato faqat
+    muvaffaqiyatsiz maqsad guruhga tegishli. Ko'chirilgan yozuvlar e'lon vaqti bilan
+    belgilanadi va attempts=0 bo'ladi (urinish jurnalda qayd etilmagan), shuning uchun
+    soatlik statistikaga kirmaydi va tozalashda eski yozuv sifatida ko'riladi.
+    """
+    table = HouseListing._meta.table_name
+    if not table_exists(table):
+        return
+    db.create_tables([Delivery], safe=True)
+    if "forwarded_message_ids" not in column_types(table):
+        return
+    now = datetime.datetime.now()
+    rows = []
+    cursor = db.execute_sql(
+        f'SELECT "id", "forwarded_message_ids", "sent_round", "timestamp" FROM "{table}" '
+        f'WHERE "forwarded_message_ids" IS NOT NULL AND "forwarded_message_ids" != \'\''
+    )
+    for listing_id, blob, sent_round, timestamp in cursor.fetchall():
+        try:
+            forwarded = json.loads(blob)
+        except ValueError:
+            logging.warning(f"⚠️ E'lon {listing_id} uchun forwarded_message_ids o'qilmadi, tashlab ketildi")
+            continue
+        for target_id, msg_ids in forwarded.items():
+            rows.append({
+                "listing": listing_id,
+                "target_id": int(target_id),
+                "message_ids": json.dumps(msg_ids),
+                "round": sent_round,
+                "attempts": 0,
+                "created_at": timestamp or now,
+                "updated_at": timestamp or now,
+            })
+    with db.atomic():
+        for i in range(0, len(rows), 500):
+            Delivery.insert_many(rows[i:i + 500]).execute()
+        HouseListing.update(status="active").where(HouseListing.status == "error").execute()
+        db.execute_sql(f'ALTER TABLE "{table}" DROP COLUMN "forwarded_message_ids"')
+    logging.info(f"✅ Yetkazib berish jurnaliga {len(rows)} ta yozuv ko'chirildi")
+
+def build_listing_stats():
+    """Statistika triggerlarini yaratadi va hisoblagichlarni mavjud ma'lumotlardan to'ldiradi."""
+    table = HouseListing._meta.table_name
+    if not table_exists(table):
+        return
+    db.create_tables([Counter, Delivery], safe=True)
+    Counter.insert(name="round", value=1).on_conflict_ignore().execute()
+    create_stats_triggers()
+    rebuild_stats()
+    logging.info("✅ E'lonlar statistikasi hisoblandi")
+
+def enable_incremental_vacuum():
+    """Eski bazani auto_vacuum=INCREMENTAL ga o'tkazadi (bir martalik to'liq VACUUM)."""
+    if not table_exists(HouseListing._meta.table_name):
+        return
+    if db.execute_sql("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return
+    db.execute_sql("PRAGMA auto_vacuum = INCREMENTAL")
+    db.execute_sql("VACUUM")
+    logging.info("✅ Baza incremental auto_vacuum rejimiga o'tkazildi")
+
+def add_fingerprints():
+    """
+    fingerprint ustunini qo'shadi va mavjud e'lonlar uchun hisoblaydi. Avvalgi
+    takrorlar holati o'zgartirilmaydi — ular faqat /dashboard/duplicates da ko'rinadi.
+    """
+    from duplicates import listing_fingerprint
+    table = HouseListing._meta.table_name
+    if not table_exists(table):
+        return
+    if "fingerprint" not in column_types(table):
+        db.execute_sql(f'ALTER TABLE "{table}" ADD COLUMN "fingerprint" VARCHAR(255)')
+    db.execute_sql(f'CREATE INDEX IF NOT EXISTS "{table}_fingerprint" ON "{table}" ("fingerprint")')
+    updated, last_id = 0, 0
+    while True:
+        with db.atomic():
+            listings = list(HouseListing
+                            .select(HouseListing.id, HouseListing.caption, HouseListing.media_group_data)
+                            .where(HouseListing.id > last_id)
+                            .order_by(HouseListing.id)
+                            .limit(1000))
+            if not listings:
+                break
+            for listing in listings:
+                value = listing_fingerprint(listing)
+                if value:
+                    HouseListing.update(fingerprint=value).where(HouseListing.id == listing.id).execute()
+                    updated += 1
+            last_id = listings[-1].id
+    logging.info(f"✅ {updated} ta e'lon uchun barmoq izi hisoblandi")
+
+def skip_unattempted_deliveries():
+    """delivery_stats_ai triggeri attempts=0 li yozuvlarni (tiklangan jurnal) sanamaydigan bo'ladi."""
+    if not table_exists(Delivery._meta.table_name):
+        return
+    with db.atomic():
+        db.execute_sql("DROP TRIGGER IF EXISTS delivery_stats_ai")
+        create_stats_triggers()
+
+
+MIGRATIONS = [
+    migrate_post_id_to_integer,
+    build_search_index,
+    add_rotation_rounds,
+    migrate_deliveries,
+    build_listing_stats,
+    enable_incremental_vacuum,
+    add_fingerprints,
+    skip_unattempted_deliveries,
+]
+
+def run_migrations():
+    version = db.execute_sql("PRAGMA user_version").fetchone()[0]
+    for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+        logging.info(f"🛠 Migratsiya {number}: {migration.__name__}")
+        migration()
+        db.execute_sql(f"PRAGMA user_version = {number}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    initialize_db()
+    print("✅ Ma'lumotlar bazasi joriy sxemaga o'tkazildi.")
@@ -1,9 +1,19 @@
 import datetime
+import fcntl
+import time
 from peewee import *
 from passlib.context import CryptContext
 
-# SQLite ma'lumotlar bazasi
-db = SqliteDatabase('house_listings.db')
+# SQLite ma'lumotlar bazasi. WAL rejimida o'quvchilar yozuvchini kutmaydi;
+# har bir oqim (thread) o'z ulanishiga ega bo'ladi (peewee thread_safe).
+db = SqliteDatabase('house_listings.db', timeout=10, pragmas={
+    # Yangi bazalarda bo'sh sahifalar qaytariladi; eskilari migratsiyada bir marta VACUUM qilinadi
+    'auto_vacuum': 'incremental',
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'cache_size': -64 * 1000,  # ~64 MB
+    'temp_store': 'memory',
+})
 
 # Parol hashing uchun kontekst
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -25,22 +35,319 @@ class User(Model):
         return cls.create(username=username, hashed_password=hashed, is_admin=is_admin)
 
 class HouseListing(Model):
-    post_id = CharField()
+    post_id = BigIntegerField(index=True)
     post_url = CharField()
     source_message_id = IntegerField(null=True)
-    status = CharField(default="active")  # "active" yoki "sent" — faqat odatiy eʼlonlar uchun
-    boost_status = CharField(null=True)    # "boosted" bo'lgan postlar uchun (boost qilingan eʼlonlarda qiymati "boosted")
+    status = CharField(default="active")  # "active", "error", "deleted" yoki "duplicate"
+    boost_status = CharField(null=True, index=True)    # "boosted" bo'lgan postlar uchun (boost qilingan eʼlonlarda qiymati "boosted")
     source_group_id = BigIntegerField()
     timestamp = DateTimeField(default=datetime.datetime.now)
     media_group_id = CharField(null=True)
     media_group_data = TextField(null=True)
     caption = TextField(null=True)
     error_details = TextField(null=True)
-    forwarded_message_ids = TextField(null=True)  # JSON formatida saqlanadi
+    # Oxirgi marta qaysi aylanishda yuborilgani; sent_round < joriy aylanish bo'lsa, e'lon navbatda
+    sent_round = IntegerField(default=0, constraints=[SQL("DEFAULT 0")])
+    # Normallashtirilgan matn va media file_unique_id laridan xesh (duplicates.py)
+    fingerprint = CharField(null=True, index=True)
 
     class Meta:
         database = db
+        indexes = (
+            # Har bir manba guruhida post_id takrorlanmaydi
+            (('source_group_id', 'post_id'), True),
+            # Navbat va dashboard so'rovlari uchun
+            (('status', 'source_group_id', 'post_id'), False),
+        )
+
+class Delivery(Model):
+    """
+    Yetkazib berish jurnali: e'lonning bitta maqsad guruhga har bir yuborilishi
+    uchun bitta yozuv. Muvaffaqiyatsiz yuborishlar faqat o'sha guruh uchun
+    qayta urinib ko'riladi.
+    """
+    listing = ForeignKeyField(HouseListing, backref="deliveries", index=True)
+    target_id = BigIntegerField()
+    message_ids = TextField(null=True)  # JSON ro'yxat, masalan "[101, 102]"
+    round = IntegerField(default=0)
+    attempts = IntegerField(default=1)
+    status = CharField(default="sent")  # "pending", "sent", "failed", "dead", "cancelled" yoki "deleted"
+    error = TextField(null=True)
+    next_attempt_at = DateTimeField(null=True)
+    created_at = DateTimeField(default=datetime.datetime.now)
+    updated_at = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        database = db
+        indexes = (
+            # "X guruhda qaysi xabarlar bor" so'rovlari uchun
+            (('target_id', 'status'), False),
+            # Qayta urinish navbati uchun
+            (('status', 'next_attempt_at'), False),
+        )
+
+class Counter(Model):
+    """Triggerlar orqali yangilanib boriladigan hisoblagichlar (COUNT(*) o'rniga)."""
+    name = CharField(primary_key=True)
+    value = IntegerField(default=0)
+
+    class Meta:
+        database = db
+
+    @classmethod
+    def get_value(cls, name: str) -> int:
+        counter = cls.get_or_none(cls.name == name)
+        return counter.value if counter else 0
+
+class Control(Model):
+    """Jarayonlar o'rtasida umumiy boshqaruv holati (masalan, yuborish rejimi)."""
+    name = CharField(primary_key=True)
+    value = TextField()
+    updated_at = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        database = db
+
+class Command(Model):
+    """Boshqa jarayonlarga yuborilgan buyruqlar (masalan, "refresh")."""
+    name = CharField()
+    payload = TextField(null=True)   # JSON
+    origin = CharField()             # yuborgan jarayon; o'zi yuborgan buyruqni qayta bajarmaydi
+    created_at = DateTimeField(default=datetime.datetime.now, index=True)
+
+    class Meta:
+        database = db
+
+class Lease(Model):
+    """
+    Vaqtinchalik egalik: "scheduler" (navbatni yurituvchi forwarder),
+    "target:<chat_id>" (maqsad guruhga yuboruvchi) va "worker:<id>" (tirik forwarderlar).
+    """
+    name = CharField(primary_key=True)
+    owner = CharField()
+    expires_at = FloatField()        # time.time() bo'yicha
+
+    class Meta:
+        database = db
+
+class BackgroundJob(Model):
+    """Fon ishlari holati (jobs.py): so'rov qaysi veb jarayonga tushsa ham /api/jobs/<id> ishlaydi."""
+    id = CharField(primary_key=True)
+    kind = CharField()
+    state = CharField()              # "running", "done" yoki "failed"
+    total = IntegerField(default=0)
+    done = IntegerField(default=0)
+    failed = IntegerField(default=0)
+    error = TextField(null=True)
+    created = FloatField(index=True)  # time.time() bo'yicha
+    finished = FloatField(null=True)
+
+    class Meta:
+        database = db
+
+class ArchivedListing(Model):
+    """
+    Sovuq (arxivlangan) e'lonlar. Qidiruv va ro'yxat uchun kerakli ustunlar ochiq,
+    qolgan maydonlar (media_group_data va h.k.) zlib bilan siqilgan JSON sifatida saqlanadi.
+    """
+    listing_id = IntegerField()            # asosiy jadvaldagi eski ID
+    post_id = BigIntegerField(index=True)
+    source_group_id = BigIntegerField()
+    status = CharField()
+    boost_status = CharField(null=True)
+    timestamp = DateTimeField()
+    caption = TextField(null=True)
+    payload = BlobField()
+    archived_at = DateTimeField(default=datetime.datetime.now, index=True)
+
+    class Meta:
+        database = db
+
+def current_round() -> int:
+    return Counter.get_value("round")
+
+# sent_hour:* statistika hisoblagichlari shuncha soat saqlanadi
+STATS_KEEP_HOURS = 48
+
+def start_new_round():
+    """Yangi aylanish: barcha faol e'lonlar yana navbatga tushadi (bitta UPDATE)."""
+    oldest = (datetime.datetime.now() - datetime.timedelta(hours=STATS_KEEP_HOURS)).strftime("%Y-%m-%dT%H")
+    with db.atomic():
+        Counter.update(value=Counter.value + 1).where(Counter.name == "round").execute()
+        # Yangi aylanishda hali hech narsa yuborilmagan
+        Counter.insert_many([("round_sent", 0), ("round_started", int(time.time()))],
+                            fields=[Counter.name, Counter.value]) \
+            .on_conflict(conflict_target=[Counter.name], preserve=[Counter.value]).execute()
+        Counter.delete().where(Counter.name.startswith("sent_hour:") &
+                               (Counter.name < f"sent_hour:{oldest}")).execute()
+
+def create_search_index():
+    """
+    E'lon matnlari uchun FTS5 indeksi va uni HouseListing bilan sinxron ushlab
+    turuvchi triggerlar, shuningdek umumiy e'lonlar soni hisoblagichi.
+    """
+    table = HouseListing._meta.table_name
+    statements = [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts
+            USING fts5(caption, content='{table}', content_rowid='id')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts(rowid, caption) VALUES (new.id, new.caption);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, caption) VALUES ('delete', old.id, old.caption);
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF caption ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, caption) VALUES ('delete', old.id, old.caption);
+            INSERT INTO {table}_fts(rowid, caption) VALUES (new.id, new.caption);
+        END""",
+        f"""INSERT OR IGNORE INTO counter (name, value) SELECT 'listings', COUNT(*) FROM {table}""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_count_ai AFTER INSERT ON {table} BEGIN
+            UPDATE counter SET value = value + 1 WHERE name = 'listings';
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_count_ad AFTER DELETE ON {table} BEGIN
+            UPDATE counter SET value = value - 1 WHERE name = 'listings';
+        END""",
+        # Foreign key tekshiruvi yoqilmagan, shuning uchun jurnal yozuvlarini trigger tozalaydi
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_delivery_ad AFTER DELETE ON {table} BEGIN
+            DELETE FROM delivery WHERE listing_id = old.id;
+        END""",
+    ]
+    with db.atomic():
+        for statement in statements:
+            db.execute_sql(statement)
+
+def _bump(name: str, delta: int, condition: str = "1") -> str:
+    """Trigger ichida `name` hisoblagichini `condition` bajarilsa `delta` ga o'zgartiradi."""
+    return (f"INSERT INTO counter (name, value) SELECT {name}, {delta} WHERE {condition} "
+            f"ON CONFLICT(name) DO UPDATE SET value = value + excluded.value;")
+
+def _in_round(row: str) -> str:
+    return f"({row}.status = 'active' AND {row}.sent_round >= (SELECT value FROM counter WHERE name = 'round'))"
+
+def _listing_bumps(row: str, delta: int) -> list:
+    return [
+        _bump(f"'status:' || {row}.status", delta),
+        _bump(f"'boost:' || {row}.boost_status", delta, f"{row}.boost_status IS NOT NULL"),
+        _bump(f"'group:' || {row}.source_group_id", delta),
+        _bump("'round_sent'", delta, _in_round(row)),
+    ]
+
+def _delivery_bumps(row: str) -> list:
+    outcome = f"CASE {row}.status WHEN 'sent' THEN 'sent' ELSE 'failed' END"
+    return [
+        _bump(f"'target:' || {row}.target_id || ':' || {outcome}", 1),
+        _bump(f"'sent_hour:' || strftime('%Y-%m-%dT%H', {row}.updated_at)", 1, f"{row}.status = 'sent'"),
+    ]
+
+def create_stats_triggers():
+    """
+    Statistika hisoblagichlari (counter jadvalida) va ularni yangilab boruvchi triggerlar:
+    status:<holat>, boost:<holat>, group:<manba guruh>, round_sent (joriy aylanishda
+    yuborilgan faol e'lonlar), target:<guruh>:sent|failed (yuborish urinishlari natijasi)
+    va sent_hour:<soat> (soatlik yuborishlar). Statistikani ko'rsatish e'lonlar soniga bog'liq emas.
+    """
+    table = HouseListing._meta.table_name
+    listing_columns = ("status", "boost_status", "source_group_id", "sent_round")
+    changed = " OR ".join(f"old.{c} IS NOT new.{c}" for c in listing_columns)
+    statements = [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_stats_ai AFTER INSERT ON {table} BEGIN
+            {" ".join(_listing_bumps("new", 1))}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_stats_ad AFTER DELETE ON {table} BEGIN
+            {" ".join(_listing_bumps("old", -1))}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_stats_au AFTER UPDATE OF {", ".join(listing_columns)} ON {table}
+            WHEN {changed} BEGIN
+            {" ".join(_listing_bumps("old", -1))}
+            {" ".join(_listing_bumps("new", 1))}
+        END""",
+        # Har bir urinish bir marta sanaladi: yangi yozuv yoki attempts oshgan yangilanish.
+        # attempts=0 li yozuvlar (ko'chirilgan yoki arxivdan tiklangan) urinish emas
+        f"""CREATE TRIGGER IF NOT EXISTS delivery_stats_ai AFTER INSERT ON delivery
+            WHEN new.status IN ('sent', 'failed', 'dead') AND new.attempts > 0 BEGIN
+            {" ".join(_delivery_bumps("new"))}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS delivery_stats_au AFTER UPDATE OF attempts ON delivery
+            WHEN new.attempts > old.attempts AND new.status IN ('sent', 'failed', 'dead') BEGIN
+            {" ".join(_delivery_bumps("new"))}
+        END""",
+    ]
+    with db.atomic():
+        for statement in statements:
+            db.execute_sql(statement)
+
+def rebuild_stats(keep_hours: int = STATS_KEEP_HOURS):
+    """Statistika hisoblagichlarini jadvallardan to'liq qayta hisoblaydi (migratsiya va tiklash uchun)."""
+    table = HouseListing._meta.table_name
+    since = datetime.datetime.now() - datetime.timedelta(hours=keep_hours)
+    statements = [
+        "DELETE FROM counter WHERE name LIKE 'status:%' OR name LIKE 'boost:%' OR name LIKE 'group:%' "
+        "OR name LIKE 'target:%' OR name LIKE 'sent_hour:%' OR name = 'round_sent'",
+        f"INSERT INTO counter (name, value) SELECT 'status:' || status, COUNT(*) FROM {table} GROUP BY status",
+        f"""INSERT INTO counter (name, value) SELECT 'boost:' || boost_status, COUNT(*) FROM {table}
+            WHERE boost_status IS NOT NULL GROUP BY boost_status""",
+        f"""INSERT INTO counter (name, value) SELECT 'group:' || source_group_id, COUNT(*) FROM {table}
+            GROUP BY source_group_id""",
+        f"""INSERT INTO counter (name, value) SELECT 'round_sent', COUNT(*) FROM {table} AS t
+            WHERE {_in_round("t")}""",
+        # Yuborilgan yozuvda (attempts - 1), qolganlarida attempts ta muvaffaqiyatsiz urinish bo'lgan.
+        # attempts=0 li yuborilgan yozuvlar jurnaldan oldingi davrdan ko'chirilgan (migrate_deliveries)
+        """INSERT INTO counter (name, value)
+            SELECT 'target:' || target_id || ':sent', COUNT(*) FROM delivery
+            WHERE status IN ('sent', 'deleted') GROUP BY target_id""",
+        """INSERT INTO counter (name, value)
+            SELECT 'target:' || target_id || ':failed',
+                   SUM(attempts) - SUM(status IN ('sent', 'deleted') AND attempts > 0) FROM delivery
+            GROUP BY target_id HAVING SUM(attempts) - SUM(status IN ('sent', 'deleted') AND attempts > 0) > 0""",
+        """INSERT INTO counter (name, value)
+            SELECT 'sent_hour:' || strftime('%Y-%m-%dT%H', updated_at), COUNT(*) FROM delivery
+            WHERE status = 'sent' AND attempts > 0 AND updated_at >= ? GROUP BY 1""",
+    ]
+    with db.atomic():
+        for statement in statements:
+            db.execute_sql(statement, (since,) if "?" in statement else ())
+        Counter.insert(name="round_started", value=int(time.time())).on_conflict_ignore().execute()
+
+def create_archive_index():
+    """Arxiv uchun FTS5 indeksi va arxivlangan e'lonlar hisoblagichi."""
+    table = ArchivedListing._meta.table_name
+    statements = [
+        f"""CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts
+            USING fts5(caption, content='{table}', content_rowid='id')""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+            INSERT INTO {table}_fts(rowid, caption) VALUES (new.id, new.caption);
+            {_bump("'archived'", 1)}
+        END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+            INSERT INTO {table}_fts({table}_fts, rowid, caption) VALUES ('delete', old.id, old.caption);
+            {_bump("'archived'", -1)}
+        END""",
+    ]
+    with db.atomic():
+        for statement in statements:
+            db.execute_sql(statement)
+
+def caption_search(q: str, model=HouseListing):
+    """
+    Qidiruv satrini FTS5 so'roviga aylantiradi: har bir so'z prefiks bo'yicha
+    qidiriladi va barcha so'zlar mos kelishi kerak.
+    """
+    terms = ['"' + term.replace('"', '""') + '"*' for term in q.split()]
+    table = model._meta.table_name
+    return model.id.in_(SQL(f"(SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ?)", [" ".join(terms)]))
 
 def initialize_db():
+    from migrations import run_migrations
     db.connect()
-    db.create_tables([User, HouseListing], safe=True)
\ No newline at end of file
+    # `uvicorn main:app --workers N` va forwarder.py jarayonlari bir vaqtda ishga tushganda
+    # migratsiyalarni faqat bittasi bajaradi, qolganlari kutib turadi
+    with open(f"{db.database}.lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        run_migrations()
+        db.create_tables([User, HouseListing, Delivery, Counter, Control, Command, Lease, BackgroundJob,
+                          ArchivedListing], safe=True)
+        Counter.insert(name="round", value=1).on_conflict_ignore().execute()
+        Counter.insert(name="round_started", value=int(time.time())).on_conflict_ignore().execute()
+        create_search_index()
+        create_stats_triggers()
+        create_archive_index()
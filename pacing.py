@@ -0,0 +1,238 @@
+"""
+Yuborish tezligi: slotlar oldindan hisoblanadi (har bir guruhga soatiga POSTS_PER_HOUR ta
+e'lon), QUIET_HOURS davomida yuborilmaydi, to'xtalishdan keyingi qarz esa portlashsiz —
+CATCH_UP_FACTOR marta tezroq, ko'pi bilan PACING_MAX_BACKLOG soniyalik qismi — qoplanadi.
+
+Simulyatsiya (Telegram chaqirilmaydi, baza o'zgartirilmaydi):
+    python pacing.py --hours 24
+    python pacing.py --hours 48 --posts-per-hour 120 --quiet-hours 23-7 --json
+"""
+import argparse
+import copy
+import datetime
+import json
+import time
+from collections import Counter, deque
+from typing import Optional
+from config import POSTS_PER_HOUR, QUIET_HOURS, CATCH_UP_FACTOR, PACING_MAX_BACKLOG
+
+# Yuborish o'chirilgan yoki slot uzoq bo'lganda holatni qayta tekshirish oralig'i (soniya)
+POLL_INTERVAL = 5
+
+
+def parse_quiet_hours(spec: str) -> list:
+    """"23-7,13:30-14" ni kun boshidan daqiqalardagi [(1380, 420), (810, 840)] ga aylantiradi."""
+    def minutes(value: str) -> int:
+        hours, _, mins = value.strip().partition(":")
+        return (int(hours) * 60 + int(mins or 0)) % (24 * 60)
+
+    ranges = []
+    for part in spec.split(","):
+        if not part.strip():
+            continue
+        start, sep, end = part.partition("-")
+        if not sep:
+            raise ValueError(f"QUIET_HOURS noto'g'ri: {part!r} (kutilgan ko'rinish: 23-7 yoki 23:30-07:00)")
+        if minutes(start) != minutes(end):
+            ranges.append((minutes(start), minutes(end)))
+    return ranges
+
+
+class Pacer:
+    """
+    Slot vaqtlari kun boshidagi langarga emas, oldingi slotga bog'liq: har bir slot
+    `interval` soniyadan keyin. Yuborish kechiksa (xato, sekin javob, to'xtalish),
+    keyingi slotlar `interval / catch_up` oraliq bilan qarz tugaguncha ketadi.
+    Foydalanilmagan slotlar (navbat bo'sh, yuborish o'chirilgan, jim soatlar) qarzga yozilmaydi.
+    """
+
+    def __init__(self, posts_per_hour: float, quiet_hours: list, catch_up: float, max_backlog: float):
+        self.interval = 3600 / posts_per_hour if posts_per_hour > 0 else 0.0
+        self.quiet_hours = quiet_hours
+        self.catch_up = max(catch_up, 1.0)
+        self.max_backlog = max_backlog
+        self._next = None   # keyingi slotning rejadagi vaqti
+        self._last = None   # oxirgi yuborish vaqti
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval > 0 or bool(self.quiet_hours)
+
+    def quiet_until(self, at: float) -> Optional[float]:
+        """`at` jim soatlarga tushsa, ular tugaydigan vaqtni qaytaradi."""
+        moment = datetime.datetime.fromtimestamp(at)
+        minute = moment.hour * 60 + moment.minute
+        for start, end in self.quiet_hours:
+            inside = start <= minute < end if start < end else (minute >= start or minute < end)
+            if inside:
+                until = moment.replace(hour=end // 60, minute=end % 60, second=0, microsecond=0)
+                if until <= moment:
+                    until += datetime.timedelta(days=1)
+                return until.timestamp()
+        return None
+
+    def next_slot(self, now: float) -> float:
+        """Keyingi yuborish mumkin bo'lgan eng erta vaqt."""
+        if self._next is None:
+            self._next = now
+        # Uzoq to'xtalishdan keyin faqat max_backlog qadar qarz qoplanadi
+        self._next = max(self._next, now - self.max_backlog)
+        at = self._next
+        if self._last is not None and self.interval:
+            at = max(at, self._last + self.interval / self.catch_up)
+        # Jim soatlardagi slotlar qarzga qolmaydi; yonma-yon oraliqlar uchun takrorlanadi
+        for _ in range(len(self.quiet_hours)):
+            until = self.quiet_until(at)
+            if until is None:
+                break
+            at = until
+            self._next = max(self._next, until)
+        return at
+
+    def mark_sent(self, now: float, count: int = 1):
+        """`count` ta slot ishlatildi (muvaffaqiyatli yoki xato bilan)."""
+        self._last = now
+        if self._next is None:
+            self._next = now
+        self._next += self.interval * count
+
+    def overdue(self, now: float) -> int:
+        """Vaqti kelgan slotlar soni: qarz bo'lmasa 1, to'xtalishdan keyin esa undan ko'p."""
+        if not self.interval or self._next is None:
+            return 1
+        backlog = now - max(self._next, now - self.max_backlog)
+        return max(int(backlog // self.interval) + 1, 1)
+
+    def state(self) -> dict:
+        return {"next": self._next, "last": self._last}
+
+    def restore(self, state: dict):
+        """
+        Saqlangan holatdan davom etadi: jarayon to'xtab turgan yoki navbat yurituvchi
+        almashgan vaqtdagi slotlar qarz sifatida (max_backlog gacha) qoplanadi.
+        """
+        self._next, self._last = state.get("next"), state.get("last")
+
+    def idle(self, now: float):
+        """Yuboriladigan narsa yo'q: o'tib ketgan slotlar qarzga yozilmaydi."""
+        if self._next is not None and self._next < now:
+            self._next = now
+
+    def slots(self, count: int, now: float = None) -> list:
+        """Holatni o'zgartirmasdan keyingi `count` ta slot vaqtini qaytaradi."""
+        now = time.time() if now is None else now
+        projected = copy.copy(self)
+        times = []
+        for _ in range(count):
+            at = max(projected.next_slot(now), now)
+            projected.mark_sent(at)
+            times.append(at)
+            now = at
+        return times
+
+
+def create_pacer(posts_per_hour: float = POSTS_PER_HOUR, quiet_hours: str = QUIET_HOURS) -> Pacer:
+    return Pacer(posts_per_hour, parse_quiet_hours(quiet_hours), CATCH_UP_FACTOR, PACING_MAX_BACKLOG)
+
+
+pacer = create_pacer()
+
+
+def simulate(start: datetime.datetime, hours: float, pacer: Pacer) -> dict:
+    """
+    Bazadagi joriy navbat va boost holatidan boshlab `hours` soatlik yuborish jadvalini
+    hisoblaydi. Navbat tugaganda yangi aylanish boshlanadi (forwarding_task kabi).
+    """
+    from models import HouseListing, current_round
+    from config import SOURCE_GROUPS, REGULAR_WEIGHT, BOOST_WEIGHT, BOOST_MAX_PER_HOUR, BOOST_MIN_SPACING
+    from listing_queue import listing_queue
+    from scheduler import FairScheduler
+
+    if not pacer.interval:
+        raise ValueError("Simulyatsiya uchun POSTS_PER_HOUR (yoki --posts-per-hour) 0 dan katta bo'lishi kerak")
+    round_number, due = listing_queue._load_due()
+    active = list(HouseListing
+                  .select(HouseListing.id, HouseListing.post_id)
+                  .where((HouseListing.status == "active") & HouseListing.source_group_id.in_(SOURCE_GROUPS))
+                  .tuples())
+    scheduler = FairScheduler(REGULAR_WEIGHT, BOOST_WEIGHT, BOOST_MAX_PER_HOUR, BOOST_MIN_SPACING)
+    boosted = {}
+    for listing in (HouseListing
+                    .select(HouseListing.id, HouseListing.post_id, HouseListing.status, HouseListing.boost_status)
+                    .where((HouseListing.boost_status == "boosted") & (HouseListing.status == "active"))
+                    .order_by(HouseListing.post_id)):
+        scheduler.sync(listing)
+        boosted[listing.id] = listing.post_id
+    regular = deque(sorted(due, key=lambda row: (row[1], row[0])))
+    active.sort(key=lambda row: (row[1], row[0]))
+
+    now = start.timestamp()
+    end = now + hours * 3600
+    timeline = []
+    while True:
+        at = max(pacer.next_slot(now), now)
+        if at >= end:
+            break
+        if not regular and active:
+            round_number += 1
+            regular = deque(active)
+        kind, boost_id = scheduler.next(has_regular=bool(regular), now=at)
+        if kind is None:
+            # Na navbat, na vaqti kelgan boost bor
+            pacer.idle(at)
+            now = at + POLL_INTERVAL
+            continue
+        if kind == "boost":
+            listing_id, post_id = boost_id, boosted[boost_id]
+        else:
+            listing_id, post_id = regular.popleft()
+        timeline.append({"at": at, "kind": kind, "listing_id": listing_id, "post_id": post_id, "round": round_number})
+        pacer.mark_sent(at)
+        now = at
+    per_hour = Counter(datetime.datetime.fromtimestamp(item["at"]).strftime("%Y-%m-%d %H:00") for item in timeline)
+    return {
+        "start": start.isoformat(timespec="seconds"),
+        "hours": hours,
+        "posts_per_hour_setting": round(3600 / pacer.interval, 2) if pacer.interval else None,
+        "starting_round": current_round(),
+        "rounds_started": round_number - current_round(),
+        "total": len(timeline),
+        "by_kind": dict(Counter(item["kind"] for item in timeline)),
+        "per_hour": dict(sorted(per_hour.items())),
+        "timeline": timeline,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Yuborish jadvali simulyatsiyasi (Telegram chaqirilmaydi)")
+    parser.add_argument("--hours", type=float, default=24)
+    parser.add_argument("--start", type=datetime.datetime.fromisoformat, default=None,
+                        help="boshlanish vaqti, masalan 2024-05-01T08:00 (standart: hozir)")
+    parser.add_argument("--posts-per-hour", type=float, default=POSTS_PER_HOUR)
+    parser.add_argument("--quiet-hours", default=QUIET_HOURS)
+    parser.add_argument("--limit", type=int, default=50, help="nechta yuborish chop etiladi (0 — hammasi)")
+    parser.add_argument("--json", action="store_true", help="natijani JSON ko'rinishida chiqarish")
+    args = parser.parse_args()
+
+    try:
+        result = simulate(args.start or datetime.datetime.now(), args.hours,
+                          create_pacer(args.posts_per_hour, args.quiet_hours))
+    except ValueError as e:
+        raise SystemExit(f"❌ {e}")
+    if args.limit:
+        result["timeline"] = result["timeline"][:args.limit]
+    for item in result["timeline"]:
+        item["at"] = datetime.datetime.fromtimestamp(item["at"]).isoformat(timespec="seconds")
+    if args.json:
+        print(json.dumps(result, indent=2, ensure_ascii=False))
+        return
+    for item in result["timeline"]:
+        print(f"{item['at']}  {item['kind']:<7}  post {item['post_id']:<10}  {item['round']}-aylanish")
+    print(f"\n📊 {result['hours']} soatda {result['total']} ta yuborish {result['by_kind']}, "
+          f"{result['rounds_started']} ta yangi aylanish")
+    for hour, count in result["per_hour"].items():
+        print(f"  {hour}  {count}")
+
+
+if __name__ == "__main__":
+    main()
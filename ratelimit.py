@@ -0,0 +1,104 @@
+import asyncio
+import logging
+import time
+from aiogram.utils.exceptions import RetryAfter
+from config import GLOBAL_RATE_LIMIT, CHAT_RATE_LIMIT, SEND_MAX_RETRIES
+from metrics import retry_after, retry_after_seconds
+
+
+class TokenBucket:
+    """
+    Token-bucket cheklovchi: soniyasiga `rate` ta token qo'shiladi,
+    chelakda `capacity` tadan ortiq token yig'ilmaydi.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, tokens: float = 1):
+        tokens = min(tokens, self.capacity)
+        async with self._lock:
+            while True:
+                blocked = self.blocked_until - time.monotonic()
+                if blocked > 0:
+                    await asyncio.sleep(blocked)
+                    continue
+                self._refill()
+                if self.tokens >= tokens:
+                    self.tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self.tokens) / self.rate)
+
+    def configure(self, rate: float, capacity: float):
+        self._refill()
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = min(self.tokens, capacity)
+
+    def pause(self, seconds: float):
+        # RetryAfter kelganda belgilangan vaqtgacha hech kimga token bermaymiz
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+
+class RateLimiter:
+    """
+    Butun bot uchun bitta va har bir chat uchun alohida chelak.
+    Har bir so'rov avval chat chelagidan, so'ng umumiy chelakdan token oladi.
+    """
+
+    def __init__(self, global_rate: float, chat_rate_per_minute: float):
+        self.global_rate = global_rate
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate_per_minute = chat_rate_per_minute
+        self.chat_buckets = {}
+
+    def set_share(self, share: float):
+        """
+        Bot tokeni bir nechta forwarder uchun umumiy: har biri GLOBAL_RATE_LIMIT ning
+        `share` ulushini oladi (guruh chelaklari o'zgarmaydi — guruhlar ijaralar bilan bo'lingan).
+        """
+        rate = self.global_rate * share
+        if rate != self.global_bucket.rate:
+            self.global_bucket.configure(rate, max(rate, 1))
+
+    def bucket_for(self, chat_id: int) -> TokenBucket:
+        bucket = self.chat_buckets.get(chat_id)
+        if bucket is None:
+            bucket = TokenBucket(self.chat_rate_per_minute / 60, self.chat_rate_per_minute)
+            self.chat_buckets[chat_id] = bucket
+        return bucket
+
+    async def call(self, chat_id: int, func, /, *args, cost: int = 1, **kwargs):
+        """
+        `func` ni cheklov ostida chaqiradi. `cost` — so'rov nechta xabar yuborishi
+        (media guruhda har bir element alohida xabar hisoblanadi).
+        RetryAfter bo'lsa, Telegram ko'rsatgan vaqtcha kutib qayta urinadi.
+        """
+        bucket = self.bucket_for(chat_id)
+        attempt = 0
+        while True:
+            await bucket.acquire(cost)
+            await self.global_bucket.acquire(cost)
+            try:
+                return await func(*args, **kwargs)
+            except RetryAfter as e:
+                retry_after.inc(chat_id=chat_id)
+                retry_after_seconds.inc(e.timeout, chat_id=chat_id)
+                attempt += 1
+                if attempt > SEND_MAX_RETRIES:
+                    raise
+                logging.warning(f"⏳ {chat_id} uchun RetryAfter: {e.timeout} soniya kutamiz ({attempt}/{SEND_MAX_RETRIES})")
+                bucket.pause(e.timeout)
+
+
+limiter = RateLimiter(GLOBAL_RATE_LIMIT, CHAT_RATE_LIMIT)
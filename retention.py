@@ -0,0 +1,175 @@
+"""
+Saqlash muddatlari: sovuq e'lonlarni arxivga ko'chirish, eski yetkazib berish
+tarixini tozalash va bo'shagan sahifalarni incremental VACUUM bilan qaytarish.
+Asosiy jadvalda faqat kerakli (issiq) e'lonlar qoladi.
+"""
+import asyncio
+import datetime
+import json
+import logging
+import zlib
+from typing import Optional
+from peewee import fn
+from models import db, HouseListing, Delivery, ArchivedListing
+from config import (
+    ARCHIVE_DELETED_DAYS, ARCHIVE_ACTIVE_DAYS, DELIVERY_RETENTION_DAYS, RETENTION_INTERVAL, RETENTION_BATCH,
+)
+from aiodb import db_write
+from writebehind import write_buffer
+from forwarding import listing_changed, listing_removed, is_scheduler
+
+# Arxivda ochiq ustun sifatida saqlanadigan maydonlar; qolganlari siqilgan payload ichida
+ARCHIVE_COLUMNS = ("post_id", "source_group_id", "status", "boost_status", "timestamp", "caption")
+PURGE_CHUNK = 5000
+VACUUM_PAGES = 2000
+
+
+def pack_listing(listing: HouseListing, deliveries: list) -> bytes:
+    data = {
+        field.name: getattr(listing, field.name)
+        for field in HouseListing._meta.sorted_fields
+        if field.name not in ARCHIVE_COLUMNS and field.name != "id"
+    }
+    data["deliveries"] = deliveries
+    return zlib.compress(json.dumps(data, default=str).encode(), 9)
+
+def unpack_payload(payload: bytes) -> dict:
+    return json.loads(zlib.decompress(payload))
+
+def cold_listings(now: datetime.datetime):
+    """Arxivga ko'chiriladigan e'lonlar sharti."""
+    condition = (HouseListing.status.in_(["deleted", "duplicate"]) &
+                 (HouseListing.timestamp < now - datetime.timedelta(days=ARCHIVE_DELETED_DAYS)))
+    if ARCHIVE_ACTIVE_DAYS > 0:
+        condition |= ((HouseListing.boost_status.is_null() | (HouseListing.boost_status != "boosted")) &
+                      (HouseListing.timestamp < now - datetime.timedelta(days=ARCHIVE_ACTIVE_DAYS)))
+    return condition
+
+def archive_batch(now: datetime.datetime, limit: int) -> list:
+    """
+    `limit` tagacha sovuq e'lonni bitta tranzaksiyada arxivga ko'chiradi va
+    ko'chirilganlar ID larini qaytaradi. Jurnal yozuvlarini o'chirish triggeri tozalaydi.
+    """
+    with db.atomic():
+        listings = list(HouseListing.select().where(cold_listings(now)).order_by(HouseListing.id).limit(limit))
+        if not listings:
+            return []
+        ids = [listing.id for listing in listings]
+        sent = {}
+        for delivery in (Delivery
+                         .select(Delivery.listing, Delivery.target_id, Delivery.message_ids, Delivery.round)
+                         .where(Delivery.listing.in_(ids) & (Delivery.status == "sent"))):
+            sent.setdefault(delivery.listing_id, []).append({
+                "target_id": delivery.target_id,
+                "message_ids": json.loads(delivery.message_ids or "[]"),
+                "round": delivery.round,
+            })
+        ArchivedListing.insert_many([{
+            "listing_id": listing.id,
+            **{name: getattr(listing, name) for name in ARCHIVE_COLUMNS},
+            "payload": pack_listing(listing, sent.get(listing.id, [])),
+            "archived_at": now,
+        } for listing in listings]).execute()
+        HouseListing.delete().where(HouseListing.id.in_(ids)).execute()
+    return ids
+
+def purge_deliveries(cutoff: datetime.datetime) -> int:
+    """
+    `cutoff` dan oldin yaratilgan yetkazib berish yozuvlarini o'chiradi (qayta
+    urinish kutayotganlaridan tashqari). Yozuvlar taxminan vaqt tartibida qo'shiladi,
+    shuning uchun jadval ID oralig'ida bo'laklab ko'riladi va barcha yozuvlari
+    yangi bo'lgan birinchi bo'lakda to'xtaladi.
+    """
+    bounds = Delivery.select(fn.MIN(Delivery.id), fn.MAX(Delivery.id)).tuples().get()
+    if bounds[0] is None:
+        return 0
+    purged = 0
+    for start in range(bounds[0], bounds[1] + 1, PURGE_CHUNK):
+        chunk = (Delivery.id >= start) & (Delivery.id < start + PURGE_CHUNK)
+        with db.atomic():
+            oldest = Delivery.select(fn.MIN(Delivery.created_at)).where(chunk).scalar()
+            if oldest is None:
+                continue
+            if oldest >= cutoff:
+                break
+            purged += (Delivery
+                       .delete()
+                       .where(chunk & (Delivery.created_at < cutoff) & Delivery.status.not_in(["pending", "failed"]))
+                       .execute())
+    return purged
+
+def incremental_vacuum(pages: int) -> int:
+    """Ko'pi bilan `pages` ta bo'sh sahifani faylga qaytaradi; qolgan bo'sh sahifalar sonini qaytaradi."""
+    # Har bir qadamda bitta sahifa bo'shatiladi, shuning uchun natija oxirigacha o'qiladi
+    db.execute_sql(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+    return db.execute_sql("PRAGMA freelist_count").fetchone()[0]
+
+async def run_retention(now: Optional[datetime.datetime] = None) -> dict:
+    now = now or datetime.datetime.now()
+    # Buferdagi yangilanishlar arxivlangan e'lonlarga yozilmasin
+    await write_buffer.flush()
+    archived = 0
+    while True:
+        ids = await db_write(archive_batch, now, RETENTION_BATCH)
+        for listing_id in ids:
+            listing_removed(listing_id)
+        archived += len(ids)
+        if len(ids) < RETENTION_BATCH:
+            break
+    purged = await db_write(purge_deliveries, now - datetime.timedelta(days=DELIVERY_RETENTION_DAYS))
+    free_pages = await db_write(incremental_vacuum, VACUUM_PAGES)
+    while free_pages and free_pages >= VACUUM_PAGES:
+        free_pages = await db_write(incremental_vacuum, VACUUM_PAGES)
+    if archived or purged:
+        logging.info(f"🗄️ Arxivlandi: {archived} ta e'lon, tozalandi: {purged} ta yetkazib berish yozuvi")
+    return {"archived": archived, "purged_deliveries": purged, "free_pages": free_pages}
+
+async def retention_task():
+    while True:
+        await asyncio.sleep(RETENTION_INTERVAL)
+        # Bir nechta forwarder bo'lsa, faqat navbat yurituvchisi tozalaydi
+        if not is_scheduler():
+            continue
+        try:
+            await run_retention()
+        except Exception as e:
+            logging.error(f"❌ Arxivlashda xato: {e}")
+
+def restore_listing(archive_id: int) -> Optional[HouseListing]:
+    """
+    Arxivdagi e'lonni asosiy jadvalga qaytaradi (yangi ID bilan, navbatga faol holda).
+    Yuborilgan nusxalar jurnali ham tiklanadi: ularni keyin o'chirish mumkin, e'lon esa
+    o'sha aylanishda qayta yuborilmaydi. Shu manba guruhida shu post_id li e'lon
+    allaqachon bo'lsa, IntegrityError ko'tariladi.
+    """
+    with db.atomic():
+        archived = ArchivedListing.get_or_none(ArchivedListing.id == archive_id)
+        if archived is None:
+            return None
+        data = unpack_payload(archived.payload)
+        deliveries = data.pop("deliveries", [])
+        fields = {name: value for name, value in data.items() if name in HouseListing._meta.fields}
+        fields.update({name: getattr(archived, name) for name in ARCHIVE_COLUMNS})
+        fields.update(status="active", sent_round=max((delivery["round"] for delivery in deliveries), default=0))
+        listing = HouseListing.create(**fields)
+        if deliveries:
+            now = datetime.datetime.now()
+            # attempts=0: urinish allaqachon statistikada hisoblangan, qayta sanalmaydi
+            Delivery.insert_many([{
+                "listing": listing.id,
+                "target_id": delivery["target_id"],
+                "message_ids": json.dumps(delivery["message_ids"]),
+                "round": delivery["round"],
+                "attempts": 0,
+                "status": "sent",
+                "created_at": now,
+                "updated_at": now,
+            } for delivery in deliveries]).execute()
+        archived.delete_instance()
+    return listing
+
+async def restore_archived(archive_id: int) -> Optional[HouseListing]:
+    listing = await db_write(restore_listing, archive_id)
+    if listing is not None:
+        listing_changed(listing)
+    return listing
@@ -0,0 +1,131 @@
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+from models import HouseListing
+from config import REGULAR_WEIGHT, BOOST_WEIGHT, BOOST_MAX_PER_HOUR, BOOST_MIN_SPACING
+from aiodb import db_read
+
+
+class FairScheduler:
+    """
+    Odatiy va boost qilingan e'lonlarni og'irliklar bo'yicha aralashtiradi
+    (stride scheduling): har bir slotda bitta e'lon yuboriladi va uzoq muddatda
+    slotlar REGULAR_WEIGHT : BOOST_WEIGHT nisbatda taqsimlanadi.
+    Boost qilingan e'lonlar navbat bilan (round-robin) olinadi; har biri uchun
+    soatiga BOOST_MAX_PER_HOUR martadan ko'p emas va kamida BOOST_MIN_SPACING
+    soniya oraliq bilan yuboriladi.
+    """
+
+    def __init__(self, regular_weight: float, boost_weight: float, max_per_hour: int, min_spacing: float):
+        if regular_weight <= 0 or boost_weight <= 0:
+            raise ValueError(f"REGULAR_WEIGHT va BOOST_WEIGHT 0 dan katta bo'lishi kerak "
+                             f"(hozir: {regular_weight} va {boost_weight})")
+        self.strides = {"regular": 1 / regular_weight, "boost": 1 / boost_weight}
+        self.max_per_hour = max_per_hour
+        self.min_spacing = min_spacing
+        self.passes = dict(self.strides)
+        self._boosted = OrderedDict()   # listing_id -> post_id (round-robin tartibida)
+        self._history = {}              # listing_id -> oxirgi bir soatdagi yuborish vaqtlari
+
+    def __len__(self) -> int:
+        return len(self._boosted)
+
+    def sync(self, listing: HouseListing):
+        """E'lon boost holatiga qarab uni boost ro'yxatiga qo'shadi yoki chiqaradi."""
+        if listing.boost_status == "boosted" and listing.status == "active":
+            if listing.id not in self._boosted:
+                self._boosted[listing.id] = listing.post_id
+        else:
+            self.discard(listing.id)
+
+    def discard(self, listing_id: int):
+        self._boosted.pop(listing_id, None)
+        self._history.pop(listing_id, None)
+
+    async def load(self):
+        rows = await db_read(lambda: list(
+            HouseListing
+            .select(HouseListing.id, HouseListing.post_id)
+            .where((HouseListing.boost_status == "boosted") & (HouseListing.status == "active"))
+            .order_by(HouseListing.post_id)
+            .tuples()
+        ))
+        self._boosted = OrderedDict(rows)
+
+    def _eligible_boost(self, now: float, boosted: OrderedDict, history: dict) -> Optional[int]:
+        for listing_id in boosted:
+            sends = history.get(listing_id)
+            if not sends:
+                return listing_id
+            while sends and now - sends[0] >= 3600:
+                sends.popleft()
+            if sends and now - sends[-1] < self.min_spacing:
+                continue
+            if len(sends) >= self.max_per_hour:
+                continue
+            return listing_id
+        return None
+
+    @staticmethod
+    def _pick(passes: dict, strides: dict, has_regular: bool, boost_id: Optional[int]) -> Optional[str]:
+        ready = []
+        if has_regular:
+            ready.append("regular")
+        if boost_id is not None:
+            ready.append("boost")
+        if not ready:
+            return None
+        kind = min(ready, key=lambda k: (passes[k], k != "regular"))
+        # Bo'sh turgan sinf "kredit" yig'ib, keyin ketma-ket slotlarni egallab olmasin
+        for other in passes:
+            if other not in ready:
+                passes[other] = max(passes[other], passes[kind])
+        passes[kind] += strides[kind]
+        return kind
+
+    def next(self, has_regular: bool, now: float = None):
+        """
+        Keyingi slot uchun ("regular", None), ("boost", listing_id) yoki
+        (None, None) qaytaradi.
+        """
+        now = time.time() if now is None else now
+        boost_id = self._eligible_boost(now, self._boosted, self._history)
+        kind = self._pick(self.passes, self.strides, has_regular, boost_id)
+        if kind == "boost":
+            self._history.setdefault(boost_id, deque()).append(now)
+            self._boosted.move_to_end(boost_id)
+            return kind, boost_id
+        return kind, None
+
+    def snapshot(self) -> "FairScheduler":
+        """Joriy holatning nusxasi: oldindan ko'rish va simulyatsiya asl holatni o'zgartirmaydi."""
+        copy = FairScheduler.__new__(FairScheduler)
+        copy.strides = self.strides
+        copy.max_per_hour = self.max_per_hour
+        copy.min_spacing = self.min_spacing
+        copy.passes = dict(self.passes)
+        copy._boosted = OrderedDict(self._boosted)
+        copy._history = {listing_id: deque(sends) for listing_id, sends in self._history.items()}
+        return copy
+
+    def preview(self, regular: list, times: list) -> list:
+        """
+        Joriy holatni o'zgartirmasdan `times` vaqtlaridagi yuborishlarni hisoblaydi.
+        `regular` — navbatdagi odatiy e'lonlar [(listing_id, post_id), ...].
+        """
+        simulated = self.snapshot()
+        regular = deque(regular)
+        timeline = []
+        for slot, at in enumerate(times):
+            kind, boost_id = simulated.next(bool(regular), now=at)
+            if kind is None:
+                break
+            if kind == "boost":
+                listing_id, post_id = boost_id, simulated._boosted[boost_id]
+            else:
+                listing_id, post_id = regular.popleft()
+            timeline.append({"slot": slot, "at": at, "kind": kind, "listing_id": listing_id, "post_id": post_id})
+        return timeline
+
+
+boost_scheduler = FairScheduler(REGULAR_WEIGHT, BOOST_WEIGHT, BOOST_MAX_PER_HOUR, BOOST_MIN_SPACING)
@@ -1,7 +1,14 @@
 import os
+import asyncio
+import multiprocessing
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 import jwt
+from config import (AUTH_CACHE_TTL, AUTH_CACHE_SIZE, AUTH_HASH_WORKERS, AUTH_HASH_QUEUE, LOGIN_MAX_ATTEMPTS, LOGIN_WINDOW,
+                    LOGIN_USER_MAX_ATTEMPTS)
 
 # Ishlab chiqarishda ushbu kalitni atrof-muhit o'zgaruvchilardan olish tavsiya etiladi
 SECRET_KEY = "your-very-secret-key"
@@ -21,3 +28,147 @@ def verify_token(token: str) -> Optional[dict]:
         return payload
     except jwt.PyJWTError:
         return None
+
+
+class PrincipalCache:
+    """
+    Tekshirilgan tokenlar keshi: token -> foydalanuvchi ma'lumotlari.
+    Yozuv AUTH_CACHE_TTL soniya yoki token muddati tugaguncha (qaysi biri oldin
+    bo'lsa) amal qiladi; foydalanuvchi ma'lumotlari o'zgarganda o'chiriladi.
+    """
+
+    def __init__(self, ttl: float, max_size: int):
+        self.ttl = ttl
+        self.max_size = max_size
+        self._entries = OrderedDict()  # token -> (amal qilish muddati, user_id, User.__data__)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, token: str) -> Optional[dict]:
+        entry = self._entries.get(token)
+        if entry is None:
+            return None
+        expires_at, _, data = entry
+        if expires_at <= time.monotonic():
+            del self._entries[token]
+            return None
+        self._entries.move_to_end(token)
+        return data
+
+    def put(self, token: str, payload: dict, user_id: int, data: dict):
+        ttl = min(self.ttl, payload.get("exp", 0) - time.time())
+        if ttl <= 0:
+            return
+        self._entries[token] = (time.monotonic() + ttl, user_id, dict(data))
+        self._entries.move_to_end(token)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def invalidate_user(self, user_id: int):
+        for token in [token for token, (_, uid, _) in self._entries.items() if uid == user_id]:
+            del self._entries[token]
+
+
+class LoginThrottle:
+    """
+    Berilgan kalitlar (IP, foydalanuvchi nomi va IP juftligi va h.k.) bo'yicha muvaffaqiyatsiz kirishlarni sanaydi:
+    `window` soniyada `max_attempts` tadan oshsa, keyingi urinishlar bcrypt ga
+    yetib bormasdan rad etiladi.
+    """
+
+    def __init__(self, max_attempts: int, window: float):
+        self.max_attempts = max_attempts
+        self.window = window
+        self._failures = {}  # kalit -> deque(vaqtlar)
+
+    def _recent(self, key: str, now: float) -> deque:
+        failures = self._failures.get(key)
+        if failures is None:
+            return deque()
+        while failures and now - failures[0] >= self.window:
+            failures.popleft()
+        if not failures:
+            del self._failures[key]
+        return failures
+
+    def retry_after(self, *keys: str) -> float:
+        """Bloklangan bo'lsa necha soniya kutish kerakligini, aks holda 0 ni qaytaradi."""
+        now = time.monotonic()
+        wait = 0.0
+        for key in keys:
+            failures = self._recent(key, now)
+            if len(failures) >= self.max_attempts:
+                wait = max(wait, failures[0] + self.window - now)
+        return wait
+
+    def failure(self, *keys: str):
+        now = time.monotonic()
+        for key in keys:
+            self._recent(key, now)
+            self._failures.setdefault(key, deque()).append(now)
+
+    def success(self, *keys: str):
+        for key in keys:
+            self._failures.pop(key, None)
+
+
+class HasherBusy(Exception):
+    """Parol tekshirish navbati to'la."""
+
+
+class PasswordHasher:
+    """
+    bcrypt hisoblashlarini alohida jarayonlarda bajaradi: event loop va bot
+    to'xtab qolmaydi. Bir vaqtda `max_pending` tadan ortiq so'rov bo'lsa,
+    yangilari kutmasdan rad etiladi.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self._pending = 0
+        self._pool = None
+
+    def _executor(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # fork emas: ota jarayondagi oqimlar (DB, event loop) nusxalanmasin
+            self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._pool
+
+    async def _run(self, func, *args):
+        if self._pending >= self.max_pending:
+            raise HasherBusy()
+        self._pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self._executor(), func, *args)
+        finally:
+            self._pending -= 1
+
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self._run(_verify_password, password, hashed)
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash_password, password)
+
+    def shutdown(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
+
+
+def _verify_password(password: str, hashed: str) -> bool:
+    from models import pwd_context
+    return pwd_context.verify(password, hashed)
+
+def _hash_password(password: str) -> str:
+    from models import pwd_context
+    return pwd_context.hash(password)
+
+
+principals = PrincipalCache(AUTH_CACHE_TTL, AUTH_CACHE_SIZE)
+# IP va (foydalanuvchi nomi, IP) bo'yicha
+login_throttle = LoginThrottle(LOGIN_MAX_ATTEMPTS, LOGIN_WINDOW)
+# Foydalanuvchi nomi bo'yicha, ko'p IP dan keladigan taqsimlangan hujum uchun (bo'shroq)
+user_login_throttle = LoginThrottle(LOGIN_USER_MAX_ATTEMPTS, LOGIN_WINDOW)
+password_hasher = PasswordHasher(AUTH_HASH_WORKERS, AUTH_HASH_QUEUE)
@@ -0,0 +1,115 @@
+import json
+from collections import OrderedDict
+from typing import Optional
+from aiogram.types import InputMediaPhoto, InputMediaVideo, InputMediaDocument, MediaGroup
+from models import HouseListing
+from config import SEND_PLAN_CACHE_SIZE
+
+CAPTION_FOOTER = """
+https://t.me/navoiy_1x_uylar
+https://t.me/navoiy_1_2x_uylar
+https://t.me/navoiy_2x_uylar
+https://t.me/navoiy_2_3x_uylar
+https://t.me/navoiy_3x_uylar
+https://t.me/navoiy_3_4x_uylar
+https://t.me/navoiy_4x_uylar
+https://t.me/navoiy_4_5x_uylar
+https://t.me/navoiy_5x_uylar
+https://t.me/navoiy_reklama_uylar
+https://t.me/navoiy_hovli_kottedj
+https://t.me/navoiy_ijaragaa_uylar"""
+
+
+class SendPlan:
+    """
+    E'lonni yuborish uchun tayyor ma'lumot. Bir marta tuziladi va barcha
+    maqsad guruhlar uchun umumiy ishlatiladi, shuning uchun o'zgartirilmaydi.
+    """
+    __slots__ = ("media", "from_chat_id", "message_id", "message_ids", "cost", "source")
+
+    def __init__(self, media: Optional[MediaGroup], from_chat_id: int, message_id: int,
+                 message_ids: Optional[list], source: tuple):
+        self.media = media
+        self.from_chat_id = from_chat_id
+        self.message_id = message_id
+        # Manba guruhidagi xabarlar (albomda barcha qismlari); noma'lum bo'lsa None — partiyaga qo'shilmaydi
+        self.message_ids = message_ids
+        self.cost = len(media.media) if media is not None else 1
+        self.source = source
+
+
+def build_input_media(listing: HouseListing) -> list:
+    media_items = json.loads(listing.media_group_data)
+    input_media = []
+    for item in media_items:
+        if item["type"] == "photo":
+            media = InputMediaPhoto(media=item["file_id"])
+        elif item["type"] == "video":
+            media = InputMediaVideo(media=item["file_id"])
+        elif item["type"] == "document":
+            media = InputMediaDocument(media=item["file_id"])
+        else:
+            continue
+        # Faqat birinchi media elementiga (agar mavjud bo'lsa) yozuv qo'shamiz
+        if not input_media and listing.caption:
+            media.caption = listing.caption + CAPTION_FOOTER
+            media.parse_mode = "HTML"
+        input_media.append(media)
+    return input_media
+
+def source_message_ids(listing: HouseListing) -> Optional[list]:
+    if listing.media_group_id and listing.media_group_data:
+        items = json.loads(listing.media_group_data)
+        # Eski yozuvlarda albom qismlarining message_id si saqlanmagan
+        if any("message_id" not in item for item in items):
+            return None
+        if items:
+            return sorted(item["message_id"] for item in items)
+    return [listing.source_message_id] if listing.source_message_id else None
+
+def compile_plan(listing: HouseListing) -> SendPlan:
+    media = None
+    if listing.media_group_id and listing.media_group_data:
+        input_media = build_input_media(listing)
+        # Qayta yig'ib bo'lmaydigan albom (masalan, avval saqlangan bo'sh "[]") manba xabari sifatida yuboriladi
+        if input_media:
+            media = MediaGroup(input_media)
+    return SendPlan(media, listing.source_group_id, listing.source_message_id,
+                    source_message_ids(listing), plan_source(listing))
+
+def plan_source(listing: HouseListing) -> tuple:
+    # Reja tuzilgan ma'lumot; boshqa jarayonda tahrirlangan e'lon ham eskirgan rejani olmaydi
+    return (listing.media_group_id, listing.media_group_data, listing.caption,
+            listing.source_group_id, listing.source_message_id)
+
+
+class SendPlanCache:
+    """E'lon ID si bo'yicha yuborish rejalari uchun chegaralangan LRU kesh."""
+
+    def __init__(self, max_size: int):
+        self.max_size = max_size
+        self._plans = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._plans)
+
+    def get(self, listing: HouseListing) -> SendPlan:
+        plan = self._plans.get(listing.id)
+        if plan is not None and plan.source == plan_source(listing):
+            self._plans.move_to_end(listing.id)
+            return plan
+        plan = compile_plan(listing)
+        self._plans[listing.id] = plan
+        self._plans.move_to_end(listing.id)
+        while len(self._plans) > self.max_size:
+            self._plans.popitem(last=False)
+        return plan
+
+    def invalidate(self, listing_id: int):
+        self._plans.pop(listing_id, None)
+
+    def clear(self):
+        self._plans.clear()
+
+
+send_plans = SendPlanCache(SEND_PLAN_CACHE_SIZE)
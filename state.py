@@ -1,4 +1,6 @@
-# Global flaglar forwarding jarayonini boshqarish uchun
+# Global flaglar forwarding jarayonini boshqarish uchun.
+# Bu — shu jarayondagi nusxa: umumiy holat control.py orqali bazada saqlanadi
+# va boshqa jarayonlar (veb, forwarderlar) bilan sinxronlanadi.
 
 SENDING_ENABLED = False      # Dastlab yuborish rejimi OCHIQ emas (default OFF)
 REFRESH_REQUESTED = False    # Agar True bo'lsa, bazadagi o'zgarishlar yangilanadi
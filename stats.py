@@ -0,0 +1,93 @@
+import datetime
+import threading
+import time
+from models import Counter
+from config import STATS_CACHE_TTL
+import state
+
+SENDS_HOURS = 24      # /api/stats da ko'rsatiladigan soatlar
+
+
+def _hour_key(moment: datetime.datetime) -> str:
+    return moment.strftime("%Y-%m-%dT%H")
+
+def compute_stats(now: datetime.datetime = None) -> dict:
+    """
+    Statistikani counter jadvalidan yig'adi. Jadvaldagi qatorlar soni holatlar,
+    guruhlar va soatlar soniga bog'liq, e'lonlar soniga emas.
+    """
+    now = now or datetime.datetime.now()
+    counters = dict(Counter.select(Counter.name, Counter.value).tuples())
+    by_status, by_boost, by_group, targets, hours = {}, {}, {}, {}, {}
+    for name, value in counters.items():
+        kind, _, key = name.partition(":")
+        if not value and kind in ("status", "boost", "group"):
+            continue
+        if kind == "status":
+            by_status[key] = value
+        elif kind == "boost":
+            by_boost[key] = value
+        elif kind == "group":
+            by_group[key] = value
+        elif kind == "sent_hour":
+            hours[key] = value
+        elif kind == "target":
+            target, _, outcome = key.rpartition(":")
+            targets.setdefault(target, {"sent": 0, "failed": 0})[outcome] = value
+    for counts in targets.values():
+        attempts = counts["sent"] + counts["failed"]
+        counts["success_rate"] = round(counts["sent"] / attempts, 4) if attempts else None
+    round_sent = counters.get("round_sent", 0)
+    round_started = counters.get("round_started")
+    sends_per_hour = [
+        {"hour": key, "sent": hours.get(key, 0)}
+        for key in (_hour_key(now - datetime.timedelta(hours=h)) for h in range(SENDS_HOURS - 1, -1, -1))
+    ]
+    return {
+        "listings": {
+            "total": counters.get("listings", 0),
+            "archived": counters.get("archived", 0),
+            "by_status": by_status,
+            "by_boost": by_boost,
+            "by_group": by_group,
+        },
+        "round": {
+            "number": counters.get("round", 0),
+            "sent": round_sent,
+            "queued": max(by_status.get("active", 0) - round_sent, 0),
+            "started_at": round_started,
+            # Navbat yoshi: joriy aylanish boshlanganidan beri o'tgan vaqt
+            "age_seconds": round(time.time() - round_started) if round_started else None,
+        },
+        "sends_per_hour": sends_per_hour,
+        "sent_last_hour": sends_per_hour[-1]["sent"],
+        "targets": targets,
+        "sending_enabled": state.SENDING_ENABLED,
+        "generated_at": now.isoformat(timespec="seconds"),
+    }
+
+
+class StatsCache:
+    """compute_stats() natijasini `ttl` soniya saqlaydi."""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()  # dashboard va db_read oqimlaridan chaqiriladi
+        self._value = None
+        self._expires = 0.0
+
+    def get(self) -> dict:
+        with self._lock:
+            now = time.monotonic()
+            if self._value is None or now >= self._expires:
+                self._value = compute_stats()
+                self._expires = now + self.ttl
+            # Yuborish rejimi keshdan emas, shu jarayon holatidan olinadi
+            return {**self._value, "sending_enabled": state.SENDING_ENABLED}
+
+    def invalidate(self):
+        with self._lock:
+            self._value = None
+
+
+stats_cache = StatsCache(STATS_CACHE_TTL)
@@ -0,0 +1,59 @@
+"""
+Testlar vaqtinchalik papkadagi alohida bazada ishlaydi. models.db nisbiy yo'lni
+ishlatadi va sozlamalar import paytida o'qiladi, shuning uchun ishchi papka va
+muhit o'zgaruvchilari modullar import qilinishidan oldin o'rnatiladi.
+"""
+import os
+import sys
+import tempfile
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.chdir(tempfile.mkdtemp(prefix="house-listings-tests-"))
+os.environ.update(
+    BOT_TOKEN="123:test",
+    SOURCE_GROUPS="-1001,-1002",
+    TARGET_GROUPS="-200,-300",
+    POSTS_PER_HOUR="60",
+    QUIET_HOURS="",
+    DUPLICATE_MODE="suppress",
+    LOGIN_MAX_ATTEMPTS="3",
+    LOGIN_USER_MAX_ATTEMPTS="6",
+    BATCH_SEND="",
+)
+
+from models import db, initialize_db  # noqa: E402
+
+
+def reset_db():
+    """Bazadagi barcha obyektlarni o'chiradi (fayl qoladi — executor ulanishlari unga bog'langan)."""
+    db.connect(reuse_if_open=True)
+    objects = db.execute_sql(
+        "SELECT type, name, sql FROM sqlite_master WHERE name NOT LIKE 'sqlite_%'").fetchall()
+    for kind, name, _ in objects:
+        if kind == "trigger":
+            db.execute_sql(f'DROP TRIGGER IF EXISTS "{name}"')
+    # FTS5 jadvallari birinchi: ular o'z yordamchi jadvallarini o'zi o'chiradi
+    tables = sorted((obj for obj in objects if obj[0] == "table"),
+                    key=lambda obj: not (obj[2] or "").startswith("CREATE VIRTUAL"))
+    for _, name, _ in tables:
+        db.execute_sql(f'DROP TABLE IF EXISTS "{name}"')
+    db.execute_sql("PRAGMA user_version = 0")
+    db.close()
+
+
+@pytest.fixture
+def empty_db():
+    """Sxemasiz baza (migratsiya testlari eski jadvallarni o'zi yaratadi)."""
+    reset_db()
+    yield db
+    db.close()
+
+
+@pytest.fixture
+def database(empty_db):
+    """Oxirgi sxemagacha migratsiya qilingan bo'sh baza."""
+    initialize_db()
+    yield db
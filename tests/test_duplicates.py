@@ -0,0 +1,35 @@
+import datetime
+
+from models import HouseListing
+from duplicates import normalize_caption, fingerprint, resolve_duplicates
+
+CAPTION = "Ijaraga 2 xonali uy beriladi, markazda"
+
+
+def create_listing(post_id: int, caption: str, **fields) -> HouseListing:
+    return HouseListing.create(post_id=post_id, post_url="u", source_message_id=post_id, source_group_id=-1001,
+                               caption=caption, fingerprint=fingerprint(caption, []), **fields)
+
+
+def test_normalize_ignores_markup_case_and_punctuation():
+    assert normalize_caption("<b>Ijaraga</b>  2-xonali UY!") == normalize_caption("ijaraga 2 xonali uy")
+
+
+def test_short_text_without_media_has_no_fingerprint():
+    assert fingerprint("Sotiladi", []) is None
+    assert fingerprint("Sotiladi", ["photo-1"]) is not None
+
+
+def test_newer_copy_is_suppressed(database):
+    original = create_listing(1, CAPTION)
+    copy = create_listing(2, "<i>" + CAPTION.upper() + "</i>")
+    assert resolve_duplicates([copy]) == []
+    assert HouseListing.get_by_id(copy.id).status == "duplicate"
+    assert HouseListing.get_by_id(original.id).status == "active"
+
+
+def test_copy_outside_window_stays_active(database):
+    create_listing(1, CAPTION, timestamp=datetime.datetime.now() - datetime.timedelta(days=30))
+    copy = create_listing(2, CAPTION)
+    resolve_duplicates([copy])
+    assert HouseListing.get_by_id(copy.id).status == "active"
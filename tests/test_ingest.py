@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+from aiogram import types
+
+from models import HouseListing
+from duplicates import fingerprint
+from ingest import IngestPipeline, apply_edit
+
+CAPTION = "Ijaraga 2 xonali uy beriladi"
+
+
+def album_message(message_id: int, photo: str, caption: str = None) -> types.Message:
+    data = {"message_id": message_id, "date": 0, "chat": {"id": -1001, "type": "supergroup"},
+            "media_group_id": "A",
+            "photo": [{"file_id": f"file-{photo}", "file_unique_id": photo, "width": 1, "height": 1}]}
+    if caption:
+        data["caption"] = caption
+    return types.Message.to_object(data)
+
+
+def album_items(listing: HouseListing) -> list:
+    return [(item["message_id"], item["file_unique_id"], item.get("caption", False))
+            for item in json.loads(listing.media_group_data)]
+
+
+def run_edits(*edits):
+    """Ikki qismli albomni saqlaydi, keyin tahrirlarni birma-bir yozadi."""
+    async def run():
+        pipeline = IngestPipeline(album_delay=0.01, batch_size=100, flush_interval=60)
+        pipeline.add_message(album_message(1, "p1", CAPTION))
+        pipeline.add_message(album_message(2, "p2"))
+        await asyncio.sleep(0.05)
+        await pipeline.flush()
+        for message in edits:
+            pipeline.add_edit(message)
+            await pipeline.flush()
+        await pipeline.close()
+
+    asyncio.run(run())
+    return HouseListing.get()
+
+
+def test_captionless_member_edit_keeps_album_caption(database):
+    listing = run_edits(album_message(2, "p2"))
+    assert listing.caption == CAPTION
+    assert listing.fingerprint == fingerprint(CAPTION, ["p1", "p2"])
+
+
+def test_media_edit_updates_album_item(database):
+    listing = run_edits(album_message(2, "p3"))
+    assert listing.caption == CAPTION
+    assert album_items(listing) == [(1, "p1", True), (2, "p3", False)]
+
+
+def test_caption_owner_can_remove_caption(database):
+    listing = run_edits(album_message(1, "p1"))
+    assert listing.caption is None
+
+
+def test_apply_edit_moves_caption_to_edited_member():
+    data = json.dumps([{"type": "photo", "file_id": "a", "file_unique_id": "p1", "message_id": 1, "caption": True},
+                       {"type": "photo", "file_id": "b", "file_unique_id": "p2", "message_id": 2}])
+    caption, media_group_data = apply_edit(CAPTION, data, 1, 2, "Yangi matn", None)
+    assert caption == "Yangi matn"
+    assert [item.get("caption") for item in json.loads(media_group_data)] == [None, True]
+
+
+def test_apply_edit_single_message_replaces_caption():
+    assert apply_edit(CAPTION, None, 5, 5, None, None) == (None, None)
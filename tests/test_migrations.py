@@ -0,0 +1,67 @@
+import datetime
+import json
+
+from models import db, initialize_db, HouseListing, Delivery, Counter
+from migrations import MIGRATIONS
+
+LEGACY_SCHEMA = """
+    CREATE TABLE houselisting (
+        id INTEGER PRIMARY KEY, post_id VARCHAR(255) NOT NULL, post_url VARCHAR(255) NOT NULL,
+        source_message_id INTEGER, status VARCHAR(255) NOT NULL, boost_status VARCHAR(255),
+        source_group_id INTEGER NOT NULL, timestamp DATETIME NOT NULL, media_group_id VARCHAR(255),
+        media_group_data TEXT, caption TEXT, error_details TEXT, forwarded_message_ids TEXT
+    )
+"""
+
+
+def create_legacy(rows):
+    """Birinchi migratsiyadan oldingi houselisting jadvali: (id, post_id, status, timestamp, forwarded)."""
+    db.connect(reuse_if_open=True)
+    db.execute_sql(LEGACY_SCHEMA)
+    for listing_id, post_id, status, timestamp, forwarded in rows:
+        db.execute_sql(
+            "INSERT INTO houselisting VALUES (?, ?, 'u', ?, ?, NULL, -1001, ?, NULL, NULL, 'matn', NULL, ?)",
+            (listing_id, post_id, listing_id, status, timestamp, json.dumps(forwarded) if forwarded else None))
+    db.close()
+
+
+def test_fresh_database_is_at_latest_version(empty_db):
+    initialize_db()
+    assert db.execute_sql("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+
+
+def test_legacy_chain_reaches_latest_schema(empty_db):
+    create_legacy([(1, "5", "sent", "2024-01-01 10:00:00", {"-200": [11]}),
+                   (2, "6", "error", "2024-01-01 10:00:00", None)])
+    initialize_db()
+    columns = [row[1] for row in db.execute_sql("PRAGMA table_info(houselisting)")]
+    assert db.execute_sql("PRAGMA user_version").fetchone()[0] == len(MIGRATIONS)
+    assert "forwarded_message_ids" not in columns and "fingerprint" in columns
+    assert HouseListing.get(HouseListing.post_id == 5).status == "active"
+    # "error" holati endi faqat muvaffaqiyatsiz maqsad guruhga tegishli
+    assert HouseListing.get(HouseListing.post_id == 6).status == "active"
+
+
+def test_unmigrated_post_ids_keep_forwarded_ids(empty_db):
+    create_legacy([(1, "5", "sent", "2024-01-01", {"-200": [11]}),
+                   (2, "abc", "sent", "2024-01-01", {"-200": [12]}),
+                   (3, "5", "sent", "2024-01-01", {"-200": [13]}),
+                   (4, "", "sent", "2024-01-01", None)])
+    initialize_db()
+    assert [listing.id for listing in HouseListing.select()] == [1]
+    side = db.execute_sql(
+        'SELECT id, reason, forwarded_message_ids FROM houselisting_unmigrated ORDER BY id').fetchall()
+    assert side == [(2, "post_id", '{"-200": [12]}'), (3, "duplicate", '{"-200": [13]}'), (4, "post_id", None)]
+
+
+def test_legacy_deliveries_are_dated_by_listing_and_not_counted_hourly(empty_db):
+    recent = (datetime.datetime.now() - datetime.timedelta(hours=1)).strftime("%Y-%m-%d %H:%M:%S")
+    create_legacy([(1, "5", "sent", recent, {"-200": [11], "-300": [21, 22]})])
+    initialize_db()
+    deliveries = list(Delivery.select().order_by(Delivery.target_id))
+    assert [(d.target_id, json.loads(d.message_ids)) for d in deliveries] == [(-300, [21, 22]), (-200, [11])]
+    assert all(d.attempts == 0 and d.created_at.strftime("%Y-%m-%d %H:%M:%S") == recent for d in deliveries)
+    counters = {c.name: c.value for c in Counter.select()}
+    assert not [name for name in counters if name.startswith("sent_hour:")]
+    assert counters["target:-200:sent"] == 1
+    assert "target:-200:failed" not in counters
@@ -0,0 +1,49 @@
+import datetime
+
+import pytest
+
+from pacing import Pacer, parse_quiet_hours
+
+
+def test_slots_follow_interval():
+    pacer = Pacer(posts_per_hour=60, quiet_hours=[], catch_up=2, max_backlog=3600)
+    assert pacer.slots(3, now=1000) == [1000, 1060, 1120]
+
+
+def test_restored_backlog_is_caught_up_faster():
+    pacer = Pacer(posts_per_hour=60, quiet_hours=[], catch_up=2, max_backlog=3600)
+    pacer.restore({"next": 1000 - 120, "last": 1000 - 180})
+    # 880, 940 va 1000 dagi slotlar qarz: ular interval / catch_up (30 s) oraliq bilan qoplanadi
+    assert [at - 1000 for at in pacer.slots(5, now=1000)] == [0, 30, 60, 90, 120]
+
+
+def test_backlog_is_capped():
+    pacer = Pacer(posts_per_hour=60, quiet_hours=[], catch_up=2, max_backlog=120)
+    pacer.restore({"next": 0, "last": 0})
+    assert pacer.overdue(10_000) == 3
+
+
+def test_overdue_and_batched_mark_sent():
+    pacer = Pacer(posts_per_hour=60, quiet_hours=[], catch_up=4, max_backlog=3600)
+    assert pacer.overdue(1000) == 1
+    pacer.restore({"next": 1000 - 7 * 60, "last": 1000 - 8 * 60})
+    assert pacer.overdue(1000) == 8
+    pacer.mark_sent(1000, count=8)
+    assert pacer.next_slot(1000) == 1060
+
+
+def test_unlimited_pacer_never_waits():
+    pacer = Pacer(posts_per_hour=0, quiet_hours=[], catch_up=2, max_backlog=3600)
+    assert pacer.slots(3, now=50) == [50, 50, 50]
+
+
+def test_quiet_hours_push_slot_to_end():
+    pacer = Pacer(posts_per_hour=60, quiet_hours=parse_quiet_hours("23-7"), catch_up=2, max_backlog=3600)
+    night = datetime.datetime(2026, 1, 1, 23, 30).timestamp()
+    assert pacer.next_slot(night) == datetime.datetime(2026, 1, 2, 7, 0).timestamp()
+
+
+def test_parse_quiet_hours():
+    assert parse_quiet_hours("23-7,13:30-14") == [(1380, 420), (810, 840)]
+    with pytest.raises(ValueError):
+        parse_quiet_hours("23")
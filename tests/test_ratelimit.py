@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+from ratelimit import TokenBucket, RateLimiter
+
+
+def test_bucket_waits_for_refill():
+    async def run():
+        bucket = TokenBucket(rate=20, capacity=2)
+        started = time.monotonic()
+        for _ in range(4):
+            await bucket.acquire()
+        return time.monotonic() - started
+
+    # 2 ta token tayyor, qolgan 2 tasi 20 token/s tezlikda ~0.1 s da yig'iladi
+    assert 0.08 < asyncio.run(run()) < 0.5
+
+
+def test_configure_clamps_tokens_to_new_capacity():
+    bucket = TokenBucket(rate=30, capacity=30)
+    bucket.configure(rate=10, capacity=10)
+    assert (bucket.rate, bucket.capacity) == (10, 10)
+    assert bucket.tokens <= 10
+
+
+def test_set_share_splits_global_rate():
+    limiter = RateLimiter(global_rate=30, chat_rate_per_minute=20)
+    limiter.set_share(1 / 3)
+    assert limiter.global_bucket.rate == 10
+    assert limiter.global_bucket.tokens <= limiter.global_bucket.capacity == 10
+    limiter.set_share(1)
+    assert limiter.global_bucket.rate == 30
+
+
+def test_chat_buckets_are_per_chat():
+    limiter = RateLimiter(global_rate=30, chat_rate_per_minute=20)
+    assert limiter.bucket_for(-200) is limiter.bucket_for(-200)
+    assert limiter.bucket_for(-200) is not limiter.bucket_for(-300)
+    assert limiter.bucket_for(-200).capacity == 20
@@ -0,0 +1,37 @@
+import datetime
+
+from models import HouseListing, Delivery, Counter, ArchivedListing
+from retention import archive_batch, restore_listing, purge_deliveries
+
+
+def counters() -> dict:
+    return {c.name: c.value for c in Counter.select().where(
+        Counter.name.startswith("target:") | Counter.name.startswith("sent_hour:"))}
+
+
+def test_restore_brings_back_sent_deliveries(database):
+    listing = HouseListing.create(post_id=5, post_url="u", source_message_id=5, source_group_id=-1001,
+                                  status="deleted", caption="matn", timestamp=datetime.datetime(2020, 1, 1))
+    Delivery.create(listing=listing.id, target_id=-200, message_ids="[11]", round=3)
+    Delivery.create(listing=listing.id, target_id=-300, message_ids="[21, 22]", round=3)
+    assert archive_batch(datetime.datetime.now(), 10) == [listing.id]
+    assert Delivery.select().count() == 0
+    before = counters()
+
+    restored = restore_listing(ArchivedListing.get().id)
+
+    assert (restored.status, restored.sent_round) == ("active", 3)
+    assert sorted((d.target_id, d.message_ids, d.status) for d in Delivery.select().where(
+        Delivery.listing == restored.id)) == [(-300, "[21, 22]", "sent"), (-200, "[11]", "sent")]
+    # Tiklangan yozuvlar yangi yuborish urinishi sifatida sanalmaydi
+    assert counters() == before
+    assert ArchivedListing.select().count() == 0
+
+
+def test_purge_keeps_deliveries_waiting_for_retry(database):
+    listing = HouseListing.create(post_id=5, post_url="u", source_message_id=5, source_group_id=-1001)
+    old = datetime.datetime.now() - datetime.timedelta(days=60)
+    Delivery.create(listing=listing.id, target_id=-200, status="sent", created_at=old)
+    Delivery.create(listing=listing.id, target_id=-300, status="failed", created_at=old)
+    assert purge_deliveries(datetime.datetime.now() - datetime.timedelta(days=30)) == 1
+    assert [d.status for d in Delivery.select()] == ["failed"]
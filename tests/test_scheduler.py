@@ -0,0 +1,56 @@
+import pytest
+
+from models import HouseListing
+from scheduler import FairScheduler
+from listing_queue import ListingQueue
+
+
+def listing(listing_id: int, post_id: int, **fields) -> HouseListing:
+    values = dict(status="active", source_group_id=-1001, sent_round=0, boost_status=None)
+    values.update(fields)
+    return HouseListing(id=listing_id, post_id=post_id, **values)
+
+
+def test_weights_must_be_positive():
+    with pytest.raises(ValueError):
+        FairScheduler(regular_weight=0, boost_weight=1, max_per_hour=10, min_spacing=0)
+
+
+def test_slots_are_split_by_weight():
+    scheduler = FairScheduler(regular_weight=3, boost_weight=1, max_per_hour=100, min_spacing=0)
+    scheduler.sync(listing(1, 10, boost_status="boosted"))
+    kinds = [scheduler.next(has_regular=True, now=slot)[0] for slot in range(8)]
+    assert kinds.count("boost") == 2 and kinds.count("regular") == 6
+
+
+def test_only_active_boosted_listings_get_boost_slots():
+    scheduler = FairScheduler(regular_weight=1, boost_weight=1, max_per_hour=100, min_spacing=0)
+    scheduler.sync(listing(1, 10, boost_status="boosted", status="duplicate"))
+    assert len(scheduler) == 0
+    assert scheduler.next(has_regular=False, now=0) == (None, None)
+
+
+def test_boost_spacing_is_respected():
+    scheduler = FairScheduler(regular_weight=1, boost_weight=1, max_per_hour=100, min_spacing=60)
+    scheduler.sync(listing(1, 10, boost_status="boosted"))
+    assert scheduler.next(has_regular=False, now=0) == ("boost", 1)
+    assert scheduler.next(has_regular=False, now=30) == (None, None)
+    assert scheduler.next(has_regular=False, now=60) == ("boost", 1)
+
+
+def test_queue_pops_in_post_id_order_and_skips_stale_entries():
+    queue = ListingQueue()
+    queue.round = 1
+    for listing_id, post_id in ((1, 30), (2, 10), (3, 20)):
+        queue.sync(listing(listing_id, post_id))
+    queue.sync(listing(3, 20, status="deleted"))
+    queue.sync(listing(4, 5, sent_round=1))
+    assert queue.peek(5) == [(2, 10), (1, 30)]
+    assert [queue.pop(), queue.pop(), queue.pop()] == [2, 1, None]
+
+
+def test_queue_ignores_unknown_source_groups():
+    queue = ListingQueue()
+    queue.round = 1
+    queue.sync(listing(1, 10, source_group_id=-999))
+    assert len(queue) == 0
@@ -0,0 +1,56 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+
+from models import User
+from security import LoginThrottle, login_throttle, user_login_throttle
+
+
+def test_throttle_blocks_after_max_attempts():
+    throttle = LoginThrottle(max_attempts=2, window=60)
+    throttle.failure("ip:1")
+    assert throttle.retry_after("ip:1") == 0
+    throttle.failure("ip:1")
+    assert 0 < throttle.retry_after("ip:1") <= 60
+    assert throttle.retry_after("ip:2") == 0
+    throttle.success("ip:1")
+    assert throttle.retry_after("ip:1") == 0
+
+
+@pytest.fixture
+def authenticate(database, monkeypatch):
+    """main.authenticate, bcrypt jarayonlarisiz (parol ochiq matnda saqlanadi)."""
+    import main
+
+    async def verify(password, hashed):
+        return password == hashed
+    monkeypatch.setattr(main.password_hasher, "verify", verify)
+    User.create(username="admin", hashed_password="pw", is_admin=True)
+    login_throttle._failures.clear()
+    user_login_throttle._failures.clear()
+
+    def login(ip: str, password: str):
+        request = SimpleNamespace(client=SimpleNamespace(host=ip))
+        try:
+            return asyncio.run(main.authenticate(request, "admin", password)) is not None
+        except HTTPException as e:
+            return e.status_code
+
+    yield login
+    login_throttle._failures.clear()
+    user_login_throttle._failures.clear()
+
+
+def test_other_ip_cannot_lock_out_admin(authenticate):
+    # LOGIN_MAX_ATTEMPTS=3 (conftest)
+    assert [authenticate("6.6.6.6", "bad") for _ in range(4)] == [False, False, False, 429]
+    assert authenticate("1.1.1.1", "pw") is True
+    assert authenticate("6.6.6.6", "pw") == 429
+
+
+def test_username_limit_stops_distributed_guessing(authenticate):
+    # LOGIN_USER_MAX_ATTEMPTS=6 (conftest): har bir IP dan bittadan urinish
+    assert [authenticate(f"7.7.7.{i}", "bad") for i in range(6)] == [False] * 6
+    assert authenticate("1.1.1.1", "pw") == 429
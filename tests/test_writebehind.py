@@ -0,0 +1,58 @@
+import asyncio
+
+from models import HouseListing, Delivery
+from writebehind import WriteBehindBuffer
+
+
+def create_listing(post_id: int, **fields) -> HouseListing:
+    return HouseListing.create(post_id=post_id, post_url="u", source_message_id=post_id,
+                               source_group_id=-1001, caption="matn", **fields)
+
+
+def test_sent_round_does_not_revive_deleted_listing(database):
+    deleted, active = create_listing(1), create_listing(2)
+
+    async def run():
+        buffer = WriteBehindBuffer(interval=60, max_size=100)
+        buffer.update(deleted.id, sent_round=3)
+        buffer.update(active.id, sent_round=3)
+        # Yuborish paytida e'lon o'chirildi — buferdagi yozuv uni qayta faollashtirmasligi kerak
+        HouseListing.update(status="deleted").where(HouseListing.id == deleted.id).execute()
+        await buffer.close()
+
+    asyncio.run(run())
+    assert (HouseListing.get_by_id(deleted.id).status, HouseListing.get_by_id(deleted.id).sent_round) == ("deleted", 0)
+    assert (HouseListing.get_by_id(active.id).status, HouseListing.get_by_id(active.id).sent_round) == ("active", 3)
+
+
+def test_close_waits_for_size_triggered_flushes(database):
+    listing = create_listing(1)
+
+    async def run():
+        buffer = WriteBehindBuffer(interval=60, max_size=2)
+        for target in range(5):
+            buffer.add_delivery(listing=listing.id, target_id=-200 - target)
+        await buffer.close()
+        return len(buffer)
+
+    assert asyncio.run(run()) == 0
+    assert Delivery.select().count() == 5
+
+
+def test_flush_keeps_rows_when_write_fails(database, monkeypatch):
+    listing = create_listing(1)
+
+    async def run():
+        buffer = WriteBehindBuffer(interval=60, max_size=100)
+        buffer.update(listing.id, sent_round=2)
+
+        def fail(*args):
+            raise RuntimeError("disk I/O error")
+        monkeypatch.setattr(buffer, "_apply", fail)
+        await buffer.flush()
+        assert len(buffer) == 1
+        monkeypatch.undo()
+        await buffer.close()
+
+    asyncio.run(run())
+    assert HouseListing.get_by_id(listing.id).sent_round == 2
@@ -0,0 +1,68 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from aiogram import Bot, Dispatcher, types
+from config import WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS
+
+RECENT_UPDATES = 10000
+
+
+class UpdateQueue:
+    """
+    Webhook orqali kelgan yangilanishlar uchun chegaralangan navbat.
+    HTTP so'rov darhol javob oladi, yangilanishni esa `workers` ta vazifa
+    qayta ishlaydi. Telegram qayta yuborgan (takroriy update_id) yangilanishlar
+    tashlab yuboriladi.
+    """
+
+    def __init__(self, maxsize: int, workers: int):
+        self.workers = workers
+        self._queue = asyncio.Queue(maxsize)
+        self._recent = OrderedDict()
+        self._tasks = []
+
+    def __len__(self) -> int:
+        return self._queue.qsize()
+
+    def put(self, data: dict) -> bool:
+        """Yangilanishni navbatga qo'yadi; navbat to'la bo'lsa False qaytaradi."""
+        update_id = data.get("update_id")
+        if update_id in self._recent:
+            return True
+        try:
+            self._queue.put_nowait(data)
+        except asyncio.QueueFull:
+            return False
+        self._recent[update_id] = None
+        if len(self._recent) > RECENT_UPDATES:
+            self._recent.popitem(last=False)
+        return True
+
+    def start(self, dp: Dispatcher):
+        for _ in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(dp)))
+
+    async def _worker(self, dp: Dispatcher):
+        Bot.set_current(dp.bot)
+        Dispatcher.set_current(dp)
+        while True:
+            data = await self._queue.get()
+            try:
+                await dp.process_update(types.Update(**data))
+            except Exception as e:
+                logging.error(f"❌ Yangilanish {data.get('update_id')} ni qayta ishlashda xato: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def stop(self, timeout: float = 10):
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                logging.warning(f"⚠️ Navbatda {len(self)} ta yangilanish qayta ishlanmay qoldi")
+        for task in self._tasks:
+            task.cancel()
+        self._tasks = []
+
+
+update_queue = UpdateQueue(WEBHOOK_QUEUE_SIZE, WEBHOOK_WORKERS)
@@ -0,0 +1,92 @@
+import asyncio
+import logging
+from models import HouseListing, Delivery
+from aiodb import db_write
+from config import WRITE_FLUSH_INTERVAL, WRITE_FLUSH_SIZE
+
+
+class WriteBehindBuffer:
+    """
+    E'lonlarga tegishli o'zgarishlarni va yetkazib berish jurnali yozuvlarini
+    xotirada yig'adi va ularni bitta tranzaksiyada yozadi: `interval` soniyada bir marta yoki `max_size` ta e'lon
+    yig'ilganda, shuningdek to'xtash paytida.
+    Jarayon kutilmaganda to'xtasa, faqat oxirgi oynadagi yozuvlar yo'qoladi —
+    ya'ni o'sha e'lonlar qayta yuborilishi mumkin.
+    """
+
+    def __init__(self, interval: float, max_size: int):
+        self.interval = interval
+        self.max_size = max_size
+        self._pending = {}   # listing_id -> {maydon: qiymat}
+        self._deliveries = []  # Delivery jadvaliga qo'shiladigan qatorlar
+        self._timer = None
+        self._flushes = set()  # hajm bo'yicha boshlangan flush tasklari (close() kutadi)
+        self._lock = asyncio.Lock()
+
+    def __len__(self) -> int:
+        return len(self._pending) + len(self._deliveries)
+
+    def update(self, listing_id: int, **fields):
+        self._pending.setdefault(listing_id, {}).update(fields)
+        self._schedule()
+
+    def add_delivery(self, **row):
+        self._deliveries.append(row)
+        self._schedule()
+
+    def _schedule(self):
+        if len(self) >= self.max_size:
+            task = asyncio.get_running_loop().create_task(self.flush())
+            self._flushes.add(task)
+            task.add_done_callback(self._flushes.discard)
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        self._timer = None
+        await self.flush()
+
+    @staticmethod
+    def _apply(pending: dict, deliveries: list):
+        if deliveries:
+            Delivery.insert_many(deliveries).execute()
+        # Bir xil o'zgarishli e'lonlar bitta UPDATE ... WHERE id IN (...) bilan yoziladi
+        groups = {}
+        for listing_id, fields in pending.items():
+            groups.setdefault(tuple(sorted(fields.items())), []).append(listing_id)
+        for fields, listing_ids in groups.items():
+            fields = dict(fields)
+            query = HouseListing.update(**fields).where(HouseListing.id.in_(listing_ids))
+            if "sent_round" in fields:
+                # Yuborish paytida o'chirilgan yoki takror deb belgilangan e'lon o'zgarmaydi
+                query = query.where(HouseListing.status == "active")
+            query.execute()
+
+    async def flush(self):
+        async with self._lock:
+            pending, self._pending = self._pending, {}
+            deliveries, self._deliveries = self._deliveries, []
+            if not pending and not deliveries:
+                return
+            try:
+                await db_write(self._apply, pending, deliveries)
+            except Exception as e:
+                logging.error(f"❌ Buferdagi {len(pending)} ta e'lon va {len(deliveries)} ta yetkazib berish yozuvini yozishda xato: {e}")
+                # Keyingi urinishda yozilishi uchun qaytaramiz (yangiroq qiymatlar ustun)
+                for listing_id, fields in pending.items():
+                    self._pending[listing_id] = {**fields, **self._pending.get(listing_id, {})}
+                self._deliveries[:0] = deliveries
+                if self._timer is None:
+                    self._timer = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def close(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._flushes:
+            await asyncio.gather(*self._flushes)
+        await self.flush()
+
+
+write_buffer = WriteBehindBuffer(WRITE_FLUSH_INTERVAL, WRITE_FLUSH_SIZE)